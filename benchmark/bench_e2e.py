@@ -0,0 +1,122 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey end-to-end benchmark
+
+    Runs the real search_nzb -> push_nzb_* code paths against the local mock server and
+    reports throughput and latency percentiles for search and push.
+
+    Example:
+        python benchmark/bench_e2e.py --jobs 50 --concurrency 4 --target nzbget --latency 0.05
+"""
+
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import nzbmonkey  # noqa: E402
+from mockserver import MockOptions, MockServer  # noqa: E402
+
+TARGETS = ('sabnzbd', 'nzbget', 'synologydls', 'none')
+
+
+def percentile(values, percent):
+    """Return the percentile of a list of values (nearest rank)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def push(target, base_host, base_port, tag, nzb, password):
+    """Push a NZB with the real push function for the target"""
+    if target == 'sabnzbd':
+        return nzbmonkey.push_nzb_sabnzbd(base_host, base_port, False, 'apikey', 'sabnzbd', '', '', '', False,
+                                          tag, nzb)
+    if target == 'nzbget':
+        return nzbmonkey.push_nzb_nzbget(base_host, base_port, False, 'nzbget', 'tegbzn6789', 'xmlrpc', '', False,
+                                         tag, nzb)
+    if target == 'synologydls':
+        return nzbmonkey.push_nzb_synologydls(base_host, base_port, False, 'admin', 'secret', 'webapi', tag, nzb,
+                                              password or '')
+    return 0
+
+
+def run_job(number, args, host, port):
+    """Search and push one release, return timings and result codes"""
+    header = 'nzbmonkey.benchmark.{}.{}'.format(args.seed, number)
+    password = 'secret{}'.format(number)
+    start = perf_counter()
+    res, nzb, engine = nzbmonkey.search_nzb(header, password, args.engines, args.best_nzb, 2, 2.5)[:3]
+    searched = perf_counter()
+    push_res = push(args.target, host, port, 'Release.{}'.format(number), nzb, password) if not res else 1
+    pushed = perf_counter()
+    return {'search': searched - start, 'push': pushed - searched, 'total': pushed - start,
+            'search_res': res, 'push_res': push_res, 'bytes': len(nzb or '')}
+
+
+def report(name, values):
+    print('   {:<8} p50 {:8.2f} ms   p90 {:8.2f} ms   p99 {:8.2f} ms   max {:8.2f} ms'.format(
+        name, percentile(values, 50) * 1000, percentile(values, 90) * 1000, percentile(values, 99) * 1000,
+        max(values or [0]) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end latency benchmark against the mock server')
+    parser.add_argument('--jobs', type=int, default=20, help='Number of releases to search and push')
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel jobs')
+    parser.add_argument('--target', choices=TARGETS, default='sabnzbd', help='Download target')
+    parser.add_argument('--engines', default='nzbindex:1,nzbking:2,binsearch:3',
+                        help='Search engines and priorities')
+    parser.add_argument('--best-nzb', action='store_true', help='Search all engines for the best NZB')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mock response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Mock random additional delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Mock share of failed requests')
+    parser.add_argument('--files', type=int, default=10, help='Files per NZB')
+    parser.add_argument('--segments', type=int, default=50, help='Segments per file')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for unique release headers')
+    args = parser.parse_args()
+
+    args.engines = {name: int(prio) for name, prio in (item.split(':') for item in args.engines.split(','))}
+
+    server = MockServer(options=MockOptions(args.latency, args.jitter, args.error_rate, args.files,
+                                            args.segments)).start()
+    host, port = server.server_address[:2]
+
+    # Point the real code paths to the mock server and disable the waits for the user
+    nzbmonkey.SEARCH_ENGINES = server.search_engines()
+    nzbmonkey.WAITING_TIME_SHORT = 0
+    nzbmonkey.WAITING_TIME_LONG = 0
+
+    print('NZB-Monkey e2e benchmark - {} jobs, concurrency {}, target {}'.format(args.jobs, args.concurrency,
+                                                                                args.target))
+    start = perf_counter()
+    # The NZB-Monkey output is not needed, redirect it once for all worker threads
+    with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda n: run_job(n, args, host, port), range(args.jobs)))
+    duration = perf_counter() - start
+    server.stop()
+
+    ok = [r for r in results if r['search_res'] == 0 and r['push_res'] == 0]
+    print(' Jobs OK: {} / {} in {:.2f} s - {:.2f} jobs/s - {:.1f} MB NZB data'.format(
+        len(ok), len(results), duration, len(results) / duration, sum(r['bytes'] for r in results) / 1024 ** 2))
+    report('search', [r['search'] for r in results])
+    report('push', [r['push'] for r in results if r['search_res'] == 0])
+    report('total', [r['total'] for r in results])
+    print(' Requests per service:')
+    for service, stats in sorted(server.stats.as_dict().items()):
+        print('   {:<12} {:6d} requests {:4d} errors {:10d} bytes in {:10d} bytes out'.format(
+            service, stats['requests'], stats['errors'], stats['bytes_in'], stats['bytes_out']))
+    return 0 if len(ok) == len(results) or args.error_rate else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
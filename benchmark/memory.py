@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey memory benchmark
+
+    Searches a large NZB on all search engines of the mock server in best NZB mode, pushes it to
+    a target and reports the peak RSS. Every run uses a fresh interpreter, several source trees
+    can be compared, e.g. a checkout before and after a change (Linux and macOS only).
+
+    Example:
+        python benchmark/memory.py run --files 200 --segments 500 --target nzbget --src src /tmp/before/src
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+
+TARGETS = ('sabnzbd', 'nzbget', 'synologydls', 'none')
+
+
+def peak_rss():
+    """Return the peak RSS of this process in MB"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def command_worker(args):
+    """Worker - search and push one NZB with the nzbmonkey of one source tree and print JSON"""
+    sys.path.insert(0, os.path.abspath(args.src))
+    sys.path.insert(0, BENCH_DIR)
+    import nzbmonkey
+    from mockserver import MockServer
+
+    nzbmonkey.SEARCH_ENGINES = MockServer.search_engines(SimpleNamespace(base_url=args.url))
+    nzbmonkey.WAITING_TIME_SHORT = 0
+    nzbmonkey.WAITING_TIME_LONG = 0
+    host, port = args.url.rsplit('/', 1)[-1].split(':')
+    # Load the modules used by search and push before the baseline
+    nzbmonkey.http_session()
+
+    baseline = peak_rss()
+    with redirect_stdout(io.StringIO()):
+        res, nzb, engine = nzbmonkey.search_nzb('nzbmonkey.memory', 'secret', {'binsearch': 1, 'nzbking': 1,
+                                                                                'nzbindex': 1},
+                                                True, 2, 2.5)[:3]
+        searched = peak_rss()
+        push_res = None
+        if args.target == 'sabnzbd':
+            push_res = nzbmonkey.push_nzb_sabnzbd(host, port, False, 'apikey', 'sabnzbd', '', '', '', False,
+                                                  'Memory.Test', nzb)
+        elif args.target == 'nzbget':
+            push_res = nzbmonkey.push_nzb_nzbget(host, port, False, 'nzbget', 'tegbzn6789', 'xmlrpc', '', False,
+                                                 'Memory.Test', nzb)
+        elif args.target == 'synologydls':
+            push_res = nzbmonkey.push_nzb_synologydls(host, port, False, 'admin', 'secret', 'webapi', 'Memory.Test',
+                                                      nzb, 'secret')
+    print(json.dumps({'search_res': res, 'push_res': push_res, 'nzb_mb': len(nzb or b'') / (1024.0 * 1024.0),
+                      'baseline_mb': baseline, 'search_mb': searched, 'peak_mb': peak_rss()}))
+    return 0
+
+
+def run_worker(src, url, target):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), 'worker', '--src', src, '--url', url,
+                             '--target', target], stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def command_run(args):
+    """Start the mock server and measure every source tree"""
+    server = subprocess.Popen([sys.executable, '-u', os.path.join(BENCH_DIR, 'mockserver.py'), '--port', '0',
+                               '--files', str(args.files), '--segments', str(args.segments)],
+                              stdout=subprocess.PIPE)
+    try:
+        m = re.search(r'(http://\S+)', server.stdout.readline().decode('utf-8'))
+        if m is None:
+            print('Mock server did not start')
+            return 1
+        url = m.group(1)
+        print('{:<40} {:>8} {:>10} {:>10} {:>10} {:>10}'.format('Source', 'NZB MB', 'Base MB', 'Search MB',
+                                                                 'Peak MB', 'Delta MB'))
+        errors = 0
+        for src in args.src or [SRC_DIR]:
+            runs = [run_worker(src, url, args.target) for _ in range(max(1, args.repeat))]
+            # The peak of a fresh interpreter varies a little, the smallest one is reported
+            result = min(runs, key=lambda run: run['peak_mb'])
+            if result['search_res'] or result['push_res']:
+                errors += 1
+            print('{:<40} {:>8.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}{}'.format(
+                os.path.relpath(os.path.abspath(src))[-40:], result['nzb_mb'], result['baseline_mb'],
+                result['search_mb'], result['peak_mb'], result['peak_mb'] - result['baseline_mb'],
+                '' if not result['search_res'] and not result['push_res'] else '  FAILED'))
+        return 1 if errors else 0
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the peak RSS of search and push of a large NZB')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Measure one or more source trees')
+    run.add_argument('--src', nargs='*', help='Source trees with nzbmonkey.py, default src')
+    run.add_argument('--files', type=int, default=200, help='Files per NZB')
+    run.add_argument('--segments', type=int, default=500, help='Segments per file')
+    run.add_argument('--target', choices=TARGETS, default='nzbget', help='Push target')
+    run.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per source tree')
+
+    worker = subparsers.add_parser('worker', help=argparse.SUPPRESS)
+    worker.add_argument('--src', required=True)
+    worker.add_argument('--url', required=True)
+    worker.add_argument('--target', choices=TARGETS, default='nzbget')
+
+    args = parser.parse_args()
+    if args.command == 'worker':
+        return command_worker(args)
+    return command_run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,415 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey mock server
+
+    Local stand-in for the search engines (BinSearch, NZBKing, NZBIndex) and the download
+    targets (SABnzbd, NZBGet, Synology DownloadStation). Every service lives under its own
+    path prefix, so one server on one port imitates all of them:
+
+        /binsearch/?q=<header>                  /binsearch/nzb?<id>=on
+        /nzbking/search/?q=<header>             /nzbking/nzb:<id>/
+        /nzbindex/search/rss?q=<header>         /nzbindex/download/<id>/
+        /sabnzbd/api                            mode=addfile (.nzb or .nzb.gz), mode=get_cats
+        /xmlrpc                                 NZBGet XML-RPC append
+        /jsonrpc/config                         NZBGet JSON-RPC config
+        /webapi/auth.cgi                        Synology login
+        /webapi/entry.cgi                       Synology task creation, needs the sid of a login
+
+    Latency, error rate and NZB payload size are configurable globally and per service.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+from urllib.parse import urlparse, parse_qs
+
+SERVICES = ('binsearch', 'nzbking', 'nzbindex', 'sabnzbd', 'nzbget', 'synologydls')
+
+
+class MockOptions(object):
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, files=10, segments=50, segment_bytes=716800,
+                 missing_segments=0, services=None):
+        """Mock server options
+
+        :param float latency: Response delay in seconds
+        :param float jitter: Random additional delay in seconds (0 - jitter)
+        :param float error_rate: Share of requests answered with an error (0.0 - 1.0)
+        :param int files: Files per generated NZB
+        :param int segments: Segments per file of a generated NZB
+        :param int segment_bytes: Bytes value of each segment
+        :param int missing_segments: Segments missing in each file of a generated NZB
+        :param dict services: Per service overrides, e.g. {'nzbindex': {'latency': 0.2}}
+        """
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+        self.files = int(files)
+        self.segments = int(segments)
+        self.segment_bytes = int(segment_bytes)
+        self.missing_segments = int(missing_segments)
+        self.services = services or dict()
+
+    def get(self, service, option):
+        """Return an option, the per service override wins"""
+        return self.services.get(service, {}).get(option, getattr(self, option))
+
+
+class MockStats(object):
+    """Thread safe request counter per service"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = dict()
+        self.errors = dict()
+        self.bytes_in = dict()
+        self.bytes_out = dict()
+
+    def count(self, service, bytes_in, bytes_out, error=False):
+        with self.lock:
+            self.requests[service] = self.requests.get(service, 0) + 1
+            self.bytes_in[service] = self.bytes_in.get(service, 0) + bytes_in
+            self.bytes_out[service] = self.bytes_out.get(service, 0) + bytes_out
+            if error:
+                self.errors[service] = self.errors.get(service, 0) + 1
+
+    def as_dict(self):
+        with self.lock:
+            return {service: {'requests': self.requests[service],
+                              'errors': self.errors.get(service, 0),
+                              'bytes_in': self.bytes_in[service],
+                              'bytes_out': self.bytes_out[service]} for service in self.requests}
+
+
+def release_id(header):
+    """Stable release id for a header"""
+    return hashlib.sha1(header.encode('utf-8')).hexdigest()[:12]
+
+
+def generate_nzb(header, files=10, segments=50, segment_bytes=716800, missing_segments=0):
+    """Generate a NZB with yEnc style subjects the NZB check can verify
+
+    :param str header: Release header, used in every subject
+    :param int files: Number of files
+    :param int segments: Segments per file
+    :param int segment_bytes: Bytes value for each segment
+    :param int missing_segments: Leave out this number of segments per file
+    :return bytes: NZB content
+    """
+    date = int(time()) - 3600
+    rid = release_id(header)
+    out = ['<?xml version="1.0" encoding="utf-8"?>\n'
+           '<!DOCTYPE nzb PUBLIC "-//newzBin//DTD NZB 1.1//EN" "http://www.newzbin.com/DTD/nzb/nzb-1.1.dtd">\n'
+           '<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">\n']
+    for file_no in range(1, files + 1):
+        out.append('<file poster="mock@nzbmonkey.local" date="{0}" subject="{1} [{2}/{3}] - &quot;{4}.part{2:03d}.rar'
+                   '&quot; yEnc (1/{5})">\n<groups>\n<group>alt.binaries.test</group>\n</groups>\n<segments>\n'
+                   .format(date + file_no, header, file_no, files, rid, segments))
+        for segment_no in range(1, segments - missing_segments + 1):
+            out.append('<segment bytes="{0}" number="{1}">{2}.{1}-{3}@mock.local</segment>\n'
+                       .format(segment_bytes, segment_no, rid, segments))
+        out.append('</segments>\n</file>\n')
+    out.append('</nzb>\n')
+    return ''.join(out).encode('utf-8')
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'NZBMonkeyMock/1.0'
+
+    routes = (
+        ('binsearch', 'GET', re.compile(r'^/binsearch/$'), 'binsearch_search'),
+        ('binsearch', 'GET', re.compile(r'^/binsearch/nzb$'), 'binsearch_nzb'),
+        ('nzbking', 'GET', re.compile(r'^/nzbking/search/$'), 'nzbking_search'),
+        ('nzbking', 'GET', re.compile(r'^/nzbking/nzb:(?P<id>[^/]+)/$'), 'download'),
+        ('nzbindex', 'GET', re.compile(r'^/nzbindex/search/rss$'), 'nzbindex_search'),
+        ('nzbindex', 'GET', re.compile(r'^/nzbindex/download/(?P<id>[^/]+)/?$'), 'download'),
+        ('sabnzbd', 'GET', re.compile(r'^/sabnzbd/api$'), 'sabnzbd_api'),
+        ('sabnzbd', 'POST', re.compile(r'^/sabnzbd/api$'), 'sabnzbd_api'),
+        ('nzbget', 'POST', re.compile(r'^/xmlrpc$'), 'nzbget_xmlrpc'),
+        ('nzbget', 'GET', re.compile(r'^/jsonrpc/config$'), 'nzbget_config'),
+        ('synologydls', 'GET', re.compile(r'^/webapi/auth\.cgi$'), 'synology_auth'),
+        ('synologydls', 'POST', re.compile(r'^/webapi/auth\.cgi$'), 'synology_auth'),
+        ('synologydls', 'POST', re.compile(r'^/webapi/entry\.cgi$'), 'synology_entry'),
+    )
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        self.query = parse_qs(url.query, keep_blank_values=True)
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else self.read_chunked()
+
+        for service, route_method, regex, handler in self.routes:
+            m = regex.match(url.path)
+            if m is None or route_method != method:
+                continue
+            options = self.server.options
+            delay = options.get(service, 'latency') + random.uniform(0, options.get(service, 'jitter'))
+            if delay > 0:
+                sleep(delay)
+            if random.random() < options.get(service, 'error_rate'):
+                self.send(service, 500, b'Internal Server Error', 'text/plain', error=True)
+                return
+            getattr(self, handler)(service, **m.groupdict())
+            return
+
+        self.send('unknown', 404, b'Not Found', 'text/plain', error=True)
+
+    def read_chunked(self):
+        """Read a request body sent with chunked transfer encoding"""
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return b''
+        body = bytearray()
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                self.rfile.readline()
+                return bytes(body)
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def send(self, service, status, content, content_type, error=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        self.server.stats.count(service, len(self.body), len(content), error)
+
+    def param(self, name, default=''):
+        return self.query.get(name, [default])[0]
+
+    def nzb(self, service, rid):
+        header = self.server.headers.get(rid)
+        if header is None:
+            self.send(service, 404, b'<html><body>NZB does not exist</body></html>', 'text/html', error=True)
+            return
+        options = self.server.options
+        self.send(service, 200, self.server.get_nzb(header,
+                                                    options.get(service, 'files'),
+                                                    options.get(service, 'segments'),
+                                                    options.get(service, 'segment_bytes'),
+                                                    options.get(service, 'missing_segments')),
+                  'application/x-nzb')
+
+    def remember(self):
+        header = self.param('q')
+        rid = release_id(header)
+        self.server.headers[rid] = header
+        return rid
+
+    # Search engines
+
+    def binsearch_search(self, service):
+        rid = self.remember()
+        self.send(service, 200, '<html><body><table><tr><td><a href="/details/{0}">{0}</a></td></tr></table>'
+                                '</body></html>'.format(rid).encode('utf-8'), 'text/html')
+
+    def binsearch_nzb(self, service):
+        self.nzb(service, next(iter(self.query), ''))
+
+    def nzbking_search(self, service):
+        rid = self.remember()
+        self.send(service, 200, '<html><body><a href="/nzb:{0}/" title="NZB">NZB</a></body></html>'
+                  .format(rid).encode('utf-8'), 'text/html')
+
+    def nzbindex_search(self, service):
+        rid = self.remember()
+        self.send(service, 200, '<?xml version="1.0"?><rss><channel><item><title>{0}</title>'
+                                '<link>https://nzbindex.com/download/{1}/</link></item></channel></rss>'
+                  .format(self.param('q'), rid).encode('utf-8'), 'application/rss+xml')
+
+    def download(self, service, id):
+        self.nzb(service, id)
+
+    # Download targets
+
+    def sabnzbd_api(self, service):
+        mode = self.param('mode') or self.form_value('mode')
+        if mode == 'get_cats':
+            self.send(service, 200, json.dumps({'categories': ['*', 'movies', 'series', 'software']})
+                      .encode('utf-8'), 'application/json')
+        elif mode == 'addfile':
+            if not self.upload_valid():
+                self.send(service, 200, b'<?xml version="1.0" encoding="UTF-8" ?>\n<result><status>False</status>'
+                                        b'<error>Invalid NZB file</error></result>', 'text/xml', error=True)
+                return
+            self.send(service, 200, b'<?xml version="1.0" encoding="UTF-8" ?>\n<result><status>True</status>'
+                                    b'<nzo_ids><item>SABnzbd_nzo_mock</item></nzo_ids></result>', 'text/xml')
+        else:
+            self.send(service, 200, b'<?xml version="1.0" encoding="UTF-8" ?>\n<result><status>False</status>'
+                                    b'<error>not implemented</error></result>', 'text/xml', error=True)
+
+    def upload_valid(self):
+        """Return if the uploaded file is a NZB, .gz files are decompressed"""
+        m = re.search(b'filename="([^"]*)"\r\nContent-Type: [^\r]*\r\n\r\n', self.body)
+        if m is None:
+            return False
+        content = self.body[m.end():self.body.rfind(b'\r\n--')]
+        if m.group(1).endswith(b'.gz'):
+            try:
+                content = gzip.decompress(content)
+            except (OSError, EOFError):
+                return False
+        return b'<nzb' in content[:4096]
+
+    def form_value(self, name):
+        m = re.search(b'name="' + name.encode('ascii') + b'"\r\n\r\n([^\r]*)\r\n', self.body)
+        return m.group(1).decode('utf-8') if m else ''
+
+    def nzbget_xmlrpc(self, service):
+        if b'<methodName>system.multicall</methodName>' in self.body:
+            calls = self.body.count(b'<name>methodName</name><value><string>append</string>')
+            values = ''.join('<value><array><data><value><i4>{}</i4></value></data></array></value>'.format(n)
+                             for n in range(1, calls + 1))
+            result = '<array><data>{}</data></array>'.format(values)
+        else:
+            result = '<i4>1</i4>'
+        self.send(service, 200, '<?xml version="1.0"?><methodResponse><params><param><value>{}</value></param>'
+                                '</params></methodResponse>'.format(result).encode('utf-8'), 'text/xml')
+
+    def nzbget_config(self, service):
+        result = [{'Name': 'MainDir', 'Value': '/downloads'}]
+        result.extend({'Name': 'Option{}'.format(n), 'Value': 'x' * 32} for n in range(400))
+        result.extend({'Name': 'Category{}.Name'.format(n), 'Value': cat}
+                      for n, cat in enumerate(('Movies', 'Series', 'Software'), start=1))
+        self.send(service, 200, json.dumps({'version': '1.1', 'result': result}).encode('utf-8'), 'application/json')
+
+    def synology_auth(self, service):
+        sid = 'mock-sid-{}'.format(random.getrandbits(32))
+        self.server.sids.add(sid)
+        self.send(service, 200, json.dumps({'data': {'sid': sid}, 'success': True},
+                                           separators=(',', ':')).encode('utf-8'), 'application/json')
+
+    def synology_entry(self, service):
+        m = re.search(r'(?:^|;)\s*id=([^;]*)', self.headers.get('Cookie', ''))
+        if m is None or m.group(1) not in self.server.sids:
+            # SID not found
+            self.send(service, 200, b'{"error":{"code":119},"success":false}', 'application/json', error=True)
+            return
+        self.send(service, 200, json.dumps({'data': {'list_id': [], 'task_id': ['dbid_1']}, 'success': True},
+                                           separators=(',', ':')).encode('utf-8'), 'application/json')
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, options=None, verbose=False):
+        """Threaded mock server, use port 0 to get a free port
+
+        :param str host: Listen address
+        :param int port: Listen port
+        :param MockOptions options: Latency, errors and payload options
+        :param bool verbose: Log every request to stderr
+        """
+        ThreadingHTTPServer.__init__(self, (host, port), MockHandler)
+        self.options = options or MockOptions()
+        self.verbose = verbose
+        self.stats = MockStats()
+        self.headers = dict()
+        self.nzb_cache = dict()
+        self.sids = set()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return 'http://{0}:{1}'.format(*self.server_address[:2])
+
+    def get_nzb(self, header, files, segments, segment_bytes, missing_segments):
+        key = (header, files, segments, segment_bytes, missing_segments)
+        if key not in self.nzb_cache:
+            self.nzb_cache[key] = generate_nzb(header, int(files), int(segments), int(segment_bytes),
+                                               int(missing_segments))
+        return self.nzb_cache[key]
+
+    def search_engines(self):
+        """Return search engine definitions like nzbmonkey.SEARCH_ENGINES pointing to this server"""
+        base = self.base_url
+        return {
+            'binsearch': {'name': 'BinSearch',
+                          'searchUrl': base + '/binsearch/?q={0}',
+                          'regex': r'href="/details/(?P<id>[^"]+)"',
+                          'downloadUrl': base + '/binsearch/nzb?{id}=on',
+                          'skip_segment_debug': False},
+            'nzbking': {'name': 'NZBKing',
+                        'searchUrl': base + '/nzbking/search/?q={0}',
+                        'regex': r'href="/nzb:(?P<id>.*?)/".*"',
+                        'downloadUrl': base + '/nzbking/nzb:{id}/',
+                        'skip_segment_debug': True},
+            'nzbindex': {'name': 'NZBIndex',
+                         'searchUrl': base + '/nzbindex/search/rss?q={0}&hidespam=1&sort=agedesc&complete=1',
+                         'regex': r'<link>https:\/\/nzbindex\.com\/download\/(?P<id>[0-9a-f]+)\/?<\/link>',
+                         'downloadUrl': base + '/nzbindex/download/{id}/',
+                         'skip_segment_debug': False}
+        }
+
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, name='mockserver', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock search engines and download targets for NZB-Monkey')
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address')
+    parser.add_argument('--port', type=int, default=8765, help='Listen port')
+    parser.add_argument('--latency', type=float, default=0.0, help='Response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random additional delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of failed requests (0.0 - 1.0)')
+    parser.add_argument('--files', type=int, default=10, help='Files per NZB')
+    parser.add_argument('--segments', type=int, default=50, help='Segments per file')
+    parser.add_argument('--missing-segments', type=int, default=0, help='Missing segments per file')
+    parser.add_argument('--service', action='append', default=[], metavar='NAME:OPTION=VALUE',
+                        help='Per service override, e.g. nzbindex:latency=0.5')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log requests')
+    args = parser.parse_args()
+
+    services = dict()
+    for override in args.service:
+        try:
+            service, option = override.split(':', 1)
+            option, value = option.split('=', 1)
+        except ValueError:
+            parser.error('Invalid service override "{}"'.format(override))
+        if service not in SERVICES:
+            parser.error('Unknown service "{}", use one of {}'.format(service, ', '.join(SERVICES)))
+        services.setdefault(service, dict())[option.replace('-', '_')] = float(value)
+
+    options = MockOptions(args.latency, args.jitter, args.error_rate, args.files, args.segments,
+                          missing_segments=args.missing_segments, services=services)
+    server = MockServer(args.host, args.port, options, args.verbose)
+    print('Mock server listening on {}'.format(server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    print(json.dumps(server.stats.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey performance regression runner
+
+    Replays recorded cassettes (see src/nzbcassette.py) without network delay and measures
+    the CPU time of search (download, parse and check), NZB check and push. Two source trees
+    can be compared on the same cassettes.
+
+    Record a cassette from a real run:
+        NZBMONKEY_CASSETTE=run.json NZBMONKEY_CASSETTE_MODE=record python src/nzbmonkey.py <nzblnk>
+
+    Record a synthetic cassette against the mock server:
+        python benchmark/regression.py record --out big.json --files 200 --segments 400 --target nzbget
+
+    Compare two source trees:
+        python benchmark/regression.py compare --baseline /tmp/old/src --candidate src *.json
+
+    Both source trees must support cassettes (nzbcassette.py and http_session() in nzbmonkey.py), a
+    baseline from before the cassette support can't be compared.
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from time import process_time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+
+
+def push(nzbmonkey, meta, nzb):
+    """Push a NZB with the target settings from the cassette, credentials are dummies"""
+    target = meta.get('target', 'EXECUTE')
+    cfg = meta.get('target_cfg', dict())
+    nzbsrc = meta['nzbsrc']
+    ssl = str(cfg.get('ssl', False)).lower() in ('1', 'true', 'yes', 'on')
+    paused = str(cfg.get('addpaused', False)).lower() in ('1', 'true', 'yes', 'on')
+    category = meta.get('category') or cfg.get('category', '')
+
+    if target == 'SABNZBD':
+        return nzbmonkey.push_nzb_sabnzbd(cfg.get('host'), cfg.get('port'), ssl, 'apikey', cfg.get('basepath'), '',
+                                          '', category, paused, nzbsrc['tag'], nzb)
+    if target == 'NZBGET':
+        return nzbmonkey.push_nzb_nzbget(cfg.get('host'), cfg.get('port'), ssl, 'user', 'pass', cfg.get('basepath'),
+                                         category, paused, nzbsrc['tag'], nzb)
+    if target == 'SYNOLOGYDLS':
+        return nzbmonkey.push_nzb_synologydls(cfg.get('host'), cfg.get('port'), ssl, 'user', 'pass',
+                                              cfg.get('basepath'), nzbsrc['tag'], nzb, nzbsrc['pass'] or '')
+    return None
+
+
+def run_cassette(nzbmonkey, nzbcassette, filename, repeat):
+    """Replay one cassette repeat times and return the best CPU times in seconds"""
+    cassette = nzbcassette.Cassette(filename, 'replay')
+    nzbcassette.mount_cassette(nzbmonkey.http_session(), cassette)
+    meta = cassette.meta
+    if 'nzbsrc' not in meta:
+        return {'error': 'no scenario recorded'}
+    if 'search_defs' in meta:
+        nzbmonkey.SEARCH_ENGINES = meta['search_defs']
+    check = meta.get('nzbcheck', dict())
+    result = {'search': [], 'check': [], 'push': [], 'misses': 0}
+
+    for _ in range(repeat + 1):
+        cassette.rewind()
+        start = process_time()
+        res, nzb, engine = nzbmonkey.search_nzb(meta['nzbsrc']['header'], meta['nzbsrc']['pass'],
+                                                meta['search_engines'],
+                                                str(check.get('best_nzb', True)) == 'True',
+                                                check.get('max_missing_files', 2),
+                                                check.get('max_missing_segments_percent', 2.5),
+                                                str(check.get('skip_failed', True)) == 'True')[:3]
+        result['search'].append(process_time() - start)
+        if res:
+            result['error'] = 'search failed'
+            break
+
+        start = process_time()
+        nzbmonkey.NZBParser(nzb, waiting_time=0).check_completion()
+        result['check'].append(process_time() - start)
+
+        start = process_time()
+        push_res = push(nzbmonkey, meta, nzb)
+        if push_res is not None:
+            result['push'].append(process_time() - start)
+        result['misses'] += cassette.misses
+
+    # The first replay warms up regex and import caches and does not count
+    return {key: min(value[1:] or value) if isinstance(value, list) and value else value
+            for key, value in result.items()}
+
+
+def command_run(args):
+    """Worker - replay cassettes with the nzbmonkey of one source tree and print JSON"""
+    sys.path.insert(0, os.path.abspath(args.src))
+    import nzbmonkey
+    try:
+        import nzbcassette
+    except ImportError:
+        nzbcassette = None
+    if nzbcassette is None or not hasattr(nzbmonkey, 'http_session'):
+        print('{} has no cassette support (nzbcassette.py, http_session)'.format(args.src), file=sys.stderr)
+        return 2
+
+    nzbmonkey.WAITING_TIME_SHORT = 0
+    nzbmonkey.WAITING_TIME_LONG = 0
+
+    results = dict()
+    with redirect_stdout(io.StringIO()):
+        for filename in args.cassettes:
+            results[os.path.basename(filename)] = run_cassette(nzbmonkey, nzbcassette, filename, args.repeat)
+    print(json.dumps(results))
+    return 0
+
+
+def run_worker(src, cassettes, repeat):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), 'run', '--src', src,
+                                      '--repeat', str(repeat)] + cassettes)
+    return json.loads(output.decode('utf-8'))
+
+
+def command_compare(args):
+    """Replay the cassettes with both source trees and compare the CPU times"""
+    try:
+        baseline = run_worker(args.baseline, args.cassettes, args.repeat)
+        candidate = run_worker(args.candidate, args.cassettes, args.repeat)
+    except subprocess.CalledProcessError as e:
+        print('Replay failed with return code {}'.format(e.returncode))
+        return 2
+
+    regressions = 0
+    print('{:<32} {:<7} {:>12} {:>12} {:>8}'.format('Cassette', 'Stage', 'Baseline', 'Candidate', 'Change'))
+    for name in sorted(baseline):
+        for stage in ('search', 'check', 'push'):
+            old, new = baseline[name].get(stage), candidate.get(name, {}).get(stage)
+            if not isinstance(old, float) or not isinstance(new, float):
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            flag = ''
+            if change > args.threshold:
+                regressions += 1
+                flag = ' REGRESSION'
+            print('{:<32} {:<7} {:9.2f} ms {:9.2f} ms {:+7.1f}%{}'.format(name[:32], stage, old * 1000, new * 1000,
+                                                                         change, flag))
+        for result, label in ((baseline[name], 'baseline'), (candidate.get(name, {}), 'candidate')):
+            if result.get('error') or result.get('misses'):
+                print('{:<32} {} - {} {} unmatched request(s)'.format(name[:32], label, result.get('error', ''),
+                                                                      result.get('misses', 0)))
+    return 1 if regressions else 0
+
+
+def command_record(args):
+    """Record a synthetic cassette against the mock server"""
+    os.environ['NZBMONKEY_CASSETTE'] = args.out
+    os.environ['NZBMONKEY_CASSETTE_MODE'] = 'record'
+    sys.path.insert(0, SRC_DIR)
+    import nzbmonkey
+    from mockserver import MockOptions, MockServer
+
+    server = MockServer(options=MockOptions(files=args.files, segments=args.segments)).start()
+    host, port = server.server_address[:2]
+    nzbmonkey.SEARCH_ENGINES = server.search_engines()
+    nzbmonkey.WAITING_TIME_SHORT = 0
+    nzbmonkey.WAITING_TIME_LONG = 0
+
+    target = args.target.upper()
+    basepath = {'SABNZBD': 'sabnzbd', 'NZBGET': 'xmlrpc', 'SYNOLOGYDLS': 'webapi'}.get(target, '')
+    meta = {'nzbsrc': {'tag': args.tag, 'header': args.header, 'pass': args.password},
+            'search_engines': {'binsearch': 3, 'nzbking': 2, 'nzbindex': 1},
+            'search_defs': nzbmonkey.SEARCH_ENGINES,
+            'nzbcheck': {'best_nzb': 'True', 'max_missing_files': 2, 'max_missing_segments_percent': 2.5,
+                         'skip_failed': 'True'},
+            'target': target,
+            'target_cfg': {'host': host, 'port': str(port), 'ssl': False, 'basepath': basepath, 'category': '',
+                           'addpaused': False}}
+    nzbmonkey.http_session()
+    nzbmonkey.record_scenario(**meta)
+    with redirect_stdout(io.StringIO()):
+        res, nzb, engine = nzbmonkey.search_nzb(args.header, args.password, meta['search_engines'], True, 2,
+                                                2.5)[:3]
+        if not res:
+            push(nzbmonkey, meta, nzb)
+    server.stop()
+    print('Recorded {} interaction(s) to {}'.format(len(nzbmonkey.CASSETTE.interactions), args.out))
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay cassettes and compare CPU time between versions')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser('run', help='Replay cassettes with one source tree and print JSON')
+    run.add_argument('--src', default=SRC_DIR, help='Source tree with nzbmonkey.py')
+    run.add_argument('--repeat', type=int, default=5, help='Replays per cassette, the fastest run counts')
+    run.add_argument('cassettes', nargs='+', help='Cassette files')
+    run.set_defaults(func=command_run)
+
+    compare = commands.add_parser('compare', help='Compare two source trees on the same cassettes')
+    compare.add_argument('--baseline', required=True,
+                         help='Source tree of the baseline version, it needs the cassette support')
+    compare.add_argument('--candidate', default=SRC_DIR, help='Source tree of the candidate version')
+    compare.add_argument('--repeat', type=int, default=5, help='Replays per cassette, the fastest run counts')
+    compare.add_argument('--threshold', type=float, default=10.0, help='Allowed slowdown in percent')
+    compare.add_argument('cassettes', nargs='+', help='Cassette files')
+    compare.set_defaults(func=command_compare)
+
+    record = commands.add_parser('record', help='Record a synthetic cassette against the mock server')
+    record.add_argument('--out', required=True, help='Cassette file to write')
+    record.add_argument('--header', default='nzbmonkey.regression.release', help='Header to search for')
+    record.add_argument('--tag', default='NZB.Monkey.Regression', help='Tag of the release')
+    record.add_argument('--password', default='secret', help='Password of the release')
+    record.add_argument('--target', default='sabnzbd', choices=('sabnzbd', 'nzbget', 'synologydls', 'execute'),
+                        help='Download target')
+    record.add_argument('--files', type=int, default=50, help='Files per NZB')
+    record.add_argument('--segments', type=int, default=200, help='Segments per file')
+    record.set_defaults(func=command_record)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey startup benchmark
+
+    Imports nzbmonkey in a fresh interpreter with -X importtime and fails if the import takes
+    longer than the budget or if a module which should be imported lazily is loaded at startup.
+
+    Example:
+        python benchmark/startup.py --budget 120 --repeat 10
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from statistics import median
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Only imported on the code paths which need them
+LAZY_MODULES = ('requests', 'urllib3', 'pyperclip', 'webbrowser', 'xml.etree.ElementTree', 'validate',
+                'nzblnkconfig', 'distutils')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(src):
+    """Import nzbmonkey once and return the import times of nzbmonkey and the modules it imports
+
+    :param str src: Source tree with nzbmonkey.py
+    :return dict: Module name: (self, cumulative, level) in microseconds, level 0 is nzbmonkey
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import nzbmonkey'], cwd=src,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr
+    modules = dict()
+    # A module is reported after the modules it imports
+    for line in output.decode('utf-8', 'replace').splitlines():
+        m = IMPORT_TIME.match(line)
+        if not m:
+            continue
+        level = len(m.group(3)) // 2
+        modules[m.group(4)] = (int(m.group(1)), int(m.group(2)), level)
+        if level == 0:
+            if m.group(4) == 'nzbmonkey':
+                return modules
+            modules = dict()
+    raise RuntimeError('nzbmonkey not found in the -X importtime output')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of nzbmonkey')
+    parser.add_argument('--src', default=SRC_DIR, help='Source tree with nzbmonkey.py')
+    parser.add_argument('--budget', type=float, default=120.0, help='Allowed import time in ms (median)')
+    parser.add_argument('--repeat', type=int, default=7, help='Number of fresh interpreters')
+    parser.add_argument('--top', type=int, default=10, help='Show the slowest direct imports')
+    args = parser.parse_args()
+
+    src = os.path.abspath(args.src)
+    # The first run writes the bytecode cache and does not count
+    measure(src)
+    runs = [measure(src) for _ in range(max(1, args.repeat))]
+    totals = [run['nzbmonkey'][1] / 1000.0 for run in runs]
+    elapsed = median(totals)
+
+    last = runs[-1]
+    direct = sorted(((values[1], name) for name, values in last.items() if values[2] == 1), reverse=True)
+    print('Slowest imports of nzbmonkey:')
+    for cumulative, name in direct[:args.top]:
+        print('  {:>9.2f} ms  {}'.format(cumulative / 1000.0, name))
+
+    errors = 0
+    loaded = [name for name in LAZY_MODULES if name in last]
+    if loaded:
+        errors += 1
+        print('Imported at startup, should be lazy: {}'.format(', '.join(loaded)))
+
+    print('Import time: median {:.2f} ms, min {:.2f} ms, max {:.2f} ms, budget {:.2f} ms'.format(
+        elapsed, min(totals), max(totals), args.budget))
+    if elapsed > args.budget:
+        errors += 1
+        print('Import time over budget')
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    NZB-Monkey write benchmark
+
+    Writes large generated NZBs the way the EXECUTE target saves them and reports the throughput
+    (MB of NZB per second) and the file size for plain and gzip compressed files, every compression
+    level and fsync policy. The direct write without temporary file is the baseline. The generated
+    NZBs compress better than real ones, whose message ids are random.
+
+    Example:
+        python benchmark/write.py --files 200 --segments 500 --levels 1 5 9 --fsync off file full
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+
+
+def write_direct(filename, nzb):
+    """Baseline - write the NZB straight to its final name like NZB-Monkey did before"""
+    with open(filename, 'wb') as f:
+        return nzb.write_to(f)
+
+
+def measure(write, repeat):
+    """Return the best duration of repeat writes and the bytes written"""
+    best = None
+    written = 0
+    for _ in range(max(1, repeat)):
+        start = perf_counter()
+        written = write()
+        duration = perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure write throughput and disk savings of saved NZBs')
+    parser.add_argument('--src', default=SRC_DIR, help='Source tree with nzbrewriter.py')
+    parser.add_argument('--dir', help='Folder for the test files, default a temporary folder')
+    parser.add_argument('--files', type=int, default=200, help='Files per NZB')
+    parser.add_argument('--segments', type=int, default=500, help='Segments per file')
+    parser.add_argument('--levels', type=int, nargs='*', default=[1, 5, 9], help='gzip compression levels')
+    parser.add_argument('--fsync', nargs='*', default=['off', 'file', 'full'], choices=('off', 'file', 'full'),
+                        help='fsync policies')
+    parser.add_argument('--repeat', type=int, default=5, help='Writes per variant, the fastest one counts')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.src))
+    sys.path.insert(0, BENCH_DIR)
+    from mockserver import generate_nzb
+    from nzbrewriter import NZBRewriter, write_atomic
+
+    nzb = generate_nzb('nzbmonkey.write', args.files, args.segments)
+    # Saved NZBs carry the password and name in the <head>
+    rewriter = NZBRewriter(nzb, [('password', 'secret'), ('name', 'Write.Test')])
+    size_mb = len(rewriter) / (1024.0 * 1024.0)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as folder:
+        variants = [('direct', 'off', lambda: write_direct(os.path.join(folder, 'direct.nzb'), rewriter))]
+        for fsync in args.fsync:
+            variants.append(('atomic', fsync, lambda fsync=fsync: write_atomic(os.path.join(folder, 'plain.nzb'),
+                                                                               rewriter, False, fsync=fsync)))
+            for level in args.levels:
+                variants.append(('gzip -{}'.format(level), fsync,
+                                 lambda level=level, fsync=fsync: write_atomic(os.path.join(folder, 'nzb.nzb.gz'),
+                                                                               rewriter, True, level, fsync)))
+
+        print('NZB: {} files x {} segments = {:.1f} MB\n'.format(args.files, args.segments, size_mb))
+        print('{:<10} {:<6} {:>10} {:>10} {:>8}'.format('Variant', 'fsync', 'MB/s', 'File MB', 'Size'))
+        for name, fsync, write in variants:
+            duration, written = measure(write, args.repeat)
+            print('{:<10} {:<6} {:>10.1f} {:>10.2f} {:>7.1f}%'.format(name, fsync, size_mb / max(duration, 1e-9),
+                                                                      written / (1024.0 * 1024.0),
+                                                                      written * 100.0 / len(rewriter)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
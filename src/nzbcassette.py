@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Record and replay HTTP interactions
+
+A cassette is a JSON file with every request and response of a NZB-Monkey run
+(method, URL, sizes, timing, status, headers and body). The CassetteAdapter is
+mounted on the requests session of NZB-Monkey and either records the real
+exchange or answers from the cassette without touching the network.
+
+Enable it with environment variables:
+    NZBMONKEY_CASSETTE=<file>
+    NZBMONKEY_CASSETTE_MODE=record | replay | replay-realtime
+"""
+
+import base64
+import json
+import os
+import threading
+from time import sleep, time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+CASSETTE_VERSION = 1
+MODES = ('record', 'replay', 'replay-realtime')
+
+# Query parameters with credentials, never written to a cassette
+SCRUB_PARAMS = ('apikey', 'nzbkey', 'account', 'passwd', '_sid')
+# Keys of the "data" object of JSON responses with credentials, e.g. the session of the Synology login
+SCRUB_DATA = ('sid',)
+
+
+def scrub_url(url):
+    """Remove credentials from an URL"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, '***' if k.lower() in SCRUB_PARAMS else v) for k, v in parse_qsl(parts.query,
+                                                                                 keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def scrub_body(content):
+    """Remove credentials from a JSON response body"""
+    if not content.lstrip().startswith(b'{'):
+        return content
+    try:
+        data = json.loads(content.decode('utf-8'))
+    except ValueError:
+        return content
+    if not isinstance(data, dict) or not isinstance(data.get('data'), dict):
+        return content
+    keys = [key for key in data['data'] if key.lower() in SCRUB_DATA]
+    if not keys:
+        return content
+    for key in keys:
+        data['data'][key] = '***'
+    return json.dumps(data).encode('utf-8')
+
+
+def body_size(body):
+    """Return the size of a request body"""
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    try:
+        return len(body)
+    except TypeError:
+        return -1
+
+
+class Cassette(object):
+    def __init__(self, filename, mode='replay'):
+        """HTTP cassette
+
+        :param str filename: Cassette file
+        :param str mode: record, replay or replay-realtime (sleep the recorded response time)
+        """
+        if mode not in MODES:
+            raise ValueError('Unknown cassette mode "{}"'.format(mode))
+        self.filename = filename
+        self.mode = mode
+        self.meta = dict()
+        self.interactions = list()
+        self.lock = threading.Lock()
+        self.started = time()
+        self.unused = dict()
+        self.misses = 0
+
+        if mode != 'record':
+            self.load()
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def load(self):
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError('Unsupported cassette version {}'.format(data.get('version')))
+        self.meta = data.get('meta', dict())
+        self.interactions = data.get('interactions', list())
+        self.rewind()
+
+    def rewind(self):
+        """Make every recorded interaction available again"""
+        self.unused = dict()
+        self.misses = 0
+        for interaction in self.interactions:
+            key = (interaction['request']['method'], interaction['request']['url'])
+            self.unused.setdefault(key, list()).append(interaction)
+
+    def save(self):
+        """Write the cassette file"""
+        if not self.recording:
+            return
+        with self.lock:
+            data = {'version': CASSETTE_VERSION, 'meta': self.meta, 'interactions': self.interactions}
+            tmp_file = self.filename + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_file, self.filename)
+
+    def record(self, request, response, elapsed):
+        """Append a request and its response"""
+        content = scrub_body(response.content)
+        interaction = {
+            'offset': round(time() - self.started - elapsed, 6),
+            'elapsed': round(elapsed, 6),
+            'request': {'method': request.method,
+                        'url': scrub_url(request.url),
+                        'bytes': body_size(request.body)},
+            'response': {'status': response.status_code,
+                         'reason': response.reason,
+                         'headers': dict(response.headers),
+                         'bytes': len(content),
+                         'body': base64.b64encode(content).decode('ascii')}
+        }
+        with self.lock:
+            self.interactions.append(interaction)
+
+    def play(self, request):
+        """Return the next recorded interaction for a request or None"""
+        key = (request.method, scrub_url(request.url))
+        with self.lock:
+            queue = self.unused.get(key)
+            if not queue:
+                self.misses += 1
+                return None
+            return queue.pop(0)
+
+
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self, cassette, **kwargs):
+        """Transport adapter recording to or replaying from a cassette
+
+        :param Cassette cassette: Cassette to use
+        """
+        self.cassette = cassette
+        super(CassetteAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.cassette.recording:
+            start = time()
+            response = super(CassetteAdapter, self).send(request, **kwargs)
+            self.cassette.record(request, response, time() - start)
+            return response
+
+        interaction = self.cassette.play(request)
+        if interaction is None:
+            raise ConnectionError('No recorded interaction for {} {}'.format(request.method,
+                                                                            scrub_url(request.url)),
+                                  request=request)
+        if self.cassette.mode == 'replay-realtime':
+            sleep(interaction['elapsed'])
+        return self.build_replay_response(request, interaction['response'])
+
+    @staticmethod
+    def build_replay_response(request, recorded):
+        response = Response()
+        response.status_code = recorded['status']
+        response.reason = recorded['reason']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        # The body is already decoded, do not decode it twice
+        response.headers.pop('Content-Encoding', None)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(recorded['body'])
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def cassette_from_env():
+    """Create a cassette from NZBMONKEY_CASSETTE and NZBMONKEY_CASSETTE_MODE or return None"""
+    filename = os.environ.get('NZBMONKEY_CASSETTE')
+    if not filename:
+        return None
+    return Cassette(filename, os.environ.get('NZBMONKEY_CASSETTE_MODE', 'replay').lower())
+
+
+def mount_cassette(session, cassette):
+    """Mount a cassette for http and https on a requests session"""
+    adapter = CassetteAdapter(cassette)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Catalog of the NZBs saved by the EXECUTE target
+
+Every saved NZB is stored with its release, password, search engine, the outcome of the NZB check and a hash
+of the NZB without the <head>, so an earlier download of a release is found with one index lookup instead of
+a walk through the NZB folder. The catalog is updated whenever a NZB is saved and can be rebuilt from the NZB
+folder, NZBs saved by older versions or copied into the folder are added with what their name and <head> tell.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from html import unescape
+from time import time
+
+from nzbjobs import job_key
+from nzbrewriter import META_TAG, NZBRewriter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nzbs (
+    path TEXT PRIMARY KEY,
+    folder TEXT,
+    key TEXT,
+    tag_key TEXT,
+    tag TEXT,
+    header TEXT,
+    password TEXT,
+    engine TEXT,
+    body_hash TEXT,
+    size INTEGER,
+    mtime REAL,
+    files INTEGER,
+    segments INTEGER,
+    complete INTEGER,
+    files_missing INTEGER,
+    segments_missing_percent REAL,
+    saved REAL
+);
+CREATE INDEX IF NOT EXISTS nzbs_key ON nzbs (key);
+CREATE INDEX IF NOT EXISTS nzbs_tag_key ON nzbs (tag_key);
+CREATE INDEX IF NOT EXISTS nzbs_body_hash ON nzbs (body_hash);
+CREATE INDEX IF NOT EXISTS nzbs_folder ON nzbs (folder);
+"""
+
+# Columns which a rebuild can't tell, they are kept if the NZB content is the same
+CHECK_COLUMNS = ('complete', 'files_missing', 'segments_missing_percent')
+RELEASE_COLUMNS = ('key', 'tag_key', 'tag', 'header', 'engine', 'saved')
+
+COLUMNS = ('path', 'folder', 'key', 'tag_key', 'tag', 'header', 'password', 'engine', 'body_hash', 'size', 'mtime',
+           'files', 'segments', 'complete', 'files_missing', 'segments_missing_percent', 'saved')
+
+# tag{{password}}.nzb
+PASSWORD_NAME = re.compile(r'^(.*)\{\{(.*)\}\}$', re.DOTALL)
+
+
+def body_hash(content):
+    """Return the SHA-1 of a NZB from the first <file> on, the <head> rewritten on save doesn't change it
+
+    :param bytes content: NZB content
+    :return str: hex digest
+    """
+    start = content.find(b'<file')
+    return hashlib.sha1(memoryview(content)[max(start, 0):]).hexdigest()
+
+
+def count_nzb(content):
+    """Return the number of files and segments of a NZB"""
+    return content.count(b'<file '), content.count(b'<segment ')
+
+
+def is_nzb_file(name):
+    return name.endswith('.nzb') or name.endswith('.nzb.gz')
+
+
+def split_nzb_filename(filename):
+    """Return tag and password of a saved NZB
+
+    :param str filename: File name tag{{password}}.nzb or .nzb.gz
+    :return str, str: Tag and password or None
+    """
+    name = os.path.basename(filename)
+    name = name[:-len('.nzb.gz')] if name.endswith('.nzb.gz') else os.path.splitext(name)[0]
+    m = PASSWORD_NAME.match(name)
+    if m is not None:
+        return m.group(1), m.group(2)
+    return name, None
+
+
+def head_meta(content):
+    """Return the meta data of the <head> of a NZB
+
+    :param bytes content: NZB content
+    :return dict: Meta type and value, the first value of a type wins
+    """
+    limit = content.find(b'<file')
+    encoding = NZBRewriter(content).encoding()
+    meta = dict()
+    for m in META_TAG.finditer(content, 0, limit if limit >= 0 else len(content)):
+        meta.setdefault(m.group(1).decode(encoding, 'replace').lower(),
+                        unescape(m.group(2).decode(encoding, 'replace').strip()))
+    return meta
+
+
+def read_nzb(filename):
+    """Return the content of a saved NZB, .nzb.gz files are unpacked
+
+    :raise OSError: NZB can't be read
+    """
+    with open(filename, 'rb') as f:
+        content = f.read()
+    if filename.endswith('.gz'):
+        try:
+            content = gzip.decompress(content)
+        except (EOFError, zlib.error) as e:
+            raise OSError('Broken gzip file {}: {}'.format(filename, e))
+    return content
+
+
+class SavedCheck(object):
+    def __init__(self, complete, files_missing, segments_missing_percent):
+        """Result of the NZB check of a saved NZB
+
+        :param bool complete: NZB passed the completion test
+        :param int files_missing: Number of missing files
+        :param float segments_missing_percent: Missing segments in percent
+        """
+        self.complete = complete
+        self.files_missing = files_missing
+        self.segments_missing_percent = segments_missing_percent
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Return the check result of a catalog row or None if the NZB wasn't checked"""
+        if entry['complete'] is None:
+            return None
+        return cls(bool(entry['complete']), entry['files_missing'], entry['segments_missing_percent'])
+
+
+class Catalog(object):
+    def __init__(self, filename):
+        """SQLite catalog of saved NZBs
+
+        :param str filename: Database file
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        try:
+            self.db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass
+        self.db.executescript(SCHEMA)
+        if os.name != 'nt':
+            try:
+                os.chmod(filename, 0o600)
+            except OSError:
+                pass
+
+    @staticmethod
+    def entry(path, content, tag, header, password, engine, check, stat, saved):
+        """Return a catalog row for a saved NZB"""
+        files, segments = count_nzb(content)
+        return {'path': path,
+                'folder': os.path.dirname(path),
+                'key': job_key({'tag': tag, 'header': header}),
+                'tag_key': ' '.join((tag or '').lower().split()),
+                'tag': tag,
+                'header': header,
+                'password': password or None,
+                'engine': engine,
+                'body_hash': body_hash(content),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'files': files,
+                'segments': segments,
+                'complete': None if check is None else int(check.complete),
+                'files_missing': None if check is None else check.files_missing,
+                'segments_missing_percent': None if check is None else check.segments_missing_percent,
+                'saved': saved}
+
+    def store(self, entries):
+        """Insert or replace rows in one transaction"""
+        if not entries:
+            return
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.executemany('INSERT OR REPLACE INTO nzbs ({}) VALUES ({})'.format(
+                    ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))),
+                    [tuple(entry[column] for column in COLUMNS) for entry in entries])
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+
+    def remove(self, paths):
+        """Remove the rows of NZBs which are gone"""
+        if not paths:
+            return
+        with self.lock:
+            self.db.executemany('DELETE FROM nzbs WHERE path = ?', [(path,) for path in paths])
+
+    def add(self, filename, nzbsrc, engine, nzb, check=None):
+        """Add a NZB which was just saved
+
+        :param str filename: Saved NZB file
+        :param dict nzbsrc: Release with tag, header and pass
+        :param str engine: Search engine the NZB comes from
+        :param nzb: NZB content
+        :type nzb: bytes or NZBRewriter
+        :param check: Result of the NZB check (NZBCandidate or SavedCheck) or None if the NZB wasn't checked
+        :raise OSError: NZB file doesn't exist
+        """
+        path = os.path.abspath(filename)
+        content = nzb.source if isinstance(nzb, NZBRewriter) else nzb
+        self.store([self.entry(path, content, nzbsrc.get('tag'), nzbsrc.get('header'), nzbsrc.get('pass'), engine,
+                               check, os.stat(path), time())])
+
+    def query(self, sql, parameters):
+        """Return rows whose NZB file still exists, newest first, rows of deleted NZBs are removed"""
+        with self.lock:
+            rows = [dict(row) for row in self.db.execute(sql + ' ORDER BY saved DESC', parameters).fetchall()]
+        missing = [row['path'] for row in rows if not os.path.isfile(row['path'])]
+        self.remove(missing)
+        return [row for row in rows if row['path'] not in missing]
+
+    def find(self, nzbsrc):
+        """Return the saved NZBs of a release, newest first
+
+        NZBs added by a rebuild don't know their header, they are found by the tag.
+
+        :param dict nzbsrc: Release with tag and header
+        :return list: Rows as dicts
+        """
+        entries = self.query('SELECT * FROM nzbs WHERE key = ?', (job_key(nzbsrc),))
+        if not entries:
+            entries = self.query('SELECT * FROM nzbs WHERE tag_key = ? AND header IS NULL',
+                                 (' '.join((nzbsrc.get('tag') or '').lower().split()),))
+        return entries
+
+    def find_hash(self, digest):
+        """Return the saved NZBs with the same content, see body_hash
+
+        :param str digest: hex digest
+        :return list: Rows as dicts
+        """
+        return self.query('SELECT * FROM nzbs WHERE body_hash = ?', (digest,))
+
+    @staticmethod
+    def load(entry):
+        """Return the NZB content of a row
+
+        :raise OSError: NZB can't be read
+        """
+        return read_nzb(entry['path'])
+
+    def rebuild(self, folder):
+        """Bring the catalog in line with a NZB folder
+
+        The folder is read with one os.scandir pass, only new and changed NZBs are read. The release, engine and
+        check of a changed NZB are kept if its content is the same.
+
+        :param str folder: NZB folder
+        :return int, int: Number of added or updated and removed rows
+        :raise OSError: Folder can't be read
+        """
+        folder = os.path.abspath(folder)
+        with self.lock:
+            known = {row['path']: dict(row) for row in self.db.execute('SELECT * FROM nzbs WHERE folder = ?',
+                                                                        (folder,))}
+        seen = set()
+        entries = list()
+        with os.scandir(folder) as it:
+            for dir_entry in it:
+                if not is_nzb_file(dir_entry.name):
+                    continue
+                try:
+                    if not dir_entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = dir_entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                path = os.path.join(folder, dir_entry.name)
+                seen.add(path)
+                old = known.get(path)
+                if old is not None and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                    continue
+                try:
+                    content = read_nzb(path)
+                except OSError:
+                    continue
+                tag, password = split_nzb_filename(path)
+                meta = head_meta(content)
+                entry = self.entry(path, content, meta.get('name') or tag, None, meta.get('password') or password,
+                                   None, None, stat, stat.st_mtime)
+                if old is not None and old['body_hash'] == entry['body_hash']:
+                    entry.update((column, old[column]) for column in RELEASE_COLUMNS + CHECK_COLUMNS)
+                entries.append(entry)
+        removed = [path for path in known if path not in seen]
+        self.store(entries)
+        self.remove(removed)
+        return len(entries), len(removed)
+
+    def remove_missing(self, folder):
+        """Remove the rows of a NZB folder whose NZBs were deleted
+
+        :return int: Number of removed rows
+        """
+        with self.lock:
+            paths = [row[0] for row in self.db.execute('SELECT path FROM nzbs WHERE folder = ?',
+                                                       (os.path.abspath(folder),))]
+        removed = [path for path in paths if not os.path.isfile(path)]
+        self.remove(removed)
+        return len(removed)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
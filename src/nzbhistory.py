@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent history of processed releases
+
+Every release is stored once, keyed by the normalized header and tag (see nzbjobs.job_key), with
+the outcome of its last run. The history is shared by all NZB-Monkeys using the same config.
+"""
+
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+from time import sleep, time
+
+from nzbjobs import job_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    key TEXT PRIMARY KEY,
+    tag TEXT,
+    header TEXT,
+    state TEXT,
+    res INTEGER,
+    engine TEXT,
+    target TEXT,
+    category TEXT,
+    nzb_hash TEXT,
+    requests INTEGER DEFAULT 0,
+    pid INTEGER,
+    host TEXT,
+    created REAL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS history_started ON history (started);
+"""
+
+
+class HistoryState(object):
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+def nzb_hash(nzb):
+    """Return the SHA-1 of a NZB
+
+    :param str nzb: NZB content
+    :return str: hex digest
+    """
+    if nzb is None:
+        return None
+    return hashlib.sha1(nzb.encode('utf-8') if isinstance(nzb, str) else nzb).hexdigest()
+
+
+def pid_alive(pid):
+    """Check if a process is running
+
+    :param int pid: Process id
+    :return bool: False if the process doesn't exist
+    """
+    if os.name == 'nt':
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        try:
+            # STILL_ACTIVE
+            return kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)) == 0 or exit_code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class History(object):
+    def __init__(self, filename, stale_after=900):
+        """SQLite history of processed releases
+
+        :param str filename: Database file
+        :param int stale_after: Seconds after which a running release is treated as aborted
+        """
+        self.filename = filename
+        self.stale_after = stale_after
+        self.host = socket.gethostname()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        try:
+            self.db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass
+        self.db.executescript(SCHEMA)
+        if os.name != 'nt':
+            try:
+                os.chmod(filename, 0o600)
+            except OSError:
+                pass
+
+    def get(self, nzbsrc):
+        """Return the history entry of a release or None
+
+        :param dict nzbsrc: Release with tag and header
+        :return dict: Entry
+        """
+        with self.lock:
+            row = self.db.execute('SELECT * FROM history WHERE key = ?', (job_key(nzbsrc),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def is_running(self, entry, now):
+        """Check if an entry is processed right now by a living NZB-Monkey"""
+        if entry['state'] != HistoryState.RUNNING or now - (entry['started'] or 0) >= self.stale_after:
+            return False
+        return entry['host'] != self.host or not entry['pid'] or pid_alive(entry['pid'])
+
+    def begin(self, nzbsrc, duplicate_window, force=False):
+        """Check the history for a release and mark it running if it has to be processed
+
+        :param dict nzbsrc: Release with tag and header
+        :param int duplicate_window: Seconds in which a successfully processed release is a duplicate, 0 = never
+        :param bool force: Process the release even if it's a duplicate
+        :return str, dict: HistoryState.RUNNING if the release is processed by someone else, HistoryState.DONE if
+                           it's a duplicate or None if it has to be processed, and the previous entry
+        """
+        key = job_key(nzbsrc)
+        now = time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.db.execute('SELECT * FROM history WHERE key = ?', (key,)).fetchone()
+                entry = dict(row) if row is not None else None
+                state = None
+                if entry is not None and not force:
+                    if self.is_running(entry, now):
+                        state = HistoryState.RUNNING
+                    elif (entry['state'] == HistoryState.DONE and duplicate_window > 0
+                          and now - (entry['finished'] or 0) < duplicate_window):
+                        state = HistoryState.DONE
+
+                if state is None:
+                    self.db.execute('INSERT INTO history (key, tag, header, state, requests, pid, host, created, '
+                                    'started) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET '
+                                    'tag = excluded.tag, state = excluded.state, requests = requests + 1, '
+                                    'pid = excluded.pid, host = excluded.host, started = excluded.started, '
+                                    'finished = NULL',
+                                    (key, nzbsrc.get('tag'), nzbsrc.get('header'), HistoryState.RUNNING, os.getpid(),
+                                     self.host, now, now))
+                else:
+                    self.db.execute('UPDATE history SET requests = requests + 1 WHERE key = ?', (key,))
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return state, entry
+
+    def finish(self, nzbsrc, result, nzb=None):
+        """Store the outcome of a release
+
+        :param dict nzbsrc: Release with tag and header
+        :param dict result: Result with return code 'res', 'engine', 'target' and 'category'
+        :param str nzb: NZB content for the hash or None
+        """
+        res = result.get('res', 1)
+        with self.lock:
+            self.db.execute('UPDATE history SET state = ?, res = ?, engine = ?, target = ?, category = ?, '
+                            'nzb_hash = COALESCE(?, nzb_hash), finished = ? WHERE key = ?',
+                            (HistoryState.DONE if res == 0 else HistoryState.FAILED, res, result.get('engine'),
+                             result.get('target'), result.get('category'), nzb_hash(nzb), time(),
+                             job_key(nzbsrc)))
+
+    def wait(self, nzbsrc, poll=0.5):
+        """Wait until a release processed by someone else is finished or aborted
+
+        :param dict nzbsrc: Release with tag and header
+        :param float poll: Seconds between the checks
+        :return dict: Entry, state is still HistoryState.RUNNING if it was aborted
+        """
+        while True:
+            entry = self.get(nzbsrc)
+            if entry is None or not self.is_running(entry, time()):
+                return entry
+            sleep(poll)
+
+    def prune(self, max_age):
+        """Forget releases which were not processed for max_age seconds
+
+        :return int: Number of removed entries
+        """
+        with self.lock:
+            return self.db.execute('DELETE FROM history WHERE started < ?', (time() - max_age,)).rowcount
+
+    def close(self):
+        with self.lock:
+            self.db.close()
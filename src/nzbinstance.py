@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Single instance handoff
+
+The first NZB-Monkey listens on a Unix domain socket (a named pipe on Windows). Later
+invocations forward their arguments to it and exit at once.
+"""
+
+import getpass
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+from multiprocessing import AuthenticationError
+
+KEY_BYTES = 32
+
+
+def instance_address(cfg_filename):
+    """Return the address and family for the instance of a config file
+
+    :param str cfg_filename: Path to the config file, every config file has its own instance
+    :return str, str: address, family
+    """
+    name = 'nzbmonkey-{}'.format(hashlib.sha1('{}\n{}'.format(getpass.getuser(), os.path.abspath(cfg_filename))
+                                              .encode('utf-8')).hexdigest()[:12])
+    if os.name == 'nt':
+        return r'\\.\pipe\{}'.format(name), 'AF_PIPE'
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, name + '.sock'), 'AF_UNIX'
+
+
+def instance_authkey(key_filename):
+    """Return the secret shared by all instances of a user, create it if necessary
+
+    :param str key_filename: File for the secret, only readable for the user
+    :return bytes: key
+    """
+    try:
+        with open(key_filename, 'rb') as f:
+            key = f.read()
+        if len(key) == KEY_BYTES:
+            return key
+    except OSError:
+        pass
+
+    key = os.urandom(KEY_BYTES)
+    try:
+        fd = os.open(key_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+    except OSError:
+        pass
+    return key
+
+
+def forward(address, family, authkey, message):
+    """Send a message to the running instance
+
+    :param str address: Instance address
+    :param str family: Address family
+    :param bytes authkey: Shared secret
+    :param dict message: Message, e.g. the command line arguments
+    :return dict: Reply of the running instance or None if there is no running instance
+    """
+    try:
+        conn = Client(address, family, authkey=authkey)
+    except (OSError, AuthenticationError, EOFError):
+        return None
+    try:
+        conn.send_bytes(json.dumps(message).encode('utf-8'))
+        if not conn.poll(10):
+            return None
+        return json.loads(conn.recv_bytes().decode('utf-8'))
+    except (OSError, EOFError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+class InstanceListener(object):
+    def __init__(self, address, family, authkey, handler):
+        """Accept messages from later invocations
+
+        :param str address: Instance address
+        :param str family: Address family
+        :param bytes authkey: Shared secret
+        :param handler: Function called with every message, returns the reply dict
+        """
+        self.address = address
+        self.family = family
+        self.authkey = authkey
+        self.handler = handler
+        self.listener = None
+        self.thread = None
+        self.closed = False
+
+    def listen(self):
+        """Start listening, returns False if another instance is listening"""
+        if self.family == 'AF_UNIX' and os.path.exists(self.address):
+            # A socket without a running instance is left over from a crash
+            if forward(self.address, self.family, self.authkey, {'ping': True}) is not None:
+                return False
+            try:
+                os.unlink(self.address)
+            except OSError:
+                return False
+        try:
+            self.listener = Listener(self.address, self.family, authkey=self.authkey)
+        except OSError:
+            return False
+        if self.family == 'AF_UNIX':
+            os.chmod(self.address, 0o600)
+
+        self.thread = threading.Thread(target=self.serve, name='nzbinstance', daemon=True)
+        self.thread.start()
+        return True
+
+    def serve(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except (OSError, AuthenticationError, EOFError):
+                continue
+            try:
+                message = json.loads(conn.recv_bytes().decode('utf-8'))
+                reply = {'ok': True} if message.get('ping') else self.handler(message)
+                conn.send_bytes(json.dumps(reply).encode('utf-8'))
+            except (OSError, EOFError, ValueError):
+                pass
+            finally:
+                conn.close()
+
+    def close(self):
+        self.closed = True
+        if self.listener is not None:
+            # Wake up the blocking accept
+            forward(self.address, self.family, self.authkey, {'ping': True})
+            self.thread.join(5)
+            self.listener.close()
+            self.listener = None
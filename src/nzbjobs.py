@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Job queue for processing many NZBLNKs in one process
+"""
+
+import io
+import itertools
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import time
+
+
+class JobState(object):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+def job_key(nzbsrc):
+    """Normalized key of a release to detect duplicates
+
+    :param dict nzbsrc: Release with tag and header
+    :return str: key
+    """
+    return '{}\n{}'.format(' '.join((nzbsrc.get('header') or '').lower().split()),
+                           ' '.join((nzbsrc.get('tag') or '').lower().split()))
+
+
+class Job(object):
+    def __init__(self, job_id, nzbsrc, category=None, source='', force=False):
+        """A release to search and push
+
+        :param int job_id: Job id
+        :param dict nzbsrc: Release with tag, header and pass
+        :param str category: Category for the target or None
+        :param str source: Where the job came from e.g. batch line, api
+        :param bool force: Process the release even if it was pushed recently
+        """
+        self.job_id = job_id
+        self.nzbsrc = nzbsrc
+        self.category = category
+        self.source = source
+        self.force = force
+        self.key = job_key(nzbsrc)
+        self.state = JobState.QUEUED
+        self.result = dict()
+        self.log = ''
+        self.created = time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time()) - self.started
+
+    def as_dict(self, with_log=False):
+        data = {'id': self.job_id,
+                'state': self.state,
+                'tag': self.nzbsrc.get('tag'),
+                'header': self.nzbsrc.get('header'),
+                'category': self.category,
+                'source': self.source,
+                'result': self.result,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished,
+                'duration': round(self.duration, 3)}
+        if with_log:
+            data['log'] = self.log
+        return data
+
+
+class JobQueue(object):
+    def __init__(self, handler, workers=4, keep=500, on_done=None):
+        """Process jobs with a pool of worker threads
+
+        The output of every job is captured and stored in job.log, so parallel jobs don't mix up
+        their output. A job for a release which is already queued or running is not added twice,
+        the running job is returned instead.
+
+        :param handler: Function processing a job, returns a result dict with the return code as 'res'
+        :param int workers: Number of worker threads
+        :param int keep: Number of finished jobs to remember
+        :param on_done: Function called with every finished job
+        """
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.keep = keep
+        self.on_done = on_done
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.jobs = OrderedDict()
+        self.active = dict()
+
+    def submit(self, nzbsrc, category=None, source='', force=False):
+        """Add a release to the queue
+
+        :return Job, bool: The job and True if it's a new job, False if it joined a queued or running job
+        """
+        with self.lock:
+            key = job_key(nzbsrc)
+            if key in self.active:
+                return self.active[key], False
+
+            job = Job(next(self.ids), nzbsrc, category, source, force)
+            self.jobs[job.job_id] = job
+            self.active[key] = job
+            self.forget()
+        self.executor.submit(self.run, job)
+        return job, True
+
+    def forget(self):
+        """Drop the oldest finished jobs"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(self.jobs) - self.keep)]:
+            del self.jobs[job_id]
+
+    def run(self, job):
+        job.state = JobState.RUNNING
+        job.started = time()
+        with capture_output() as output:
+            try:
+                job.result = self.handler(job) or dict()
+            except Exception as e:
+                print('   Job failed: {!r}'.format(e))
+                job.result = {'res': 1, 'error': str(e)}
+        job.log = output.getvalue()
+        job.finished = time()
+        job.state = JobState.DONE if job.result.get('res', 1) == 0 else JobState.FAILED
+
+        with self.lock:
+            self.active.pop(job.key, None)
+        job.done.set()
+        if self.on_done:
+            self.on_done(job)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def recent(self, limit=50):
+        """Return the latest jobs, newest first"""
+        with self.lock:
+            return list(reversed(self.jobs.values()))[:limit]
+
+    def pending(self):
+        with self.lock:
+            return len(self.active)
+
+    def wait(self, jobs, timeout=None):
+        """Wait until the jobs are finished"""
+        for job in jobs:
+            job.done.wait(timeout)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+class ThreadOutput(object):
+    """Stream which writes the output of a thread to the thread's capture buffer if one is active
+
+    :Example:
+        sys.stdout = ThreadOutput(sys.stdout)
+        with capture_output() as output:
+            print('Only in output')"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, string):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(string)
+        return self.stream.write(string)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def capture_output():
+    """Capture stdout of the current thread if stdout is a ThreadOutput"""
+    buffer = io.StringIO()
+    stream = sys.stdout
+    if not isinstance(stream, ThreadOutput):
+        yield buffer
+        return
+    previous = getattr(stream.local, 'buffer', None)
+    stream.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        stream.local.buffer = previous
+
+
+# Deadline of the current thread, see deadline
+THREAD_DEADLINE = threading.local()
+
+
+@contextmanager
+def deadline(at):
+    """Let the HTTP requests of the current thread end at a point in time, e.g. the timeout of a target
+
+    :param float at: Deadline as time(), None for no deadline
+    """
+    previous = getattr(THREAD_DEADLINE, 'at', None)
+    THREAD_DEADLINE.at = at
+    try:
+        yield
+    finally:
+        THREAD_DEADLINE.at = previous
+
+
+def time_left():
+    """Return the seconds until the deadline of the current thread or None if it has no deadline"""
+    at = getattr(THREAD_DEADLINE, 'at', None)
+    return None if at is None else at - time()
@@ -3,7 +3,7 @@
 """
 Script for windows/linux configuration
 """
-import distutils.spawn
+import shutil
 from importlib import import_module
 import os
 import os.path as op
@@ -137,7 +137,7 @@ def config_linux():
 
     for terminal in terminals:
         print('   Searching for {0} ...'.format(terminal['term']), end='', flush=True)
-        path = distutils.spawn.find_executable(terminal['term'])
+        path = shutil.which(terminal['term'])
         if path:
             print(Col.OK + ' Found' + Col.OFF)
             desktop_command = '{0} {1}'.format(path, terminal['command'].format('NZB-Monkey', working_dir, script_path))
@@ -185,7 +185,7 @@ def config_linux():
 
     # Add nzblnk to mimeapps.list
     print(' - Add nzblnk to mimeapps.list ...', end='', flush=True)
-    path = distutils.spawn.find_executable('xdg-mime')
+    path = shutil.which('xdg-mime')
     if path:
         if call(('xdg-mime', 'default', 'nzblnk.desktop', 'x-scheme-handler/nzblnk')) == 0:
             print(Col.OK + ' DONE' + Col.OFF)
@@ -6,49 +6,53 @@
 """
 
 import argparse
-import base64
+import atexit
 import io
 import json
-import operator
 import os
+import pickle
 import re
 import sys
-import webbrowser
-import xml.etree.ElementTree as ET
+import threading
+from contextlib import nullcontext
 from enum import Enum
-from glob import glob
+from importlib.util import find_spec
 from os.path import basename, splitext, isfile, join, expandvars
 from pathlib import Path
-from time import sleep, time, localtime, strftime
+from time import sleep, time, localtime, mktime, strftime, strptime
 from urllib.parse import urlparse, parse_qs, quote
 
 from unicodedata import normalize
 
-from nzblnkconfig import check_missing_modules
-
+# requests, pyperclip, webbrowser, xml.etree and validate are imported where they are used,
+# so e.g. a call with NZBLNK doesn't load pyperclip. Check with: python benchmark/startup.py
 try:
-    import pyperclip
-    import requests
-    import urllib3
     from configobj import ConfigObj, SimpleVal
-    from validate import Validator
     from colorama import Fore, init, Style
 
     init()
+    if not all(find_spec(module) for module in ('pyperclip', 'requests', 'urllib3')):
+        raise ImportError
 except ImportError:
+    from nzblnkconfig import check_missing_modules
+
     check_missing_modules()
     sleep(10)
     sys.exit(1)
 
-from nzblnkconfig import config_file, config_nzbmonkey
 from version import __version__
-from nzbmonkeyspec import getSpec
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from nzbmonkeyspec import getSpec, getSpecVersion
+from nzbrewriter import GZIP_LEVEL, NZBRewriter, write_atomic
+from nzbtokenizer import parse_nzblnk, tokenize
 
 WAITING_TIME_LONG = 5
 WAITING_TIME_SHORT = 1
 REQUESTS_TIMEOUT = 20
+# Return code of a push if the target can't be reached, the NZB is kept in the outbox
+TARGET_UNREACHABLE = 2
+# Error pages of the search engines are detected in the start of a download
+NZB_SNIFF_BYTES = 4096
+UNATTENDED = False
 SAVE_STDOUT = sys.stdout
 SAVE_STDERR = sys.stderr
 
@@ -236,7 +240,7 @@ class NZBParser(object):
                  skip_segment_debug=False):
         """Initialize NZB Parser
 
-        :param str,byte nzb_file: nzb file
+        :param str,bytes nzb_file: nzb file, bytes are used without a copy
         :param int max_missing_files: How many files may be missing
         :param float max_missing_segments_percent:  How many segments (in percentage) may be missing
         :param float waiting_time: Waiting time after output
@@ -244,13 +248,14 @@ class NZBParser(object):
         :param bool skip_segment_debug: Skip debug output for segment check - NZBKing removes Segment part from Header
 
         """
-        try:
-            self.nzb = bytearray(nzb_file, encoding='utf-8')
-        except TypeError:
-            pass
+        if isinstance(nzb_file, str):
+            self.nzb = nzb_file.encode('utf-8')
+        else:
+            self.nzb = bytes(nzb_file)
 
         # If a NZB download failed we receive sometimes malformed NZB Files or html.
-        if self.nzb.lower().find(b'does not exist') != -1 or self.nzb.lower().find(b'doctype html') != -1:
+        sniff = self.nzb[:NZB_SNIFF_BYTES].lower()
+        if sniff.find(b'does not exist') != -1 or sniff.find(b'doctype html') != -1:
             self.nzb_malformed = True
             print(Col.WARN + '   Received no NZB from Indexer' + Col.OFF)
         else:
@@ -292,6 +297,7 @@ class NZBParser(object):
 
     @staticmethod
     def get_etree_iter(xml):
+        import xml.etree.ElementTree as ET
 
         return iter(ET.iterparse(io.BytesIO(xml), events=('start', 'end')))
 
@@ -303,6 +309,20 @@ class NZBParser(object):
         """Return missing segments in percent"""
         return self.segments_missing_percent
 
+    def get_groups(self):
+        """Return the newsgroups of all files
+
+        :return set: Newsgroups in lower case"""
+        return {normalize_group(group) for nzbfile in self.files for group in nzbfile.groups if group}
+
+    def get_upload_timestamp(self):
+        """Return the upload time of the first file
+
+        :return int: Timestamp or 0 if not available"""
+        if self.files_min_upload_time == 0:
+            self.determine_time_stamps()
+        return self.files_min_upload_time
+
     def get_upload_start_time(self):
         """Return upload start time in human readable values
 
@@ -650,6 +670,165 @@ class NZBParser(object):
 # region NZB-Download
 
 
+HTTP_SESSION = None
+HTTP_SESSION_LOCK = threading.Lock()
+CASSETTE = None
+# Target settings stored in a cassette, credentials are left out
+SCENARIO_TARGET_KEYS = ('host', 'port', 'ssl', 'basepath', 'category', 'addpaused')
+
+
+def limit_to_deadline(request):
+    """Wrap Session.request, the requests of a thread with a deadline end at the deadline, see nzbjobs.deadline"""
+    import requests
+    from nzbjobs import time_left
+
+    def limited_request(method, url, **kwargs):
+        left = time_left()
+        if left is not None:
+            if left <= 0:
+                raise requests.exceptions.Timeout('Deadline reached')
+            timeout = kwargs.get('timeout')
+            kwargs['timeout'] = left if timeout is None else min(timeout, left)
+        return request(method, url, **kwargs)
+
+    return limited_request
+
+
+def http_session():
+    """Return the shared requests session
+
+    All HTTP requests use this session to reuse connections. If NZBMONKEY_CASSETTE is set, the session
+    records to or replays from a cassette, see nzbcassette.
+
+    :return requests.Session: Session
+    """
+    global HTTP_SESSION, CASSETTE
+
+    if HTTP_SESSION is not None:
+        return HTTP_SESSION
+
+    with HTTP_SESSION_LOCK:
+        if HTTP_SESSION is None:
+            import requests
+            import urllib3
+
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            session = requests.Session()
+            session.request = limit_to_deadline(session.request)
+            if os.environ.get('NZBMONKEY_CASSETTE'):
+                from nzbcassette import cassette_from_env, mount_cassette
+
+                CASSETTE = cassette_from_env()
+                mount_cassette(session, CASSETTE)
+                atexit.register(CASSETTE.save)
+            HTTP_SESSION = session
+    return HTTP_SESSION
+
+
+def record_scenario(**meta):
+    """Store the parameters of a run in the cassette, so the run can be replayed"""
+    if CASSETTE is not None and CASSETTE.recording:
+        CASSETTE.meta.update(meta)
+
+
+# Search engines - searchUrl gets the quoted header, downloadUrl the named groups of regex
+SEARCH_ENGINES = {
+    'binsearch':
+        {
+            'name': 'BinSearch',
+            'searchUrl': 'https://binsearch.info/?q={0}',
+            'regex': r'href="/details/(?P<id>[^"]+)"',
+            'downloadUrl': 'https://binsearch.info/nzb?{id}=on',
+            'skip_segment_debug': False
+        },
+    'nzbking':
+        {
+            'name': 'NZBKing',
+            'searchUrl': 'https://www.nzbking.com/search/?q={0}',
+            'regex': r'href="/nzb:(?P<id>.*?)/".*"',
+            'downloadUrl': 'https://www.nzbking.com/nzb:{id}/',
+            'skip_segment_debug': True
+        },
+    'nzbindex':
+        {
+            'name': 'NZBIndex',
+            'searchUrl': 'https://nzbindex.com/search/rss?q={0}&hidespam=1&sort=agedesc&complete=1',
+            'regex': r'<link>https:\/\/nzbindex\.com\/download\/(?P<id>\d+)\/?<\/link>',
+            'downloadUrl': 'https://nzbindex.com/download/{id}/',
+            'skip_segment_debug': False
+        }
+}
+
+
+# Semaphores per search engine to limit parallel requests in batch mode
+ENGINE_SLOTS = dict()
+
+
+def set_engine_limit(limit):
+    """Limit the parallel requests per search engine
+
+    :param int limit: Max. parallel requests, 0 removes the limit
+    """
+    ENGINE_SLOTS.clear()
+    if limit > 0:
+        for engine in SEARCH_ENGINES:
+            ENGINE_SLOTS[engine] = threading.BoundedSemaphore(limit)
+
+
+def engine_slot(engine):
+    """Return a context manager to wait for a free slot of a search engine"""
+    return ENGINE_SLOTS.get(engine) or nullcontext()
+
+
+# Allowed difference between the post date of a NZBLNK and the upload of a NZB, covers time zones and long uploads
+POST_DATE_TOLERANCE = 2 * 86400
+
+
+def parse_post_date(date):
+    """Return the post date of a NZBLNK as timestamp
+
+    :param str date: Date as DD.MM.YYYY, YYYY-MM-DD or unix timestamp
+    :return int: Timestamp or None if the date is missing or invalid
+    """
+    if not date:
+        return None
+    date = date.strip()
+    if date.isdigit():
+        return int(date)
+    for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return int(mktime(strptime(date, date_format)))
+        except (ValueError, OverflowError):
+            pass
+    return None
+
+
+def normalize_group(group):
+    """Return a newsgroup in lower case, a.b. is expanded to alt.binaries."""
+    group = group.strip().lower()
+    if group.startswith('a.b.'):
+        group = 'alt.binaries.' + group[4:]
+    return group
+
+
+def hint_mismatches(nzb_check, groups=None, post_date=None):
+    """Count the hints of a NZBLNK a NZB doesn't match, e.g. the NZB of another repost
+
+    :param NZBParser nzb_check: Checked NZB
+    :param list groups: Newsgroups of the release
+    :param int post_date: Post date as timestamp
+    :return int: 0 = NZB matches or no hints, 1 = group or date mismatch, 2 = both
+    """
+    mismatches = 0
+    nzb_groups = nzb_check.get_groups()
+    if groups and nzb_groups and nzb_groups.isdisjoint(normalize_group(group) for group in groups):
+        mismatches += 1
+    upload_time = nzb_check.get_upload_timestamp()
+    if post_date is not None and upload_time and abs(upload_time - post_date) > POST_DATE_TOLERANCE:
+        mismatches += 1
+    return mismatches
+
+
 class NZBDownload(object):
     """Search for NZB on one and download. Return NZB content if download was successful.
 
@@ -676,10 +855,12 @@ class NZBDownload(object):
     def search_nzb_url(self):
         """Search for NZB Download URL and return the URL
         :return bool, str: """
+        import requests
+
         try:
             self.header = self.header.replace('_', ' ')
-            res = requests.get(self.search_url.format(quote(self.header, encoding='utf-8')),
-                               timeout=REQUESTS_TIMEOUT, headers={'Cookie': 'agreed=true'}, verify=False)
+            res = http_session().get(self.search_url.format(quote(self.header, encoding='utf-8')),
+                                     timeout=REQUESTS_TIMEOUT, headers={'Cookie': 'agreed=true'}, verify=False)
         except requests.exceptions.Timeout:
             print(Col.WARN + ' Timeout' + Col.OFF, flush=True)
             return False, None
@@ -699,19 +880,21 @@ class NZBDownload(object):
     def download_nzb(self):
         """Download NZB and return the NZB content
 
-        :returns bool, str:"""
+        :returns bool, bytes:"""
         if not self.nzb_url:
             res, _ = self.search_nzb_url()
             if not res:
                 return False, None
+        import requests
+
         try:
             urlparam = self.nzb_url.split('\t')
             headers = {'Content-Type': 'application/x-www-form-urlencoded'}
             if len(urlparam) > 1:
-                res = requests.post(urlparam[0], data=urlparam[1], headers=headers, timeout=REQUESTS_TIMEOUT,
-                                    verify=False)
+                res = http_session().post(urlparam[0], data=urlparam[1], headers=headers, timeout=REQUESTS_TIMEOUT,
+                                          verify=False)
             else:
-                res = requests.get(self.nzb_url, timeout=REQUESTS_TIMEOUT, verify=False)
+                res = http_session().get(self.nzb_url, timeout=REQUESTS_TIMEOUT, verify=False)
         except requests.exceptions.Timeout:
             print(Col.WARN + ' Timeout' + Col.OFF, flush=True)
             return False, None
@@ -725,16 +908,163 @@ class NZBDownload(object):
 
         print(Col.OK + ' DONE' + Col.OFF)
 
-        self.nzb = res.text
+        self.nzb = res.content
 
         return True, self.nzb
 
 
+class NZBCandidate(object):
+    def __init__(self, engine_name, nzb_check, complete, mismatches=0):
+        """Compact summary of a downloaded and checked NZB
+
+        :param str engine_name: Name of the search engine
+        :param NZBParser nzb_check: Checked NZB
+        :param bool complete: NZB passed the completion test
+        :param int mismatches: Hints of the NZBLNK the NZB doesn't match
+        """
+        self.engine_name = engine_name
+        self.files_missing = nzb_check.get_files_missing()
+        self.segments_missing_percent = nzb_check.get_segments_missing_percent()
+        self.complete = complete
+        self.upload_start_time = nzb_check.get_upload_start_time()
+        self.upload_duration = nzb_check.get_upload_duration()
+        self.upload_age = nzb_check.get_upload_age()
+        self.mismatches = mismatches
+
+    @property
+    def rank(self):
+        """Lower is better: complete, matching the hints of the NZBLNK, fewest missing files and segments"""
+        return not self.complete, self.mismatches, self.files_missing, self.segments_missing_percent
+
+
+class BestNZB(object):
+    def __init__(self):
+        """Best NZB of all candidates, only the content of the best NZB is kept"""
+        self.candidate = None
+        self.nzb = None
+        self.count = 0
+        self.hashes = set()
+        self.lock = threading.Lock()
+        # Set when a NZB good enough to stop all searches was found
+        self.found = threading.Event()
+
+    def offer(self, candidate, nzb):
+        """Compare a candidate with the best NZB so far, the same NZB from another header or engine is ignored
+
+        :param NZBCandidate candidate: Summary of the NZB
+        :param bytes nzb: NZB content
+        :return bool: True if the candidate is the new best NZB
+        """
+        import hashlib
+
+        digest = hashlib.sha1(nzb).digest()
+        with self.lock:
+            if digest in self.hashes:
+                return False
+            self.hashes.add(digest)
+            self.count += 1
+            # On a tie the NZB found first wins
+            if self.candidate is not None and not candidate.rank < self.candidate.rank:
+                return False
+            self.candidate = candidate
+            self.nzb = nzb
+            return True
+
+
+def search_header(header, active_search_engines, best, best_nzb, max_missing_files, max_missing_segments_percent,
+                  skip_failed=True, debug=False, groups=None, post_date=None):
+    """Search and check the NZB files of one header on the active search engines
+
+    :param str header: Header to search for
+    :param dict active_search_engines: Priority: list of search engines
+    :param BestNZB best: Receives the downloaded NZBs, the search stops when a NZB for any header is good enough
+    :param bool best_nzb: Search for best incomplete NZB if no complete NZB available
+    :param int max_missing_files: How many missing files until NZB  file check failed
+    :param int max_missing_segments_percent: How many missing segments (in percent) until NZB segment check failed
+    :param bool skip_failed: Skip download for failed NZB files
+    :param bool debug: Enable verbose output
+    :param list groups: Newsgroups of the release or None
+    :param int post_date: Post date of the release as timestamp or None
+    """
+    for prio in sorted(active_search_engines):
+        for engine in active_search_engines[prio]:
+            if best.found.is_set():
+                return
+            print('   with {} ...'.format(SEARCH_ENGINES[engine]['name']), end='', flush=True)
+
+            with engine_slot(engine):
+                result, nzb = NZBDownload(SEARCH_ENGINES[engine]['searchUrl'],
+                                          SEARCH_ENGINES[engine]['regex'],
+                                          SEARCH_ENGINES[engine]['downloadUrl'],
+                                          header).download_nzb()
+            if not result:
+                continue
+            if best.found.is_set():
+                print('     Check skipped, a complete NZB was found')
+                return
+
+            nzb_check = NZBParser(nzb,
+                                  max_missing_files,
+                                  max_missing_segments_percent,
+                                  WAITING_TIME_SHORT if best_nzb else WAITING_TIME_LONG,
+                                  debug,
+                                  SEARCH_ENGINES[engine]['skip_segment_debug'])
+            nzb_complete, _ = nzb_check.check_completion()
+            mismatches = hint_mismatches(nzb_check, groups, post_date)
+            if mismatches:
+                print(Col.WARN + '     NZB does not match the group or date of the NZBLNK' + Col.OFF)
+            candidate = NZBCandidate(SEARCH_ENGINES[engine]['name'], nzb_check, nzb_complete, mismatches)
+            # The parsed files are not needed any more
+            del nzb_check
+
+            # NZB is complete
+            if nzb_complete:
+                best.offer(candidate, nzb)
+                # Stop downloading more NZB files, a NZB of another repost doesn't stop the search
+                if not mismatches and (not best_nzb or (candidate.files_missing == 0
+                                                        and candidate.segments_missing_percent == 0.0)):
+                    best.found.set()
+
+            # NZB not complete. Add NZB if we allow incomplete NZBs, a complete NZB is always better
+            elif not skip_failed:
+                best.offer(candidate, nzb)
+
+
+def search_headers(headers, active_search_engines, best, best_nzb, max_missing_files, max_missing_segments_percent,
+                   skip_failed=True, debug=False, groups=None, post_date=None):
+    """Search several headers e.g. reposts of a release in parallel
+
+    The output of every header is printed in one piece when its search is done.
+
+    :param list headers: Headers to search for
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from nzbjobs import ThreadOutput, capture_output
+
+    def search(header):
+        with capture_output() as output:
+            print('   Header {}'.format(header))
+            search_header(header, active_search_engines, best, best_nzb, max_missing_files,
+                          max_missing_segments_percent, skip_failed, debug, groups, post_date)
+        return output.getvalue()
+
+    stdout = sys.stdout
+    if not isinstance(stdout, ThreadOutput):
+        sys.stdout = ThreadOutput(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=len(headers), thread_name_prefix='header') as executor:
+            for output in executor.map(search, headers):
+                stdout.write(output)
+    finally:
+        sys.stdout = stdout
+
+
 def search_nzb(header, password, search_engines, best_nzb, max_missing_files, max_missing_segments_percent,
-               skip_failed=True, debug=False):
+               skip_failed=True, debug=False, groups=None, post_date=None):
     """Search for NZB file on several search engines and returns a NZB if successful
 
-    :param str header: Header to search for
+    :param header: Header to search for or list of headers of the same release, e.g. reposts
+    :type header: str or list
     :param str password: NZB password
     :param dict search_engines: List with search engines and their priority
     :param bool best_nzb: Search for best incomplete NZB if no complete NZB available
@@ -742,174 +1072,151 @@ def search_nzb(header, password, search_engines, best_nzb, max_missing_files, ma
     :param int max_missing_segments_percent: How many missing segments (in percent) until NZB segment check failed
     :param bool skip_failed: Skip download for failed NZB files
     :param bool debug: Enable verbose output
-    :returns int, str, str: Return code, NZB content, search engine name. Return code 0 is OK, return code > 0 is NOK
+    :param list groups: Newsgroups of the release to rank the NZBs or None
+    :param int post_date: Post date of the release as timestamp to rank the NZBs or None
+    :returns int, NZBRewriter, str: Return code, NZB content or None, search engine name. Return code 0 is OK,
+                                    return code > 0 is NOK
     """
     print(' - Searching NZB{}'.format(' - Search for best NZB enabled' if best_nzb else ''))
+    if groups or post_date is not None:
+        print('   prefer NZBs in {} posted {}'.format(', '.join(groups) if groups else 'all groups',
+                                          strftime('%Y-%m-%d', localtime(post_date)) if post_date is not None
+                                          else 'any time'))
 
-    search_defs = {
-        'binsearch':
-            {
-                'name': 'BinSearch',
-                'searchUrl': 'https://binsearch.info/?q={0}',
-                'regex': r'href="/details/(?P<id>[^"]+)"',
-                'downloadUrl': 'https://binsearch.info/nzb?{id}=on',
-                'skip_segment_debug': False
-            },
-        'nzbking':
-            {
-                'name': 'NZBKing',
-                'searchUrl': 'https://www.nzbking.com/search/?q={0}',
-                'regex': r'href="/nzb:(?P<id>.*?)/".*"',
-                'downloadUrl': 'https://www.nzbking.com/nzb:{id}/',
-                'skip_segment_debug': True
-            },
-        'nzbindex':
-            {
-                'name': 'NZBIndex',
-                'searchUrl': 'https://nzbindex.com/search/rss?q={0}&hidespam=1&sort=agedesc&complete=1',
-                'regex': r'<link>https:\/\/nzbindex\.com\/download\/(?P<id>\d+)\/?<\/link>',
-                'downloadUrl': 'https://nzbindex.com/download/{id}/',
-                'skip_segment_debug': False
-            }
-    }
-
-    downloaded_nzbs = list()
     active_search_engines = dict()
 
     for engine in search_engines:
-        if engine not in search_defs:
+        if engine not in SEARCH_ENGINES:
             print('   with {}{} is no valid value for search engines{}'.format(engine, Col.FAIL, Col.OFF))
             continue
         priority = int(search_engines[engine])
         if priority == 0:
-            print('   with {} ... {}Disabled{}'.format(search_defs[engine]['name'], Col.OK, Col.OFF))
+            print('   with {} ... {}Disabled{}'.format(SEARCH_ENGINES[engine]['name'], Col.OK, Col.OFF))
             continue
         if priority < 0 or priority > 9:
-            print('   with {} ... {}Only values between 0-9 allowed!{}'.format(search_defs[engine]['name'], Col.FAIL,
-                                                                               Col.OFF))
+            print('   with {} ... {}Only values between 0-9 allowed!{}'.format(SEARCH_ENGINES[engine]['name'],
+                                                                               Col.FAIL, Col.OFF))
             continue
         if priority not in active_search_engines:
             active_search_engines[priority] = list()
         active_search_engines[priority].append(engine)
 
-    found_complete_nzb = False
+    best = BestNZB()
+    headers = [header] if isinstance(header, str) else list(dict.fromkeys(header))
+    if len(headers) > 1:
+        search_headers(headers, active_search_engines, best, best_nzb, max_missing_files,
+                       max_missing_segments_percent, skip_failed, debug, groups, post_date)
+    else:
+        search_header(headers[0], active_search_engines, best, best_nzb, max_missing_files,
+                      max_missing_segments_percent, skip_failed, debug, groups, post_date)
 
-    for prio in sorted(active_search_engines):
-        for engine in active_search_engines[prio]:
-            if found_complete_nzb:
-                continue
-            print('   with {} ...'.format(search_defs[engine]['name']), end='', flush=True)
+    # No NZB download
+    if best.candidate is None:
+        print(Col.FAIL + '\nNo NZB downloaded!\n' + Col.OFF, flush=True)
+        return 2, None, ''
 
-            result, nzb = NZBDownload(search_defs[engine]['searchUrl'],
-                                      search_defs[engine]['regex'],
-                                      search_defs[engine]['downloadUrl'],
-                                      header).download_nzb()
-            if not result:
-                continue
+    candidate = best.candidate
+    nzb = best.nzb
+    print('\n   use NZB from {}'.format(candidate.engine_name), flush=True)
+    print('     Upload age:      {}'.format(candidate.upload_age))
+    if debug:
+        print('     Upload started:  {}'.format(candidate.upload_start_time))
+        print('     Upload duration: {}'.format(candidate.upload_duration))
+    # Output warning if we push a failed NZB
+    if not candidate.complete:
+        print(Col.FAIL + '\n     You use a NZB with a failed completion test!\n' + Col.OFF, flush=True)
+        pause(WAITING_TIME_LONG)
 
-            nzb_check = NZBParser(nzb,
-                                  max_missing_files,
-                                  max_missing_segments_percent,
-                                  WAITING_TIME_SHORT if best_nzb else WAITING_TIME_LONG,
-                                  debug,
-                                  search_defs[engine]['skip_segment_debug'])
-            nzb_complete, _ = nzb_check.check_completion()
+    # inject password into nzb file when it's written, see: http://wiki.sabnzbd.org/nzb-specs
+    return 0, NZBRewriter(nzb, [('password', password)], check=candidate), candidate.engine_name
 
-            tmp_nzb = [search_defs[engine]['name'],
-                       nzb,
-                       nzb_check.get_files_missing(),
-                       nzb_check.get_segments_missing_percent(),
-                       nzb_complete,
-                       nzb_check.get_upload_start_time(),
-                       nzb_check.get_upload_duration(),
-                       nzb_check.get_upload_age()]
-            # NZB is complete
-            if nzb_complete:
-                tmp_nzb.append(True)
-                downloaded_nzbs.append(tmp_nzb)
-                # Stop downloading more NZB files
-                if not best_nzb or (tmp_nzb[2] == 0 and tmp_nzb[3] == 0.0):
-                    found_complete_nzb = True
 
-            # NZB not complete. Add NZB if no complete NZB until now and we allow incomplete NZBs
-            elif not downloaded_nzbs and not skip_failed:
-                tmp_nzb.append(False)
-                downloaded_nzbs.append(tmp_nzb)
+# endregion
 
-    # No NZB download
-    if not downloaded_nzbs:
-        print(Col.FAIL + '\nNo NZB downloaded!\n' + Col.OFF, flush=True)
-        return 2, '', ''
+# region  Misc Tools
 
-    res_best_nzb = get_best_nzb(downloaded_nzbs)
-    nzb = res_best_nzb[1]
-    if res_best_nzb:
-        print('\n   use NZB from {}'.format(res_best_nzb[0]), flush=True)
-        print('     Upload age:      {}'.format(res_best_nzb[7]))
-        if debug:
-            print('     Upload started:  {}'.format(res_best_nzb[5]))
-            print('     Upload duration: {}'.format(res_best_nzb[6]))
-        # Output warning if we push a failed NZB
-        if not res_best_nzb[4]:
-            print(Col.FAIL + '\n     You use a NZB with a failed completion test!\n' + Col.OFF, flush=True)
-            sleep(WAITING_TIME_LONG)
-
-    # inject password into nzb file, see: http://wiki.sabnzbd.org/nzb-specs
-    if password is not None and nzb.find('<head>') < 0:
-        # Check for illegal characters in xml &, <, >, " and '
-        if re.search('[&"\'<>]', password) is not None:
-            print(Col.WARN + ' - Can\'t inject password in NZB file, forbidden characters included.' + Col.OFF)
-        else:
-            nzb = nzb.replace('</nzb>', '<head><meta type="password">%s</meta></head></nzb>' % password)
-    return 0, nzb, res_best_nzb[0]
 
+def clean_nzb_folder(source_path, max_age=2, max_size=0, keep_since=None):
+    """Delete old NZB files (.nzb and .nzb.gz) and return the number of deleted files
 
-def get_best_nzb(nzb_downloads):
-    """Sort the NZB to return the first complete or best incomplete NZB
+    The folder is read in one pass with os.scandir. First all files older than max_age days are deleted, then
+    the least recently used files until the folder is below max_size.
 
-    :param nzb_downloads: NZB downloads
-    :returns: list with values from best NZB
+    :param str source_path: Folder to search for NZB files
+    :param max_age: Max NZB file age in days, 0 deletes all NZB files
+    :param int max_size: Max size of all NZB files in bytes, 0 = no limit
+    :param float keep_since: Keep the files modified since this time, e.g. the NZB which was just saved
+    :returns int: number of deleted files, -1 if the folder can't be read
     """
-    # Only one NZB file
-    if len(nzb_downloads) == 1:
-        return nzb_downloads[0]
+    max_age = int(max_age) * 24 * 3600
+    current_time = time()
+    files = list()
+    try:
+        with os.scandir(source_path) as it:
+            for entry in it:
+                if not (entry.name.endswith('.nzb') or entry.name.endswith('.nzb.gz')):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                # Last use, the access time is only updated now and then by most file systems
+                files.append((max(stat.st_mtime, stat.st_atime), stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        print(Col.FAIL + '  OSError: {}'.format(e) + Col.OFF)
+        return -1
 
-    sorted_nzb = sorted(nzb_downloads, key=operator.itemgetter(2, 3))
-    return sorted_nzb[0]
+    files.sort()
+    total = sum(size for _, _, size, _ in files)
+    deleted = 0
+    for used, modified, size, path in files:
+        if not (current_time - modified >= max_age or max_size and total > max_size) or \
+                keep_since is not None and modified >= keep_since:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
 
 
-# endregion
+CLEAN_UP_LOCK = threading.Lock()
 
-# region  Misc Tools
 
+def start_clean_up(nzb_folder, max_age, max_size, catalog_filename=None, keep_since=None):
+    """Clean up the NZB folder in the background, only one clean up runs at a time
 
-def clean_nzb_folder(source_path, max_age=2):
-    """Delete NZB files older than max_days and returns nu,ber of deleted files
+    NZB-Monkey waits for the clean up before it exits, the push isn't delayed.
 
-     :param source_path: Folder to search for NZB files
-     :param max_age: Max NZB file age
-     :returns: number of deleted files
-     """
-    if not os.path.exists(source_path):
-        return -1
-    current_time = time()
-    try:
-        files = list()
-        file_list = glob(os.path.join(source_path, '*.nzb'))
-        for f in file_list:
-            if not os.path.isfile(f):
-                continue
-            modification_time = os.path.getmtime(f)
-            if (current_time - modification_time) // (24 * 3600) >= int(max_age):
-                files.append(f)
-        for f in files:
-            os.remove(f)
-        return len(files)
+    :param str nzb_folder: NZB folder
+    :param max_age: Max NZB file age in days, 0 deletes all NZB files
+    :param int max_size: Max size of all NZB files in bytes, 0 = no limit
+    :param str catalog_filename: Catalog of saved NZBs to remove the deleted NZBs from or None
+    :param float keep_since: Keep the files modified since this time, e.g. the NZB which was just saved
+    :return threading.Thread: Thread or None if a clean up is running already
+    """
+    if not CLEAN_UP_LOCK.acquire(blocking=False):
+        return None
 
-    except OSError as e:
-        print(Col.FAIL + '  OSError: {}'.format(e) + Col.OFF)
+    def run():
+        try:
+            counter = clean_nzb_folder(nzb_folder, max_age, max_size, keep_since)
+            if counter == -1:
+                print(Col.FAIL + ' - Cleaning the NZB folder failed.' + Col.OFF, flush=True)
+            elif counter > 0:
+                print(Col.OK + ' - Clean up deleted {} NZB file(s)'.format(counter) + Col.OFF, flush=True)
+                if catalog_filename:
+                    remove_from_catalog(catalog_filename, nzb_folder)
+        finally:
+            CLEAN_UP_LOCK.release()
 
-    return -1
+    thread = threading.Thread(target=run, name='clean-up')
+    thread.start()
+    return thread
 
 
 def check_folder(path):
@@ -930,6 +1237,25 @@ def check_folder(path):
     return result
 
 
+def set_unattended(unattended):
+    """Disable all waiting times for the user e.g. in batch mode
+
+    :param bool unattended: Skip waiting times if True
+    """
+    global UNATTENDED
+    UNATTENDED = unattended
+
+
+def pause(wait_time):
+    """Wait to give the user the chance to read the output, if not unattended
+
+    :param wait_time: Waiting time
+    :type wait_time: float, int
+    """
+    if not UNATTENDED:
+        sleep(float(wait_time))
+
+
 def print_and_wait(text, wait_time):
     """Print String and wait
 
@@ -939,7 +1265,7 @@ def print_and_wait(text, wait_time):
     :type wait_time: float, int
     """
     print(text)
-    sleep(float(wait_time))
+    pause(wait_time)
 
 
 class Writers(object):
@@ -1037,8 +1363,30 @@ def sec_to_time(seconds, days_only=False, ):
 # region NZB Targets
 
 
+def sabnzbd_client(host, port, ssl, api_key, basepath, basicauth_username, basicauth_password):
+    """Return the shared SABnzbd client for a SABnzbd instance
+
+    :param str host: SABnzbd Hostname or IP
+    :param str port: SABnzbd Port
+    :param bool ssl: Use https
+    :param str api_key: SABnzbd Api Key
+    :param str basepath: Basepath where SABnzbd lives
+    :param str basicauth_username: Username for Basic Auth
+    :param str basicauth_password: Password for Basic Auth
+    :return nzbtargets.SABnzbdClient: Client
+    """
+    from nzbtargets import SABnzbdClient, get_client
+
+    auth = None
+    if basicauth_username and basicauth_password:
+        auth = (basicauth_username, basicauth_password)
+    return get_client(SABnzbdClient, http_session(),
+                      '{0}://{1}:{2}/{3}/api'.format('https' if ssl else 'http', host, port, basepath),
+                      auth, REQUESTS_TIMEOUT, api_key=api_key)
+
+
 def push_nzb_sabnzbd(host, port, ssl, api_key, basepath, basicauth_username, basicauth_password, category, paused,
-                     sabnzbd_name, nzb_content, start_message='Pushing to SABNZBD', debug=False):
+                     sabnzbd_name, nzb_content, start_message='Pushing to SABNZBD', debug=False, compress=True):
     """Push a NZB to SABnzbd
 
     :param str host: SABnzbd Hostname or IP
@@ -1051,53 +1399,59 @@ def push_nzb_sabnzbd(host, port, ssl, api_key, basepath, basicauth_username, bas
     :param str category: SABnzbd Category
     :param str paused: Add the nzb paused
     :param str sabnzbd_name: Name of the SABnzbd job. To send also the RAR password add {{password}} to the job name
-    :param str nzb_content: Content for the NZB File upload
+    :param nzb_content: Content for the NZB File upload
+    :type nzb_content: bytes or NZBRewriter
     :param str start_message: Customized start message
     :param bool debug: Verbose output
+    :param bool compress: Upload the NZB as .nzb.gz
 
-    :returns int: Return code 0 is OK, return code > 0 is NOK
+    :returns int: Return code 0 is OK, return code > 0 is NOK, TARGET_UNREACHABLE if the target can't be reached
     """
 
     print(start_message, end='', flush=True)
 
-    scheme = 'https' if ssl else 'http'
-    req_url = '{0}://{1}:{2}/{3}/api'.format(scheme, host, port, basepath)
-
-    post_data = {
-        'output': 'xml',
-        'mode': 'addfile',
-        'nzbname': sabnzbd_name,
-        'apikey': api_key,
-        'cat': category,
-        'priority': -2 if paused else -100
-    }
-
     nzbname = '{}.nzb'.format(normalize('NFKD', sabnzbd_name).encode('ascii', 'ignore').decode("utf-8", "ignore"))
-    nzb_data = {'nzbfile': (nzbname, io.BytesIO(nzb_content.encode('utf8')))}
+    # NZBs pushed at the same time by other threads are sent one after the other over one connection
+    client = sabnzbd_client(host, port, ssl, api_key, basepath, basicauth_username, basicauth_password)
 
-    try:
-        auth = None
-        if basicauth_username and basicauth_password:
-            auth = (basicauth_username, basicauth_password)
+    import requests
 
-        res = requests.post(req_url, data=post_data, files=nzb_data, verify=False, timeout=REQUESTS_TIMEOUT * 2,
-                            auth=auth)
+    try:
+        ok, response = client.addfile(sabnzbd_name, nzbname, nzb_content, category, paused, compress)
     except requests.exceptions.RequestException as e:
         print(Col.FAIL + 'FAILED: {}'.format(e) + Col.OFF)
-        return 1
+        return TARGET_UNREACHABLE
 
-    if res.status_code == 200 and res.text.lower().find('<status>true') > 0:
+    if ok:
         print(Col.OK + 'OK' + Col.OFF)
         return 0
     else:
         print(Col.FAIL + 'FAILED' + Col.OFF)
 
         if debug:
-            print('   Response-Text: "{}"'.format(res.text))
+            print('   Response-Text: "{}"'.format(response))
 
         return 1
 
 
+def nzbget_client(host, port, ssl, user, password, basepath):
+    """Return the shared NZBGet client for a NZBGet instance
+
+    :param str host: NZBGet Hostname or IP
+    :param str port: NZBGet Port
+    :param bool ssl: Use https
+    :param str user: NZBGet User
+    :param str password: NZBGet password
+    :param str basepath: NZBGet basepath
+    :return nzbtargets.NZBGetClient: Client
+    """
+    from nzbtargets import NZBGetClient, get_client
+
+    return get_client(NZBGetClient, http_session(),
+                      '{0}://{1}:{2}/{3}'.format('https' if ssl else 'http', host, port, basepath),
+                      (user, password) if password is not None else None, REQUESTS_TIMEOUT)
+
+
 def push_nzb_nzbget(host, port, ssl, user, password, basepath, category, paused, nzb_filename, nzb_content,
                     start_message='Pushing to NZBGet', debug=False):
     """Push a NZB to NZBGet
@@ -1111,69 +1465,75 @@ def push_nzb_nzbget(host, port, ssl, user, password, basepath, category, paused,
     :param str category: NZBGet category
     :param str paused: Add the nzb paused
     :param str nzb_filename: NZB filename for NZBGet
-    :param str nzb_content: Content for the NZB File upload
+    :param nzb_content: Content for the NZB File upload
+    :type nzb_content: bytes or NZBRewriter
     :param str start_message: Customized start message
     :param bool debug: Verbose output
 
-    :returns int: Return code 0 is OK, return code > 0 is NOK
+    :returns int: Return code 0 is OK, return code > 0 is NOK, TARGET_UNREACHABLE if the target can't be reached
     """
 
     print(start_message, end='', flush=True)
 
-    scheme = 'https' if ssl else 'http'
-
-    req_url = '{0}://{1}:{2}/{3}'.format(scheme, host, port, basepath)
-
     # XMLRPC-request, see https://github.com/nzbget/nzbget/wiki/API-Method-%22append%22
+    # NZBs pushed at the same time by other threads are sent in one request
+    client = nzbget_client(host, port, ssl, user, password, basepath)
+    import requests
 
-    data = ('<?xml version="1.0"?><methodCall><methodName>append</methodName><params>' +
-            '<param><value><string>{0}.nzb</string></value></param>' +  # Filename
-            '<param><value><string>{1}</string></value></param>' +  # Content (NZB File)
-            '<param><value><string>{2}</string></value></param>' +  # Category
-            '<param><value><i4>0</i4></value></param>' +  # Priority
-            '<param><value><boolean>0</boolean></value></param>' +  # AddToTop
-            '<param><value><boolean>{3}</boolean></value></param>' +  # AddPaused
-            '<param><value><string></string></value></param>' +  # DupeKey
-            '<param><value><i4>0</i4></value></param>' +  # DupeScore
-            '<param><value><string>ALL</string></value></param>' +  # DupeMode
-            '</params></methodCall>').format(
-        nzb_filename,
-        base64.b64encode(nzb_content.encode('utf8')).decode('ascii'),
-        category,
-        1 if paused else 0
-    )
-
-    auth = None
-    if password is not None:
-        auth = (user, password)
     try:
-        res = requests.post(req_url, data=data, auth=auth, verify=False, timeout=REQUESTS_TIMEOUT)
-
-        if res.status_code == 200 and res.text.find('<fault>') < 0:
+        call = client.append('{}.nzb'.format(nzb_filename), nzb_content, category, paused)
+        if call.ok:
             print(Col.OK + 'OK' + Col.OFF)
         else:
             print(Col.FAIL + 'FAILED' + Col.OFF)
             if debug:
-                print('   Response-Text: "{}"'.format(res.text))
+                print('   Response-Text: "{}"'.format(call.response))
             return 1
 
     except requests.exceptions.RequestException as e:
         print(Col.FAIL + 'FAILED' + Col.OFF)
         if debug:
             print('   Requests-Exception: {}'.format(e))
-        return 1
+        return TARGET_UNREACHABLE
 
     return 0
 
 
-def write_nzb_file(nzb_folder, tag, password, nzb_content, debug=False):
+def remove_from_catalog(catalog_filename, nzb_folder):
+    """Remove the deleted NZBs of a NZB folder from the catalog
+
+    :param str catalog_filename: Catalog file
+    :param str nzb_folder: NZB folder
+    """
+    import sqlite3
+    from nzbcatalog import Catalog
+
+    try:
+        catalog = Catalog(catalog_filename)
+        try:
+            catalog.remove_missing(nzb_folder)
+        finally:
+            catalog.close()
+    except sqlite3.Error as e:
+        print(Col.WARN + ' - Catalog not updated: {}'.format(e) + Col.OFF, flush=True)
+
+
+def write_nzb_file(nzb_folder, tag, password, nzb_content, debug=False, compress=False, compress_level=GZIP_LEVEL,
+                   fsync='off'):
     """Write NZB file
 
+    The NZB is written to a temporary file which is renamed when it's complete, so nobody picks up a partly
+    written NZB.
+
     :param str nzb_folder: Destination folder for the NZB file
     :param str tag: NZB Filename without .nzb
     :param str password: Password - append to filename
-    :param str nzb_content: Content for the NZB File
+    :param nzb_content: Content for the NZB File
+    :type nzb_content: bytes or NZBRewriter
     :param bool debug: Verbose output and append unix time to nzb file
+    :param bool compress: Write a gzip compressed .nzb.gz file
+    :param int compress_level: Compression level 1-9
+    :param str fsync: Flush the NZB to disk: off, file or full (file and folder)
 
     :returns int, str: status and nzb filename
     """
@@ -1188,12 +1548,15 @@ def write_nzb_file(nzb_folder, tag, password, nzb_content, debug=False):
         else:
             tag += '{{%s}}' % password
 
-    nzb_file = join(nzb_folder, tag + '.nzb')
+    nzb_file = join(nzb_folder, tag + ('.nzb.gz' if compress else '.nzb'))
 
     try:
         print(' - Saving NZB-file ... ', end='', flush=True)
-        with open(nzb_file, 'w', encoding='utf8') as f:
-            f.write(nzb_content)
+        written = write_atomic(nzb_file, nzb_content, compress, compress_level, fsync)
+        if compress:
+            print(Col.OK + 'OK' + Col.OFF + ' ({:.0f}% of {} KB)'.format(written * 100.0 / max(len(nzb_content), 1),
+                                                                        len(nzb_content) // 1024))
+        else:
             print(Col.OK + 'OK' + Col.OFF)
 
     except IOError as e:
@@ -1202,7 +1565,9 @@ def write_nzb_file(nzb_folder, tag, password, nzb_content, debug=False):
     return 0, nzb_file
 
 
-def nzb_execute(nzb_folder, nzb_content, tag, nzb_password, passtofile, passtoclipboard, dontexecute, debug=False):
+def nzb_execute(nzb_folder, nzb_content, tag, nzb_password, passtofile, passtoclipboard, dontexecute, debug=False,
+                compress=False, compress_level=GZIP_LEVEL, fsync='off', catalog=None, nzbsrc=None, engine=None,
+                check=None):
     """Handle NZB execution Task
 
     1. Copy password to clipboard
@@ -1210,19 +1575,29 @@ def nzb_execute(nzb_folder, nzb_content, tag, nzb_password, passtofile, passtocl
     3. Write NZB to file
 
     :param str nzb_folder: Path to save NZB file
-    :param str nzb_content: NZB content to save
+    :param nzb_content: NZB content to save
+    :type nzb_content: bytes or NZBRewriter
     :param str tag: First part from file name
     :param str nzb_password: Password to append to filename
     :param bool passtofile: If enabled append password to file
     :param bool passtoclipboard: If enabled copy password to clipboard
     :param bool dontexecute: If enabled don't Execute default programm for .nzb extension
     :param bool debug: Enable verbose output
+    :param bool compress: Save the NZB as .nzb.gz
+    :param int compress_level: Compression level 1-9
+    :param str fsync: Flush the NZB to disk: off, file or full (file and folder)
+    :param nzbcatalog.Catalog catalog: Catalog the saved NZB is added to or None
+    :param dict nzbsrc: Release with tag, header and pass for the catalog
+    :param str engine: Search engine the NZB comes from for the catalog
+    :param check: Result of the NZB check for the catalog or None
 
     :returns int: Return code 0 is OK, return code > 0 is NOK
     """
 
     # copy password to clipboard
     if nzb_password and passtoclipboard:
+        import pyperclip
+
         pyperclip.copy(nzb_password)
         print(' - Password copied to clipboard!')
 
@@ -1232,16 +1607,26 @@ def nzb_execute(nzb_folder, nzb_content, tag, nzb_password, passtofile, passtocl
     else:
         password = None
 
-    res, nzb_file = write_nzb_file(nzb_folder, tag, password, nzb_content, debug)
+    res, nzb_file = write_nzb_file(nzb_folder, tag, password, nzb_content, debug, compress, compress_level, fsync)
 
     if res:
         print_and_wait('Close window in {} second(s)'.format(2 * WAITING_TIME_LONG), 2 * WAITING_TIME_LONG)
         return res
 
+    if catalog is not None and nzbsrc is not None:
+        import sqlite3
+
+        try:
+            catalog.add(nzb_file, nzbsrc, engine, nzb_content, check)
+        except (OSError, sqlite3.Error) as e:
+            print(Col.WARN + ' - NZB not added to the catalog: {}'.format(e) + Col.OFF)
+
     if not dontexecute:
         print(' - Executing NZB-file ... ', end='', flush=True)
 
         # Let the system decide how to open a .NZB-file
+        import webbrowser
+
         webbrowser.open(nzb_file)
 
         print(Col.OK + 'OK' + Col.OFF)
@@ -1249,8 +1634,27 @@ def nzb_execute(nzb_folder, nzb_content, tag, nzb_password, passtofile, passtocl
     return 0
 
 
+def synology_client(host, port, ssl, username, password, basepath, sid_filename=None):
+    """Return the shared DownloadStation client for a Diskstation and account
+
+    :param str host: Diskstation hostname or IP
+    :param str port: Diskstation Port
+    :param bool ssl: Use https
+    :param str username: admin username
+    :param str password: admin password
+    :param str basepath: Basepath where Diskstation API lives
+    :param str sid_filename: File to keep the session id between runs
+    :return nzbtargets.SynologyClient: Client
+    """
+    from nzbtargets import SynologyClient, get_client
+
+    return get_client(SynologyClient, http_session(),
+                      '{0}://{1}:{2}/{3}'.format('https' if ssl else 'http', host, port, basepath),
+                      (username, password), REQUESTS_TIMEOUT, sid_filename=sid_filename)
+
+
 def push_nzb_synologydls(host, port, ssl, username, password, basepath, tag, nzb_content, nzb_pass,
-                         start_message=' - Pushing to SYNOLOGYDLS', debug=False):
+                         start_message=' - Pushing to SYNOLOGYDLS', debug=False, sid_filename=None):
     """Push a NZB to Synology DLS
 
     :param str host: Diskstation hostname or IP
@@ -1260,61 +1664,45 @@ def push_nzb_synologydls(host, port, ssl, username, password, basepath, tag, nzb
     :param str password: admin password
     :param str basepath: Basepath where Diskstation API lives
     :param str tag: Filename without extension .nzb
-    :param str nzb_content: Content for the NZB File upload
+    :param nzb_content: Content for the NZB File upload
+    :type nzb_content: bytes or NZBRewriter
     :param str nzb_pass: Unpack password
     :param str start_message: Customized start message
     :param bool debug: Verbose output
+    :param str sid_filename: File to keep the session id between runs, None to log in once per run
 
-    :returns int: Return code 0 is OK, return code > 0 is NOK
+    :returns int: Return code 0 is OK, return code > 0 is NOK, TARGET_UNREACHABLE if the target can't be reached
     """
 
     print(start_message, end='', flush=True)
 
-    scheme = 'https' if ssl else 'http'
-
-    req_url = '{0}://{1}:{2}/{3}/auth.cgi?api=SYNO.API.Auth&version=3&method=login&account={4}&passwd={5}' \
-              '&session=DownloadStation&format=sid'.format(scheme, host, port, basepath, username, password)
-
-    try:
-        sid = json.loads(requests.get(req_url, verify=False, timeout=REQUESTS_TIMEOUT).text)['data']['sid']
-    except requests.exceptions.RequestException as e:
-        print(Col.FAIL + 'FAILED' + Col.OFF)
-        if debug:
-            print('   Requests-Exception: {}'.format(e))
-        return 1
-
-    req_url = '{0}://{1}:{2}/{3}/entry.cgi'.format(scheme, host, port, basepath)
-
     nzbname = '{}.nzb'.format(normalize('NFKD', tag).encode('ascii', 'ignore').decode("utf-8", "ignore"))
+    # The session id of the last login is used until DSM rejects it
+    client = synology_client(host, port, ssl, username, password, basepath, sid_filename)
 
-    # API reverse engineered, for some stupid reason the order of parameters matters - thx Synology!
-    file_data = [
-        ('api', (None, 'SYNO.DownloadStation2.Task', None)),
-        ('method', (None, 'create', None)),
-        ('version', (None, '2', None)),
-        ('extract_password', (None, '"' + nzb_pass + '"', None)),
-        ('destination', (None, '""', None)),
-        ('create_list', (None, 'false', None)),
-        ('type', (None, '"file"', None)),
-        ('file', (None, '["torrent"]', None)),
-        ('torrent', (nzbname, io.BytesIO(nzb_content.encode('utf8')), 'application/x-nzb; charset="UTF-8"'))
-    ]
+    import requests
 
     try:
-        res = requests.post(req_url, files=file_data, verify=False, timeout=REQUESTS_TIMEOUT, cookies={'id': sid})
-        if res.status_code == 200 and res.text.find('success":true') > 0:
+        ok, response = client.create_task(nzbname, nzb_content, nzb_pass)
+        if ok:
             print(Col.OK + 'OK' + Col.OFF)
         else:
             print(Col.FAIL + 'FAILED' + Col.OFF)
             if debug:
-                print('   Response-Text: "{}"'.format(res.text))
+                print('   Response-Text: "{}"'.format(response))
             return 1
 
+    except (PermissionError, ValueError) as e:
+        print(Col.FAIL + 'FAILED' + Col.OFF)
+        if debug:
+            print('   Login: {}'.format(e))
+        return 1
+
     except requests.exceptions.RequestException as e:
         print(Col.FAIL + 'FAILED' + Col.OFF)
         if debug:
             print('   Requests-Exception: {}'.format(e))
-        return 1
+        return TARGET_UNREACHABLE
 
     return 0
 
@@ -1322,15 +1710,74 @@ def push_nzb_synologydls(host, port, ssl, username, password, basepath, tag, nzb
 # endregion
 
 
-def main():
-    """NZB-Monkey - The easy way to download NZB files"""
+# region NZB Processing
 
-    name = 'NZB-Monkey v{}'.format(__version__)
-    print('\n %s\n %s' % (name, '=' * len(name)))
+# Jobs of a batch, the server or the watch folder run side by side, only one of them may write the config
+CONFIG_WRITE_LOCK = threading.Lock()
 
-    script_path = sys.argv[0] if not hasattr(sys, 'frozen') else os.path.normpath(os.path.abspath(sys.executable))
-    cfg_filename = splitext(script_path)[0] + '.cfg'
-    log_filename = splitext(script_path)[0] + '.log'
+
+def config_cache_key(cfg_filename):
+    """Return the key of the config cache, it changes if the config file, the spec or NZB-Monkey changes
+
+    :param str cfg_filename: Path to the config file
+    :return tuple: key
+    """
+    stat = os.stat(cfg_filename)
+    return stat.st_mtime_ns, stat.st_size, getSpecVersion(), __version__
+
+
+def read_config_cache(cfg_filename, cache_filename):
+    """Return the validated config from the cache or None if the cache is missing or outdated
+
+    :param str cfg_filename: Path to the config file
+    :param str cache_filename: Path to the cache file
+    :return ConfigObj: Validated config or None
+    """
+    try:
+        with open(cache_filename, 'rb') as f:
+            key, cfg = pickle.load(f)
+        if key == config_cache_key(cfg_filename) and cfg.filename == cfg_filename:
+            return cfg
+    except Exception:
+        # A broken cache is rebuilt
+        pass
+    return None
+
+
+def write_config_cache(cfg, cache_filename):
+    """Store the validated config, the cache is only readable for the user as it contains the credentials
+
+    :param ConfigObj cfg: Validated config
+    :param str cache_filename: Path to the cache file
+    """
+    tmp_filename = '{}.{}.tmp'.format(cache_filename, os.getpid())
+    try:
+        data = pickle.dumps((config_cache_key(cfg.filename), cfg), protocol=pickle.HIGHEST_PROTOCOL)
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filename, cache_filename)
+    except (OSError, pickle.PicklingError):
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+
+
+def load_config(cfg_filename):
+    """Load and validate the config file. If there is no config file, create one and start the configuration
+
+    The validated config is cached in <config>.cache, so the config file is only parsed and validated
+    again after it was changed.
+
+    :param str cfg_filename: Path to the config file
+    :return ConfigObj: Validated config or None if a new config file was created
+    """
+    cache_filename = splitext(cfg_filename)[0] + '.cache'
+    if isfile(cfg_filename):
+        cfg = read_config_cache(cfg_filename, cache_filename)
+        if cfg is not None:
+            return cfg
 
     cfg = ConfigObj(cfg_filename, configspec=getSpec(), encoding='UTF-8', default_encoding='UTF-8',
                     write_empty_values=True)
@@ -1342,162 +1789,185 @@ def main():
         # If everything is OK validate returns True
         # If a keyword or section is missing validate returns a dictionary
         if not test == True:
+            from validate import Validator
+
             val = Validator()
             cfg.validate(val, copy=True)
-            cfg.write()
+            with CONFIG_WRITE_LOCK:
+                cfg.write()
+        write_config_cache(cfg, cache_filename)
+        return cfg
 
-    else:
-        val = Validator()
-        cfg.validate(val, copy=True)
-        config_file(cfg)
-        config_nzbmonkey()
-        sleep(WAITING_TIME_LONG)
-        return 0
+    from validate import Validator
+    from nzblnkconfig import config_file, config_nzbmonkey
 
-    exe_target = cfg['GENERAL'].get('target', 'EXECUTE').upper()
-    exe_target_cfg = {} if exe_target not in cfg.keys() else cfg[exe_target]
+    val = Validator()
+    cfg.validate(val, copy=True)
+    config_file(cfg)
+    config_nzbmonkey()
+    return None
 
-    debug = cfg['GENERAL'].as_bool('debug')
-    if debug:
-        debug_message = 'Debug output enabled for {}'.format(name)
-        debug_logfile = debug_output_open(log_filename, debug, '\n {}\n {}\n {}\n\n'.format(
-            '=' * len(debug_message), debug_message, '=' * len(debug_message)))
-        print(' Started: {} ({})'.format(strftime('%Y-%m-%d %H:%M:%S'), int(time())))
-        text = 'Command line arguments passed to NZB-Monkey'
-        print(' {}\n {}'.format(text, '-' * len(text)))
-        for count, arg in enumerate(sys.argv):
-            print(' Arg[{}]: {}'.format(count, arg))
-        print(' {}\n'.format('-' * len(text)))
-    else:
-        debug_logfile = None
 
-    # region Processing Input
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-t', '--tag', action='store', help='Tag for Releasename')
-    parser.add_argument('-s', '--subject', action='store', help='Subject (Header) for NZB Search')
-    parser.add_argument('-p', '--password', action='store', help='Password to extract files')
-    parser.add_argument('-c', '--category', action='store', help='Category for SABnzbd or NZBGet')
-    parser.add_argument('nzblnk', nargs=argparse.REMAINDER, help='NZBLNK URI')
-    args = parser.parse_args()
+def parse_clipboard(clip):
+    """Search a text for tag, header and password
 
-    if args.category:
-        category_args = args.category
+    :param str clip: Text e.g. from clipboard
+    :return dict: Release with tag, header and pass
+    """
+    tag = 'NZB Monkey'
+
+    found = re.search(r'(?mi)(^.*?S\d+E\d+.*$)', clip)
+    if found is not None:
+        tag = found.group(1)
     else:
-        category_args = None
+        found = re.search(r'(?mi)(^.*?(?:720p|1080p|x264|x265|XviD|BluRay).*$)', clip)
+        if found is not None:
+            tag = found.group(1)
+        else:
+            found = re.search(r'(?m)(^(.*)$)', clip.strip())
+            if found is not None:
+                tag = found.group(1)
 
-    if len(args.nzblnk) > 0:
-        called_by = 'by NZBLNK scheme'
+    tag = re.sub('([^{]*).*', '\\1', tag.strip().replace(' ', '.'))
 
-        lnk = urlparse(args.nzblnk[0])
-        if lnk.scheme.lower() != 'nzblnk':
-            print_and_wait(Col.FAIL + ' ERROR: ' + Col.OFF + 'Please provide a NZBLNK.', WAITING_TIME_LONG)
-            debug_output_close(debug_logfile, debug)
-            return 1
+    header = None
+    found = re.search(r'(?mi)(?:subject:|header:)\s+?(?:header:\s+)?(\S+)', clip.strip())
+    if found is not None:
+        header = found.group(1)
 
-        # parse query-part
+    password = ''
+    found = re.search(r'(?mi)(?:passwor[dt]|pw|pwd):\s*?(\S+)', clip.strip())
+    if found is not None:
+        password = found.group(1)
 
-        lnk = parse_qs(lnk.query)
-        nzbsrc = {
-            'tag': lnk.get('t', [None])[0],
-            'header': lnk.get('h', [None])[0],
-            'pass': lnk.get('p', [None])[0]
-        }
+    return {
+        'tag': tag,
+        'header': header,
+        'pass': password
+    }
 
-    elif args.subject and args.tag:
-        called_by = 'by Arguments'
 
-        tag = args.tag
-        header = args.subject
-        if args.password:
-            password = args.password
-        else:
-            password = ''
+def get_search_engines(cfg):
+    """Return the search engines and their priority from config"""
+    return {'binsearch': cfg['Searchengines'].as_int('binsearch'),
+            'nzbking': cfg['Searchengines'].as_int('nzbking'),
+            'nzbindex': cfg['Searchengines'].as_int('nzbindex')}
 
-        nzbsrc = {
-            'tag': tag,
-            'header': header,
-            'pass': password
-        }
 
-    else:
-        called_by = 'with clipboard'
-        tag = 'NZB Monkey'
+def search_nzb_cfg(cfg, nzbsrc, debug=False):
+    """Search the NZB for a release with the settings from config
 
-        clip = pyperclip.paste()
+    :param ConfigObj cfg: Config
+    :param dict nzbsrc: Release with header and pass, all headers, groups and date of a NZBLNK are used
+    :param bool debug: Enable verbose output
+    :returns int, NZBRewriter, str: Return code, NZB content, search engine name. Return code 0 is OK, return code > 0 is NOK
+    """
+    if cfg['CATALOG'].as_bool('reuse'):
+        saved = find_saved_nzb(cfg, nzbsrc)
+        if saved is not None:
+            return saved
+
+    return search_nzb(nzbsrc.get('headers') or nzbsrc['header'],
+                      nzbsrc['pass'],
+                      get_search_engines(cfg),
+                      cfg['NZBCheck'].as_bool('best_nzb'),
+                      cfg['NZBCheck'].get('max_missing_files', 2),
+                      cfg['NZBCheck'].get('max_missing_segments_percent', 2.5),
+                      cfg['NZBCheck'].as_bool('skip_failed'),
+                      debug,
+                      nzbsrc.get('groups'),
+                      parse_post_date(nzbsrc.get('date')))
+
+
+def open_catalog(cfg):
+    """Open the catalog of saved NZBs
+
+    :param ConfigObj cfg: Config
+    :return nzbcatalog.Catalog: Catalog or None if the catalog is disabled or can't be opened
+    """
+    if not cfg['CATALOG'].as_bool('enabled') or not cfg.filename:
+        return None
 
-        if clip is None or clip == '':
-            print_and_wait(' Clipboard is empty. So please call {} <nzblnk> or with text in clipboard.'.format(
-                basename(sys.argv[0])),
-                WAITING_TIME_LONG)
-            return 1
+    import sqlite3
+    from nzbcatalog import Catalog
 
-        found = re.search(r'(?mi)(^.*?S\d+E\d+.*$)', clip)
-        if found is not None:
-            tag = found.group(1)
-        else:
-            found = re.search(r'(?mi)(^.*?(?:720p|1080p|x264|x265|XviD|BluRay).*$)', clip)
-            if found is not None:
-                tag = found.group(1)
-            else:
-                found = re.search(r'(?m)(^(.*)$)', clip.strip())
-                if found is not None:
-                    tag = found.group(1)
+    try:
+        return Catalog(splitext(cfg.filename)[0] + '.catalog')
+    except sqlite3.Error as e:
+        print(Col.WARN + ' - Catalog not available: {}'.format(e) + Col.OFF)
+        return None
 
-        tag = re.sub('([^{]*).*', '\\1', tag.strip().replace(' ', '.'))
 
-        header = None
-        found = re.search(r'(?mi)(?:subject:|header:)\s+?(?:header:\s+)?(\S+)', clip.strip())
-        if found is not None:
-            header = found.group(1)
+def find_saved_nzb(cfg, nzbsrc):
+    """Look up a saved NZB of a release in the catalog, NZBs which failed the NZB check are not used
 
-        password = ''
-        found = re.search(r'(?mi)(?:passwor[dt]|pw|pwd):\s*?(\S+)', clip.strip())
-        if found is not None:
-            password = found.group(1)
+    :param ConfigObj cfg: Config
+    :param dict nzbsrc: Release with tag, header and pass
+    :returns int, NZBRewriter, str: Return code 0, NZB content and search engine name or None if there's no NZB
+    """
+    catalog = open_catalog(cfg)
+    if catalog is None:
+        return None
 
-        nzbsrc = {
-            'tag': tag,
-            'header': header,
-            'pass': password
-        }
+    import sqlite3
+    from nzbcatalog import SavedCheck
 
-    if nzbsrc['tag'] is None or nzbsrc['header'] is None:
-        print_and_wait(Col.FAIL + ' ERROR: Please provide a tag and header info.' + Col.OFF, WAITING_TIME_LONG)
-        debug_output_close(debug_logfile, debug)
+    try:
+        for entry in catalog.find(nzbsrc):
+            if entry['complete'] == 0:
+                continue
+            try:
+                nzb = catalog.load(entry)
+            except OSError:
+                continue
+            print('\n   use saved NZB {} ({:.0f} min old)'.format(basename(entry['path']),
+                                                                 (time() - entry['saved']) / 60))
+            return (0, NZBRewriter(nzb, [('password', nzbsrc['pass'])], check=SavedCheck.from_entry(entry)),
+                    entry['engine'] or 'Catalog')
+    except sqlite3.Error as e:
+        print(Col.WARN + ' - Catalog not available: {}'.format(e) + Col.OFF)
+    finally:
+        catalog.close()
+    return None
+
+
+def rebuild_catalog(cfg):
+    """Rebuild the catalog from the NZB folder of the EXECUTE target
+
+    :param ConfigObj cfg: Config
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    nzb_folder = expandvars(cfg['EXECUTE'].get('nzbsavepath', '%%TEMP%%'))
+    print(' - Rebuild catalog of {} ... '.format(nzb_folder), end='', flush=True)
+    catalog = open_catalog(cfg)
+    if catalog is None:
+        print(Col.FAIL + 'catalog disabled' + Col.OFF)
         return 1
 
-    print(""" Called {3}:\n
-     - Tag     : {0}
-     - Header  : {1}
-     - Password: {2}
-    """.format(nzbsrc['tag'],
-               nzbsrc['header'],
-               nzbsrc['pass'] or Col.WARN + 'EMPTY' + Col.OFF,
-               called_by))
-    # endregion
+    import sqlite3
 
-    # region Seach NZB
-
-    res, nzb, used_search_engine, = search_nzb(nzbsrc['header'],
-                                               nzbsrc['pass'],
-                                               {'binsearch': cfg['Searchengines'].as_int('binsearch'),
-                                                'nzbking': cfg['Searchengines'].as_int('nzbking'),
-                                                'nzbindex': cfg['Searchengines'].as_int('nzbindex')},
-                                               cfg['NZBCheck'].as_bool('best_nzb'),
-                                               cfg['NZBCheck'].get('max_missing_files', 2),
-                                               cfg['NZBCheck'].get('max_missing_segments_percent', 2.5),
-                                               cfg['NZBCheck'].as_bool('skip_failed'),
-                                               debug)
-    if res:
-        print_and_wait('Close window in {} second(s)'.format(2 * WAITING_TIME_LONG), 2 * WAITING_TIME_LONG)
-        debug_output_close(debug_logfile, debug)
-        return res
-    # endregion
+    try:
+        updated, removed = catalog.rebuild(nzb_folder)
+    except (OSError, sqlite3.Error) as e:
+        print(Col.FAIL + 'Failed: {}'.format(e) + Col.OFF)
+        return 1
+    finally:
+        catalog.close()
+    print(Col.OK + 'OK' + Col.OFF + ' ({} added or updated, {} removed)'.format(updated, removed))
+    return 0
 
-    # region Categorizer
 
-    category = category_args if category_args else exe_target_cfg.get('category', '')
+def categorize(cfg, exe_target, exe_target_cfg, tag, category, interactive=True):
+    """Choose the category for a release
 
+    :param ConfigObj cfg: Config
+    :param str exe_target: Target name
+    :param exe_target_cfg: Config section of the target
+    :param str tag: Release tag
+    :param str category: Default category
+    :param bool interactive: Ask the user in manual mode, otherwise keep the default category
+    :return str: category
+    """
     SEC_CATEGORIZER = 'CATEGORIZER'
 
     categorize_mode = cfg['GENERAL'].get('categorize', 'off').lower()
@@ -1508,7 +1978,7 @@ def main():
     if categorize_mode == 'auto' and SEC_CATEGORIZER in cfg.keys():
         for cat in cfg[SEC_CATEGORIZER].keys():
             try:
-                if re.compile(cfg[SEC_CATEGORIZER].get(cat), re.IGNORECASE).search(nzbsrc['tag']):
+                if re.compile(cfg[SEC_CATEGORIZER].get(cat), re.IGNORECASE).search(tag):
                     category = cat
                     print("\n - Categorizer set category to: {}{}{}".format(Col.OK, cat, Col.OFF))
                     break
@@ -1516,67 +1986,38 @@ def main():
                 print_and_wait(Col.WARN + " > ERROR: Your category \"{}\" is a invalid regex!".format(cat) + Col.OFF,
                                WAITING_TIME_LONG)
 
-    elif categorize_mode == 'manual':
+    elif categorize_mode == 'manual' and interactive:
         cat_choice = []
 
         # Ask SabNZBs for categories
 
         if ExeTypes.SABNZBD.name == exe_target:
-            scheme = 'https' if exe_target_cfg.as_bool('ssl') else 'http'
-            req_url = '{0}://{1}:{2}/{3}/api?mode=get_cats&output=json' \
-                      '&apikey={4}'.format(scheme,
-                                           exe_target_cfg.get('host', 'localhost'),
-                                           exe_target_cfg.get('port', '8080'),
-                                           exe_target_cfg.get('basepath', 'sabnzbd'),
-                                           exe_target_cfg.get('nzbkey', ''))
-
             try:
-                res = requests.get(req_url, verify=False, timeout=REQUESTS_TIMEOUT * 2)
-                if res.status_code == 403:
-                    print_and_wait(Col.FAIL + ' - Please use the API KEY not the NZB KEY in your config!' + Col.OFF,
-                                   WAITING_TIME_LONG)
-                    raise EnvironmentError
-
-                res = json.loads(res.text)
-
-                if 'categories' not in res.keys():
-                    print(Col.FAIL + ' - Reading categories failed!' + Col.OFF)
-                    raise EnvironmentError
-
-                sabcats = res['categories']
-                for sabcat in sabcats:
-                    if sabcat != '*':
-                        cat_choice.append(sabcat)
-
+                cat_choice = sabnzbd_client(exe_target_cfg.get('host', 'localhost'),
+                                            exe_target_cfg.get('port', '8080'),
+                                            exe_target_cfg.as_bool('ssl'),
+                                            exe_target_cfg.get('nzbkey', ''),
+                                            exe_target_cfg.get('basepath', 'sabnzbd'),
+                                            exe_target_cfg.get('basicauth_username', ''),
+                                            exe_target_cfg.get('basicauth_password', '')).categories()
+            except PermissionError:
+                print_and_wait(Col.FAIL + ' - Please use the API KEY not the NZB KEY in your config!' + Col.OFF,
+                               WAITING_TIME_LONG)
+                cat_choice = []
             except (EnvironmentError, ValueError):
+                print(Col.FAIL + ' - Reading categories failed!' + Col.OFF)
                 cat_choice = []
 
         if ExeTypes.NZBGET.name == exe_target:
-
-            scheme = 'https' if exe_target_cfg.as_bool('ssl') else 'http'
-
-            req_url = '{0}://{1}:{2}/{3}/config'.format(scheme,
-                                                        exe_target_cfg.get('host', 'localhost'),
-                                                        exe_target_cfg.get('port', '6789'),
-                                                        exe_target_cfg.get('basepath', 'xmlrpc')
-                                                        .replace('xmlrpc', 'jsonrpc'))
-            auth = None
-            if exe_target_cfg.get('pass', '') is not None:
-                auth = (exe_target_cfg.get('user', ''), exe_target_cfg.get('pass', ''))
-
             try:
-                res = json.loads(requests.get(req_url, auth=auth, verify=False, timeout=REQUESTS_TIMEOUT).text)
-                if 'result' not in res.keys():
-                    print(Col.FAIL + ' - Reading categories failed!' + Col.OFF)
-                    raise EnvironmentError
-
-                cfgregex = re.compile('Category\d\.Name', re.IGNORECASE)
-
-                for cfg in res['result']:
-                    if cfgregex.match(cfg['Name']):
-                        cat_choice.append(cfg['Value'])
-
+                cat_choice = nzbget_client(exe_target_cfg.get('host', 'localhost'),
+                                           exe_target_cfg.get('port', '6789'),
+                                           exe_target_cfg.as_bool('ssl'),
+                                           exe_target_cfg.get('user', ''),
+                                           exe_target_cfg.get('pass', ''),
+                                           exe_target_cfg.get('basepath', 'xmlrpc')).categories()
             except (ValueError, EnvironmentError):
+                print(Col.FAIL + ' - Reading categories failed!' + Col.OFF)
                 cat_choice = []
 
         if cat_choice:
@@ -1595,142 +2036,1306 @@ def main():
             except ValueError:
                 pass
 
-    # endregion
+    return category
 
-    # region Exec NZBGET
-    if ExeTypes.NZBGET.name == exe_target:
-        res = push_nzb_nzbget(exe_target_cfg.get('host', 'localhost'),
-                              exe_target_cfg.get('port', '6789'),
-                              exe_target_cfg.as_bool('ssl'),
-                              exe_target_cfg.get('user', ''),
-                              exe_target_cfg.get('pass', ''),
-                              exe_target_cfg.get('basepath', 'xmlrpc'),
-                              category,
-                              exe_target_cfg.as_bool('addpaused'),
-                              nzbsrc['tag'],
-                              nzb,
-                              ' - Pushing to NZBGET ... ',
-                              debug)
-        if not debug:
-            print(' - Done')
-            if res:
-                waiting_time = WAITING_TIME_LONG
-            else:
-                waiting_time = WAITING_TIME_SHORT
-            print_and_wait('Close window in {} second(s)'.format(waiting_time), waiting_time)
-            debug_output_close(debug_logfile, debug)
-            return res
-    # endregion
 
-    # region Exec SABNZBD
-    elif ExeTypes.SABNZBD.name == exe_target:
+def push_nzb_target(exe_target, exe_target_cfg, nzbsrc, nzb, category, debug=False):
+    """Push a NZB to a download target: NZBGET, SABNZBD or SYNOLOGYDLS
+
+    :param str exe_target: Target name
+    :param exe_target_cfg: Config section of the target
+    :param dict nzbsrc: Release with tag, header and pass
+    :param NZBRewriter nzb: NZB content, name and category are added to the NZB
+    :param str category: Category
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    nzb.set_meta('name', nzbsrc['tag'])
+    nzb.set_meta('category', category)
 
-        res = push_nzb_sabnzbd(exe_target_cfg.get('host', 'localhost'),
-                               exe_target_cfg.get('port', '8080'),
+    if ExeTypes.NZBGET.name == exe_target:
+        return push_nzb_nzbget(exe_target_cfg.get('host', 'localhost'),
+                               exe_target_cfg.get('port', '6789'),
                                exe_target_cfg.as_bool('ssl'),
-                               exe_target_cfg.get('nzbkey', ''),
-                               exe_target_cfg.get('basepath', 'sabnzbd'),
-                               exe_target_cfg.get('basicauth_username', ''),
-                               exe_target_cfg.get('basicauth_password', ''),
+                               exe_target_cfg.get('user', ''),
+                               exe_target_cfg.get('pass', ''),
+                               exe_target_cfg.get('basepath', 'xmlrpc'),
                                category,
                                exe_target_cfg.as_bool('addpaused'),
-                               nzbsrc['tag'] if nzbsrc['pass'] is None else '%s{{%s}}' % (
-                                   nzbsrc['tag'], nzbsrc['pass']),
+                               nzbsrc['tag'],
                                nzb,
-                               ' - Pushing to SABNZBD ...',
+                               ' - Pushing to NZBGET ... ',
                                debug)
-        if not debug:
-            print(' - Done')
-            if res:
-                waiting_time = WAITING_TIME_LONG
-            else:
-                waiting_time = WAITING_TIME_SHORT
-            print_and_wait('Close window in {} second(s)'.format(waiting_time), waiting_time)
-            debug_output_close(debug_logfile, debug)
-            return res
-    # endregion
 
-    # region Exec SYNOLOGYDLS
+    elif ExeTypes.SABNZBD.name == exe_target:
+        return push_nzb_sabnzbd(exe_target_cfg.get('host', 'localhost'),
+                                exe_target_cfg.get('port', '8080'),
+                                exe_target_cfg.as_bool('ssl'),
+                                exe_target_cfg.get('nzbkey', ''),
+                                exe_target_cfg.get('basepath', 'sabnzbd'),
+                                exe_target_cfg.get('basicauth_username', ''),
+                                exe_target_cfg.get('basicauth_password', ''),
+                                category,
+                                exe_target_cfg.as_bool('addpaused'),
+                                nzbsrc['tag'] if nzbsrc['pass'] is None else '%s{{%s}}' % (
+                                    nzbsrc['tag'], nzbsrc['pass']),
+                                nzb,
+                                ' - Pushing to SABNZBD ...',
+                                debug,
+                                exe_target_cfg.as_bool('compress'))
 
     elif ExeTypes.SYNOLOGYDLS.name == exe_target:
-        res = push_nzb_synologydls(exe_target_cfg.get('host', 'localhost'),
-                                   exe_target_cfg.get('port', '8080'),
-                                   exe_target_cfg.as_bool('ssl'),
-                                   exe_target_cfg.get('user', ''),
-                                   exe_target_cfg.get('pass', ''),
-                                   exe_target_cfg.get('basepath', 'webapi'),
-                                   nzbsrc['tag'],
-                                   nzb,
-                                   nzbsrc['pass'],
-                                   ' - Pushing to SYNOLOGY-DLS ...',
-                                   debug)
-        if not debug:
-            print(' - Done')
-            if res:
-                waiting_time = WAITING_TIME_LONG
+        return push_nzb_synologydls(exe_target_cfg.get('host', 'localhost'),
+                                    exe_target_cfg.get('port', '8080'),
+                                    exe_target_cfg.as_bool('ssl'),
+                                    exe_target_cfg.get('user', ''),
+                                    exe_target_cfg.get('pass', ''),
+                                    exe_target_cfg.get('basepath', 'webapi'),
+                                    nzbsrc['tag'],
+                                    nzb,
+                                    nzbsrc['pass'],
+                                    ' - Pushing to SYNOLOGY-DLS ...',
+                                    debug,
+                                    splitext(exe_target_cfg.main.filename)[0] + '.sid'
+                                    if exe_target_cfg.main.filename else None)
+
+    print(Col.FAIL + ' ERROR: ' + Col.OFF + ' Target "' + exe_target + '" unknown!')
+    return 1
+
+
+def execute_target(cfg, nzbsrc, nzb, used_search_engine, debug=False):
+    """Save the NZB to the NZB folder, execute it and clean up the NZB folder
+
+    :param ConfigObj cfg: Config
+    :param dict nzbsrc: Release with tag, header and pass
+    :param NZBRewriter nzb: NZB content, the name is added to the NZB
+    :param str used_search_engine: Name of the search engine the NZB comes from
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    # The clean up keeps the NZBs saved from now on, some file systems store the time in 2 second steps
+    started = time() - 2
+    nzb.set_meta('name', nzbsrc['tag'])
+    exe_target_cfg = cfg['EXECUTE']
+
+    # Check NZB Folder
+    nzb_folder = expandvars(exe_target_cfg.get('nzbsavepath', '%%TEMP%%'))
+    if not check_folder(nzb_folder):
+        print(Col.FAIL + " - Can't access or create NZB folder {}".format(nzb_folder)
+              + Col.OFF)
+        return 1
+
+    # Nzb Save and execute
+    catalog = open_catalog(cfg)
+    res = nzb_execute(nzb_folder,
+                      nzb,
+                      nzbsrc['tag'] if not debug else '{}.{}'.format(nzbsrc['tag'], used_search_engine.lower()),
+                      nzbsrc['pass'],
+                      exe_target_cfg.as_bool('passtofile'),
+                      exe_target_cfg.as_bool('passtoclipboard'),
+                      exe_target_cfg.as_bool('dontexecute'),
+                      debug,
+                      exe_target_cfg.as_bool('compress'),
+                      exe_target_cfg.as_int('compress_level'),
+                      exe_target_cfg.get('fsync', 'off'),
+                      catalog,
+                      nzbsrc,
+                      used_search_engine,
+                      nzb.check)
+    if catalog is not None:
+        catalog.close()
+
+    # Clean up NZB Folder
+    with CONFIG_WRITE_LOCK:
+        clean_up = exe_target_cfg.as_bool('clean_up_enable') and int(time()) - exe_target_cfg.as_int(
+            'clean_up_last_run') >= 24 * 3600
+        if clean_up:
+            exe_target_cfg['clean_up_last_run'] = int(time())
+            cfg.write()
+    if clean_up:
+        print(' - Clean up NZB folder in the background')
+        start_clean_up(nzb_folder, exe_target_cfg.get('clean_up_max_age', '2'),
+                       exe_target_cfg.as_int('clean_up_max_size') * 1024 * 1024,
+                       catalog.filename if catalog is not None else None, started)
+
+    return res
+
+
+def get_targets(cfg):
+    """Return the names of the targets, e.g. ['SABNZBD', 'EXECUTE']
+
+    :param ConfigObj cfg: Config
+    :return list: Target names in upper case, every target once
+    """
+    targets = cfg['GENERAL'].get('target', [ExeTypes.EXECUTE.name])
+    if isinstance(targets, str):
+        targets = targets.split(',')
+    return list(dict.fromkeys(target.strip().upper() for target in targets if target.strip())) or \
+        [ExeTypes.EXECUTE.name]
+
+
+def categorize_targets(cfg, targets, tag, category=None, interactive=True):
+    """Choose the category of a release for every target
+
+    :param ConfigObj cfg: Config
+    :param list targets: Target names
+    :param str tag: Release tag
+    :param str category: Default category, None for the category of the target
+    :param bool interactive: Ask the user in manual mode, otherwise keep the default category
+    :return dict: Category per target
+    """
+    categories = dict()
+    for exe_target in targets:
+        exe_target_cfg = {} if exe_target not in cfg.keys() else cfg[exe_target]
+        categories[exe_target] = categorize(cfg, exe_target, exe_target_cfg, tag,
+                                            category if category else exe_target_cfg.get('category', ''), interactive)
+    return categories
+
+
+def run_target(cfg, exe_target, nzbsrc, nzb, category, used_search_engine, debug=False):
+    """Hand a NZB to one target, push it or save and execute it
+
+    If the target can't be reached, the NZB is kept in the outbox. After a successful push the outbox
+    entries of the target are due at once, they are pushed by the next retry in the background.
+
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    if ExeTypes.EXECUTE.name == exe_target:
+        return execute_target(cfg, nzbsrc, nzb, used_search_engine, debug)
+    res = push_nzb_target(exe_target, {} if exe_target not in cfg.keys() else cfg[exe_target], nzbsrc, nzb, category,
+                          debug)
+
+    outbox = open_outbox(cfg)
+    if outbox is not None:
+        if res == TARGET_UNREACHABLE:
+            try:
+                outbox.add(exe_target, nzbsrc, category, used_search_engine, nzb, 'not reachable')
+                print(Col.WARN + ' - {} not reachable, NZB kept in the outbox for a retry'.format(exe_target)
+                      + Col.OFF)
+            except OSError as e:
+                print(Col.FAIL + ' - Can\'t keep the NZB in the outbox: {}'.format(e) + Col.OFF)
+        elif res == 0:
+            # The target is back, the NZBs waiting for it don't wait for their next retry
+            outbox.discard(exe_target, nzbsrc)
+            outbox.wake(exe_target)
+    return res
+
+
+# Seconds run_targets waits after the deadline for the targets whose requests were cut off
+TARGET_GRACE = 2
+
+
+def run_targets(cfg, targets, nzbsrc, nzb, categories, used_search_engine, debug=False):
+    """Hand a NZB to all targets at the same time
+
+    Every target gets its own copy of the meta data. The output of a target is printed in one piece when it's
+    done. The HTTP requests of the targets end after GENERAL.target_timeout seconds, so a target can't push the
+    NZB after it was given up. Targets which are still not done, e.g. waiting for a program, count as failed and
+    their output is dropped. A single target runs in the calling thread.
+
+    :param ConfigObj cfg: Config
+    :param list targets: Target names
+    :param dict nzbsrc: Release with tag, header and pass
+    :param NZBRewriter nzb: NZB content
+    :param dict categories: Category per target
+    :param str used_search_engine: Name of the search engine the NZB comes from
+    :param bool debug: Enable verbose output
+    :return dict: Return code per target, 0 is OK
+    """
+    from nzbjobs import deadline
+
+    target_deadline = time() + cfg['GENERAL'].as_int('target_timeout')
+    if len(targets) == 1:
+        with deadline(target_deadline):
+            return {targets[0]: run_target(cfg, targets[0], nzbsrc, nzb, categories.get(targets[0]),
+                                           used_search_engine, debug)}
+
+    import queue
+    from nzbjobs import ThreadOutput, capture_output
+
+    stdout = sys.stdout
+    output_stream = ThreadOutput(stdout) if not isinstance(stdout, ThreadOutput) else None
+    finished = queue.Queue()
+    lock = threading.Lock()
+    state = {'running': len(targets), 'waiting': True}
+
+    def restore_stdout():
+        """Remove the ThreadOutput when no target is running and the results are not awaited anymore"""
+        if output_stream is not None and not state['running'] and not state['waiting'] and sys.stdout is output_stream:
+            sys.stdout = stdout
+
+    def run(exe_target):
+        try:
+            with capture_output() as output, deadline(target_deadline):
+                try:
+                    res = run_target(cfg, exe_target, nzbsrc, nzb.copy(), categories.get(exe_target),
+                                     used_search_engine, debug)
+                except Exception as e:
+                    print(Col.FAIL + ' - {} failed: {}'.format(exe_target, e) + Col.OFF)
+                    res = 1
+            finished.put((exe_target, res, output.getvalue()))
+        finally:
+            with lock:
+                state['running'] -= 1
+                restore_stdout()
+
+    results = dict()
+    if output_stream is not None:
+        sys.stdout = output_stream
+    try:
+        # Daemon threads, a target which misses the deadline doesn't keep NZB-Monkey from exiting
+        for exe_target in targets:
+            threading.Thread(target=run, args=(exe_target,), name='target-{}'.format(exe_target), daemon=True).start()
+        while len(results) < len(targets):
+            try:
+                # A target whose request ends at the deadline needs a moment to report it
+                exe_target, res, output = finished.get(timeout=max(target_deadline + TARGET_GRACE - time(), 0))
+            except queue.Empty:
+                break
+            results[exe_target] = res
+            stdout.write(output)
+    finally:
+        # Late targets keep writing to their capture buffer, the last one removes the ThreadOutput
+        with lock:
+            state['waiting'] = False
+            restore_stdout()
+
+    states = list()
+    for exe_target in targets:
+        if exe_target not in results:
+            states.append('{} {}TIMEOUT{}'.format(exe_target, Col.FAIL, Col.OFF))
+        elif results[exe_target]:
+            states.append('{} {}FAILED{}'.format(exe_target, Col.FAIL, Col.OFF))
+        else:
+            states.append('{} {}OK{}'.format(exe_target, Col.OK, Col.OFF))
+    print(' - Targets : {}'.format(', '.join(states)))
+    return {exe_target: results.get(exe_target, 1) for exe_target in targets}
+
+
+def open_outbox(cfg):
+    """Open the outbox for NZBs which couldn't be pushed
+
+    :param ConfigObj cfg: Config
+    :return nzboutbox.Outbox: Outbox or None if the outbox is disabled
+    """
+    if not cfg['OUTBOX'].as_bool('enabled') or not cfg.filename:
+        return None
+
+    from nzboutbox import Outbox
+
+    return Outbox(splitext(cfg.filename)[0] + '.outbox', cfg['OUTBOX'].as_int('retry_interval'),
+                  cfg['OUTBOX'].as_int('max_retry_interval'))
+
+
+def retry_outbox(cfg, exe_target=None, due_only=True, debug=False, outbox=None):
+    """Push the NZBs waiting in the outbox
+
+    The first NZB of a target is pushed alone. If the target is still not reachable, the other NZBs of the target
+    wait for their next retry without a request. Otherwise they are pushed at the same time, so NZBGet gets them
+    in one multicall request and SABnzbd back to back over one connection.
+
+    :param ConfigObj cfg: Config
+    :param str exe_target: Only NZBs for this target, None for all targets
+    :param bool due_only: Only NZBs whose next retry is due
+    :param bool debug: Enable verbose output
+    :param nzboutbox.Outbox outbox: Outbox, None to open the outbox of the config
+    :return int: Number of pushed NZBs
+    """
+    outbox = outbox or open_outbox(cfg)
+    if outbox is None:
+        return 0
+    outbox.prune(cfg['OUTBOX'].as_int('keep_days') * 86400)
+    entries = outbox.due(exe_target) if due_only else outbox.entries(exe_target)
+    if not entries:
+        return 0
+
+    from concurrent.futures import ThreadPoolExecutor
+    from nzbjobs import ThreadOutput, capture_output
+
+    def push(entry):
+        with capture_output() as output:
+            print(' - Outbox  : {} ({}. attempt)'.format(entry.nzbsrc['tag'], entry.data.get('attempts', 1) + 1))
+            outbox.start(entry)
+            try:
+                res = push_nzb_target(entry.target, cfg[entry.target], entry.nzbsrc, NZBRewriter(outbox.load(entry)),
+                                      entry.category, debug)
+            except Exception as e:
+                print(Col.FAIL + ' - {} failed: {}'.format(entry.target, e) + Col.OFF)
+                res = 1
+            if res == 0:
+                outbox.done(entry)
             else:
-                waiting_time = WAITING_TIME_SHORT
-            print_and_wait('Close window in {} second(s)'.format(waiting_time), waiting_time)
-            debug_output_close(debug_logfile, debug)
-            return res
+                outbox.retry(entry, 'not reachable' if res == TARGET_UNREACHABLE else 'failed')
+        return res, output.getvalue()
+
+    by_target = dict()
+    for entry in entries:
+        if entry.target in cfg.keys() and entry.target != ExeTypes.EXECUTE.name and outbox.claim(entry):
+            by_target.setdefault(entry.target, list()).append(entry)
+
+    pushed = 0
+    stdout = sys.stdout
+    wrapped = not isinstance(stdout, ThreadOutput)
+    if wrapped:
+        sys.stdout = ThreadOutput(stdout)
+    try:
+        for target_entries in by_target.values():
+            res, output = push(target_entries[0])
+            stdout.write(output)
+            if res == TARGET_UNREACHABLE:
+                for entry in target_entries[1:]:
+                    outbox.retry(entry, 'not reachable', target_entries[0].next_try)
+                continue
+            pushed += 0 if res else 1
+            if len(target_entries) > 1:
+                try:
+                    with ThreadPoolExecutor(max_workers=min(len(target_entries) - 1, 8),
+                                            thread_name_prefix='outbox') as executor:
+                        for res, output in executor.map(push, target_entries[1:]):
+                            stdout.write(output)
+                            pushed += 0 if res else 1
+                except RuntimeError:
+                    # NZB-Monkey exits and no new threads are started, the NZBs wait for the next retry
+                    for entry in target_entries[1:]:
+                        outbox.retry(entry, entry.data.get('error'), entry.next_try)
+    finally:
+        if wrapped:
+            sys.stdout = stdout
+    return pushed
+
+
+# Max. seconds NZB-Monkey waits for the outbox retry when it exits
+OUTBOX_EXIT_WAIT = 5
+
+
+def retry_outbox_later(cfg, debug=False):
+    """Retry the due NZBs of the outbox once in the background, NZB-Monkey doesn't wait for unreachable targets
+
+    NZB-Monkey waits up to OUTBOX_EXIT_WAIT seconds for the retry when it exits. Entries whose push hasn't started
+    by then are released for the next retry.
+
+    :param ConfigObj cfg: Config
+    :param bool debug: Enable verbose output
+    :return threading.Thread: Thread or None if the outbox is disabled
+    """
+    outbox = open_outbox(cfg)
+    if outbox is None:
+        return None
 
-    # endregion
+    def finish():
+        thread.join(OUTBOX_EXIT_WAIT)
+        outbox.release_claims()
 
-    # region Exec EXECUTE
-    if ExeTypes.EXECUTE.name == exe_target or debug:
+    def run():
+        try:
+            retry_outbox(cfg, None, True, debug, outbox)
+        except Exception as e:
+            print(Col.FAIL + ' - Outbox retry failed: {}'.format(e) + Col.OFF)
 
-        if debug and exe_target != 'EXECUTE':
-            # Read EXECUTE config to handle NZB saving if target is not EXECUTE
-            exe_target_cfg = {} if exe_target not in cfg.keys() else cfg['EXECUTE']
+    thread = threading.Thread(target=run, name='outbox', daemon=True)
+    thread.start()
+    atexit.register(finish)
+    return thread
 
-        # Check NZB Folder
-        nzb_folder = expandvars(exe_target_cfg.get('nzbsavepath', '%%TEMP%%'))
-        if not check_folder(nzb_folder):
-            print(Col.FAIL + " - Can't access or create NZB folder {}".format(nzb_folder)
-                  + Col.OFF)
-            print_and_wait('Close window in {} second(s)'.format(2 * WAITING_TIME_LONG), 2 * WAITING_TIME_LONG)
-            debug_output_close(debug_logfile, debug)
-            return 1
 
-        # Nzb Save and execute
-        nzb_execute(nzb_folder,
-                    nzb,
-                    nzbsrc['tag'] if not debug else '{}.{}'.format(nzbsrc['tag'], used_search_engine.lower()),
-                    nzbsrc['pass'],
-                    exe_target_cfg.as_bool('passtofile'),
-                    exe_target_cfg.as_bool('passtoclipboard'),
-                    exe_target_cfg.as_bool('dontexecute'),
-                    debug)
-
-        # Clean up NZB Folder
-        if exe_target_cfg.as_bool('clean_up_enable') and int(time()) - exe_target_cfg.as_int(
-                'clean_up_last_run') >= 24 * 3600:
-            print(' - Clean up NZB folder ... ', end='', flush=True)
-            counter = clean_nzb_folder(nzb_folder)
-            if counter == -1:
-                print(Col.FAIL + 'Cleaning failed.' + Col.OFF)
-            elif counter == 0:
-                print(Col.OK + 'Nothing to do.')
-            elif counter > 0:
-                print(Col.OK + 'Deleted {} NZB file(s)'.format(counter))
-            exe_target_cfg['clean_up_last_run'] = int(time())
-            cfg.write()
+def start_outbox_retry(live_cfg, debug=False):
+    """Retry the outbox in the background while a long running mode is active
+
+    :param LiveConfig live_cfg: Config
+    :param bool debug: Enable verbose output
+    :return threading.Event: Set it to stop the retries
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(max(live_cfg.get()['OUTBOX'].as_int('retry_interval'), 10)):
+            try:
+                retry_outbox(live_cfg.get(), None, True, debug)
+            except Exception as e:
+                print(Col.FAIL + ' - Outbox retry failed: {}'.format(e) + Col.OFF)
+
+    threading.Thread(target=run, name='outbox', daemon=True).start()
+    return stop
+
+
+def open_history(cfg):
+    """Open the history of processed releases
+
+    :param ConfigObj cfg: Config
+    :return nzbhistory.History: History or None if the history is disabled or can't be opened
+    """
+    if not cfg['HISTORY'].as_bool('enabled'):
+        return None
+
+    import sqlite3
+    from nzbhistory import History
+
+    try:
+        history = History(splitext(cfg.filename)[0] + '.history')
+        history.prune(cfg['HISTORY'].as_int('keep_days') * 86400)
+    except sqlite3.Error as e:
+        print(Col.WARN + ' - History not available: {}'.format(e) + Col.OFF)
+        return None
+    return history
+
+
+def check_history(history, cfg, nzbsrc, force=False):
+    """Check if a release was pushed recently or is processed by another NZB-Monkey right now
+
+    If the release has to be processed it's marked as running in the history. If another NZB-Monkey is
+    processing the release, wait for it and return its result.
 
-        print(' - Done')
+    :param nzbhistory.History history: History or None
+    :param ConfigObj cfg: Config
+    :param dict nzbsrc: Release with tag and header
+    :param bool force: Process the release even if it was pushed recently
+    :return dict: Result of the earlier run, None if the release has to be processed
+    """
+    if history is None:
+        return None
+
+    from nzbhistory import HistoryState
+
+    state, entry = history.begin(nzbsrc, cfg['HISTORY'].as_int('duplicate_minutes') * 60, force)
+    if state == HistoryState.RUNNING:
+        print(' - Release is processed by another NZB-Monkey, waiting ... ', end='', flush=True)
+        entry = history.wait(nzbsrc)
+        if entry is None or entry['state'] == HistoryState.RUNNING:
+            print(Col.WARN + 'NO RESULT' + Col.OFF)
+            return check_history(history, cfg, nzbsrc, True)
+        print(Col.OK + 'OK' + Col.OFF if entry['res'] == 0 else Col.FAIL + 'FAILED' + Col.OFF)
+    elif state == HistoryState.DONE:
+        print(Col.WARN + ' - Pushed to {} {} ago, skipped. Use --force to push it again'.format(
+            entry['target'], sec_to_time(time() - entry['finished'])) + Col.OFF)
+    else:
+        return None
+
+    return {'res': entry['res'], 'engine': entry['engine'], 'target': entry['target'],
+            'category': entry['category'], 'duplicate': True}
+
+
+def record_history(history, nzbsrc, result, nzb=None):
+    """Store the result of a release in the history
+
+    :param nzbhistory.History history: History or None
+    :param dict nzbsrc: Release with tag and header
+    :param dict result: Result with return code 'res', 'engine', 'target' and 'category'
+    :param NZBRewriter nzb: NZB content, the hash is taken from the downloaded NZB
+    """
+    if history is not None:
+        history.finish(nzbsrc, result, nzb.source if isinstance(nzb, NZBRewriter) else nzb)
+
+
+def process_nzbsrc(cfg, nzbsrc, category=None, interactive=False, debug=False, history=None, force=False):
+    """Search, categorize and push one release, the history is updated even if processing fails
+
+    :param ConfigObj cfg: Config
+    :param dict nzbsrc: Release with tag, header and pass
+    :param str category: Category, None to use the categorizer or the category of the target. In interactive mode
+                         it's the default category of the categorizer
+    :param bool interactive: Ask the user for the category in manual categorize mode
+    :param bool debug: Enable verbose output
+    :param nzbhistory.History history: History to skip duplicates or None
+    :param bool force: Process the release even if it was pushed recently
+    :return dict: Result with return code 'res', 'engine', 'target' and 'category'
+    """
+    targets = get_targets(cfg)
+
+    # An interactive run shows the release when it's called
+    if not interactive:
+        print(' - Tag     : {}\n - Header  : {}'.format(nzbsrc['tag'], ', '.join(nzbsrc.get('headers') or
+                                                                                 [nzbsrc['header']])))
+
+    result = check_history(history, cfg, nzbsrc, force)
+    if result is not None:
+        return result
+
+    result = {'res': 1, 'engine': None, 'target': ', '.join(targets), 'category': None}
+    nzb = None
+    # The result is stored even if processing fails with an exception, so the release isn't blocked
+    try:
+        res, nzb, used_search_engine = search_nzb_cfg(cfg, nzbsrc, debug)
+        result['engine'] = used_search_engine
         if res:
-            waiting_time = WAITING_TIME_LONG
+            result['res'] = res
+            return result
+
+        if category and not interactive:
+            categories = {exe_target: category for exe_target in targets}
         else:
-            waiting_time = WAITING_TIME_SHORT
-        print_and_wait('Close window in {} second(s)'.format(waiting_time), waiting_time)
-        debug_output_close(debug_logfile, debug)
+            categories = categorize_targets(cfg, targets, nzbsrc['tag'], category, interactive)
+        result['category'] = ', '.join(dict.fromkeys(cat for cat in categories.values() if cat))
+
+        results = run_targets(cfg, targets, nzbsrc, nzb, categories, used_search_engine, debug)
+        result['res'] = 1 if any(results.values()) else 0
+        if debug and ExeTypes.EXECUTE.name not in targets:
+            execute_target(cfg, nzbsrc, nzb, used_search_engine, debug)
+        return result
+    finally:
+        record_history(history, nzbsrc, result, nzb)
+
+
+class LiveConfig(object):
+    def __init__(self, cfg_filename, cfg):
+        """Keep the validated config in memory for long running modes and reload it after changes
+
+        :param str cfg_filename: Path to the config file
+        :param ConfigObj cfg: Validated config
+        """
+        self.cfg_filename = cfg_filename
+        self.cfg = cfg
+        self.lock = threading.Lock()
+        self.stamp = self.get_stamp()
+
+    def get_stamp(self):
+        try:
+            stat = os.stat(self.cfg_filename)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def get(self):
+        """Return the config, reload it if the config file was changed"""
+        stamp = self.get_stamp()
+        if stamp != self.stamp:
+            with self.lock:
+                if stamp != self.stamp:
+                    cfg = load_config(self.cfg_filename)
+                    if cfg is not None:
+                        self.cfg = cfg
+                        print(' - Config file changed, reloaded')
+                    self.stamp = stamp
+        return self.cfg
+
+
+def parse_job_request(request):
+    """Return the releases of a job request e.g. from the HTTP API
+
+    :param dict request: nzblnk, text (with one or more releases) or tag, header and password
+    :return list: Releases with tag, header and pass
+    """
+    if request.get('nzblnk'):
+        nzbsrc = parse_nzblnk(request['nzblnk'])
+    elif request.get('text'):
+        return tokenize(request['text'])
+    else:
+        nzbsrc = {'tag': request.get('tag'), 'header': request.get('header'), 'pass': request.get('password')}
+
+    if nzbsrc is None or not nzbsrc['tag'] or not nzbsrc['header']:
+        return []
+    return [nzbsrc]
+
+
+def print_job_result(job):
+    """Print one line with the result of a finished job"""
+    ok = job.result.get('res') == 0
+    SAVE_STDOUT.write(' [{}] {}{:<6}{} {} ({}, {:.1f}s)\n'.format(job.job_id, Col.OK if ok else Col.FAIL,
+                                                              'OK' if ok else 'FAILED', Col.OFF, job.nzbsrc['tag'],
+                                                              job.result.get('engine') or '-', job.duration))
+    SAVE_STDOUT.flush()
+
+
+# endregion
+
+# region Server
+
+
+def run_server(live_cfg, debug=False):
+    """Run the local HTTP API until Ctrl+C
+
+    :param LiveConfig live_cfg: Config
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    from nzbjobs import JobQueue, ThreadOutput
+    from nzbserver import APIServer
+
+    server_cfg = live_cfg.get()['SERVER']
+    host = server_cfg.get('host', '127.0.0.1')
+    port = server_cfg.as_int('port')
+
+    set_unattended(True)
+    set_engine_limit(server_cfg.as_int('engine_limit'))
+    stdout = sys.stdout
+    sys.stdout = ThreadOutput(stdout)
+
+    history = open_history(live_cfg.get())
+    queue = JobQueue(lambda job: process_nzbsrc(live_cfg.get(), job.nzbsrc, job.category, False, debug, history,
+                                                job.force),
+                     server_cfg.as_int('workers'), on_done=print_job_result)
+    try:
+        server = APIServer(host, port, queue, parse_job_request, __version__, server_cfg.get('apikey', ''), debug)
+    except OSError as e:
+        sys.stdout = stdout
+        print(Col.FAIL + ' ERROR: Can\'t listen on {}:{}: {}'.format(host, port, e) + Col.OFF)
+        return 1
+
+    print(' Server listening on http://{}:{}/ with {} worker(s) - Press Ctrl+C to stop\n'.format(
+        host, port, queue.workers))
+    outbox_stop = start_outbox_retry(live_cfg, debug)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\n Stopping server ...')
+    finally:
+        outbox_stop.set()
+        server.server_close()
+        queue.shutdown(wait=False)
+        sys.stdout = stdout
+        set_engine_limit(0)
+        set_unattended(False)
+    return 0
+
+
+# endregion
+
+# region Watch Folder
+
+
+def parse_drop_file(content):
+    """Return the releases of a drop file
+
+    :param str content: NZBLNKs or tag|header|password lines, or a text with releases
+    :return list: Releases with tag, header and pass
+    """
+    releases = [parse_batch_line(line) for line in content.splitlines()]
+    releases = [nzbsrc for nzbsrc in releases if nzbsrc is not None and nzbsrc['tag'] and nzbsrc['header']]
+    return releases or tokenize(content)
+
+
+def run_watch(live_cfg, folder=None, debug=False):
+    """Process the files dropped into the watch folder until Ctrl+C
+
+    :param LiveConfig live_cfg: Config
+    :param str folder: Watch folder, None to use the folder from config
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    import nzbwatch
+    from nzbjobs import JobQueue, ThreadOutput
+
+    watch_cfg = live_cfg.get()['WATCH']
+    folder = expandvars(folder or watch_cfg.get('folder', ''))
+    if not folder:
+        print(Col.FAIL + ' ERROR: No watch folder, set folder in [WATCH] or call --watch <folder>' + Col.OFF)
+        return 1
+    folders = {'processing': join(folder, 'processing'),
+               'done': expandvars(watch_cfg.get('done_folder', '')) or join(folder, 'done'),
+               'failed': expandvars(watch_cfg.get('failed_folder', '')) or join(folder, 'failed')}
+    for path in [folder] + list(folders.values()):
+        if not check_folder(path):
+            print(Col.FAIL + ' ERROR: Can\'t create folder {}'.format(path) + Col.OFF)
+            return 1
+
+    set_unattended(True)
+    set_engine_limit(watch_cfg.as_int('engine_limit'))
+    stdout = sys.stdout
+    sys.stdout = ThreadOutput(stdout)
+
+    history = open_history(live_cfg.get())
+    queue = JobQueue(lambda job: process_nzbsrc(live_cfg.get(), job.nzbsrc, job.category, False, debug, history,
+                                                job.force),
+                     watch_cfg.as_int('workers'), on_done=print_job_result)
+    watcher = nzbwatch.create_watcher(folder, watch_cfg.as_int('poll_interval'))
+    ansi = Writers()
+    pending = dict()
+
+    def finish_file(path, jobs, error=None):
+        ok = error is None and all(job.result.get('res') == 0 for job in jobs)
+        jobs_data = list()
+        for job in jobs:
+            job_data = job.as_dict(with_log=True)
+            job_data['log'] = ansi.escape_ansi(job.log)
+            jobs_data.append(job_data)
+        try:
+            target = nzbwatch.finish(path, folders['done' if ok else 'failed'],
+                                     {'file': basename(path), 'ok': ok, 'error': error, 'finished': time(),
+                                      'jobs': jobs_data})
+        except OSError as e:
+            SAVE_STDOUT.write(Col.FAIL + ' ERROR: Can\'t move {}: {}\n'.format(path, e) + Col.OFF)
+            return
+        SAVE_STDOUT.write(' {}{}{} {}\n'.format(Col.OK if ok else Col.FAIL, 'DONE  ' if ok else 'FAILED', Col.OFF,
+                                                target))
+        SAVE_STDOUT.flush()
+
+    def submit_file(path):
+        try:
+            releases = parse_drop_file(nzbwatch.read_drop_file(path))
+        except (OSError, ValueError) as e:
+            finish_file(path, [], str(e))
+            return
+        if not releases:
+            finish_file(path, [], 'No tag and header found')
+            return
+        pending[path] = [queue.submit(nzbsrc, None, basename(path))[0] for nzbsrc in releases]
+
+    print(' Watching {} with {} worker(s) ({}) - Press Ctrl+C to stop\n'.format(
+        folder, queue.workers, 'inotify' if isinstance(watcher, nzbwatch.InotifyWatcher) else 'polling'))
+    outbox_stop = start_outbox_retry(live_cfg, debug)
+    try:
+        # Files left over from an aborted run and files dropped while NZB-Monkey wasn't running
+        for name in sorted(nzbwatch.scan(folders['processing'])):
+            submit_file(join(folders['processing'], name))
+        for name in sorted(nzbwatch.scan(folder)):
+            path = nzbwatch.claim(folder, name, folders['processing'])
+            if path is not None:
+                submit_file(path)
+
+        while True:
+            for name in watcher.ready(0.5):
+                path = nzbwatch.claim(folder, name, folders['processing'])
+                if path is not None:
+                    submit_file(path)
+            for path, jobs in list(pending.items()):
+                if all(job.done.is_set() for job in jobs):
+                    del pending[path]
+                    finish_file(path, jobs)
+    except KeyboardInterrupt:
+        print('\n Stopping watch ...')
+    finally:
+        outbox_stop.set()
+        watcher.close()
+        queue.shutdown(wait=False)
+        sys.stdout = stdout
+        set_engine_limit(0)
+        set_unattended(False)
+    return 0
+
+
+# endregion
+
+# region Clipboard Monitor
+
+
+def clipboard_sequence():
+    """Return a number which changes with every change of the clipboard or None if it's not available
+
+    On Windows the clipboard has a sequence number, so the content is only read after a change.
+    """
+    if os.name == 'nt':
+        import ctypes
+
+        return ctypes.windll.user32.GetClipboardSequenceNumber()
+    return None
+
+
+def run_clipboard_monitor(live_cfg, debug=False):
+    """Process every release copied to the clipboard until Ctrl+C
+
+    :param LiveConfig live_cfg: Config
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    import hashlib
+    import pyperclip
+    from nzbjobs import JobQueue, ThreadOutput
+
+    clipboard_cfg = live_cfg.get()['CLIPBOARD']
+    interval = clipboard_cfg.as_float('interval')
+    try:
+        # Don't process what is in the clipboard already
+        clip = pyperclip.paste() or ''
+    except pyperclip.PyperclipException as e:
+        print(Col.FAIL + ' ERROR: Can\'t read the clipboard: {}'.format(e) + Col.OFF)
+        return 1
+    last_hash = hashlib.sha1(clip.encode('utf-8', 'replace')).digest()
+    last_sequence = clipboard_sequence()
+
+    set_unattended(True)
+    set_engine_limit(clipboard_cfg.as_int('engine_limit'))
+    stdout = sys.stdout
+    sys.stdout = ThreadOutput(stdout)
+
+    # Open the connections of the shared session with the first job
+    http_session()
+    history = open_history(live_cfg.get())
+    queue = JobQueue(lambda job: process_nzbsrc(live_cfg.get(), job.nzbsrc, job.category, False, debug, history,
+                                                job.force),
+                     clipboard_cfg.as_int('workers'), on_done=print_job_result)
+
+    print(' Watching the clipboard with {} worker(s) - Press Ctrl+C to stop\n'.format(queue.workers), file=stdout)
+    outbox_stop = start_outbox_retry(live_cfg, debug)
+    try:
+        while True:
+            sleep(interval)
+            sequence = clipboard_sequence()
+            if sequence is not None and sequence == last_sequence:
+                continue
+            last_sequence = sequence
+            try:
+                clip = pyperclip.paste() or ''
+            except pyperclip.PyperclipException:
+                continue
+            clip_hash = hashlib.sha1(clip.encode('utf-8', 'replace')).digest()
+            if clip_hash == last_hash:
+                continue
+            last_hash = clip_hash
+
+            for nzbsrc in tokenize(clip):
+                job, new = queue.submit(nzbsrc, None, 'clipboard')
+                SAVE_STDOUT.write(' - {} job [{}] {}\n'.format('Queued' if new else 'Already queued', job.job_id,
+                                                                job.nzbsrc['tag']))
+                SAVE_STDOUT.flush()
+    except KeyboardInterrupt:
+        print('\n Stopping clipboard monitor ...', file=stdout)
+    finally:
+        outbox_stop.set()
+        queue.shutdown(wait=False)
+        sys.stdout = stdout
+        set_engine_limit(0)
+        set_unattended(False)
+    return 0
+
+
+# endregion
+
+# region Single Instance
+
+
+def run_single_instance(live_cfg, nzbsrc, category=None, force=False, debug=False):
+    """Hand over the release to a running NZB-Monkey or become the running instance
+
+    The running instance processes its own release and all releases handed over by later invocations,
+    with shared connections and without duplicates. It exits if there was nothing to do for
+    instance_idle_timeout seconds.
+
+    :param LiveConfig live_cfg: Config
+    :param dict nzbsrc: Release with tag, header and pass
+    :param str category: Category or None
+    :param bool force: Process the release even if it was pushed recently
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    from nzbinstance import InstanceListener, forward, instance_address, instance_authkey
+    from nzbjobs import JobQueue, ThreadOutput
+
+    cfg = live_cfg.get()
+    address, family = instance_address(live_cfg.cfg_filename)
+    authkey = instance_authkey(splitext(live_cfg.cfg_filename)[0] + '.key')
+    print_lock = threading.Lock()
+
+    def print_job(job):
+        with print_lock:
+            SAVE_STDOUT.write('\n [{}] {}\n'.format(job.job_id, job.nzbsrc['tag']))
+            SAVE_STDOUT.write(job.log)
+            SAVE_STDOUT.flush()
+
+    history = open_history(cfg)
+    queue = JobQueue(lambda job: process_nzbsrc(live_cfg.get(), job.nzbsrc, job.category, False, debug, history,
+                                                job.force),
+                     cfg['BATCH'].as_int('workers'), on_done=print_job)
+
+    def handle_message(message):
+        if not isinstance(message.get('nzbsrc'), dict):
+            return {'ok': False}
+        job, new = queue.submit(message['nzbsrc'], message.get('category'), 'handover',
+                                message.get('force') is True)
+        with print_lock:
+            SAVE_STDOUT.write(' - {} job [{}] {}\n'.format('Queued' if new else 'Already queued', job.job_id,
+                                                            job.nzbsrc['tag']))
+            SAVE_STDOUT.flush()
+        return {'ok': True, 'id': job.job_id, 'new': new}
+
+    listener = None
+    for _ in range(5):
+        reply = forward(address, family, authkey, {'nzbsrc': nzbsrc, 'category': category, 'force': force})
+        if reply is not None and reply.get('ok'):
+            print(' - Handed over to the running NZB-Monkey as job [{}]{}'.format(
+                reply['id'], '' if reply['new'] else ', already queued'))
+            queue.shutdown(wait=False)
+            pause(WAITING_TIME_SHORT)
+            return 0
+        listener = InstanceListener(address, family, authkey, handle_message)
+        if listener.listen():
+            break
+        listener = None
+        sleep(0.2)
+
+    if listener is None:
+        print(Col.WARN + ' - No running NZB-Monkey found and listening failed, process the release alone' + Col.OFF)
+
+    set_unattended(True)
+    set_engine_limit(cfg['BATCH'].as_int('engine_limit'))
+    stdout = sys.stdout
+    sys.stdout = ThreadOutput(stdout)
+    try:
+        jobs = [queue.submit(nzbsrc, category, 'own', force)[0]]
+        idle_timeout = cfg['GENERAL'].as_int('instance_idle_timeout')
+        last_activity = time()
+        while listener is not None:
+            sleep(0.2)
+            if queue.pending():
+                last_activity = time()
+            elif time() - last_activity >= idle_timeout:
+                break
+        if listener is not None:
+            listener.close()
+        queue.shutdown(wait=True)
+        jobs = queue.recent(queue.keep)
+    finally:
+        sys.stdout = stdout
+        set_engine_limit(0)
+        set_unattended(False)
+
+    failed = len([job for job in jobs if job.result.get('res') != 0])
+    print('\n - Processed {} release(s), {} failed'.format(len(jobs), failed))
+    return 1 if failed else 0
+
+
+# endregion
+
+# region Batch
+
+
+def parse_batch_line(line):
+    """Parse one line of a batch file
+
+    A line is a NZBLNK URI or tag, header and optional password separated by tabs or |.
+    Empty lines and lines starting with # are ignored.
+
+    :param str line: Line
+    :return dict: Release with tag, header and pass or None
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.lower().startswith('nzblnk:'):
+        return parse_nzblnk(line)
+
+    fields = [field.strip() for field in (line.split('\t') if '\t' in line else line.split('|', 2))]
+    if len(fields) < 2:
+        return {'tag': None, 'header': fields[0], 'pass': None}
+    return {'tag': fields[0], 'header': fields[1], 'pass': fields[2] if len(fields) > 2 and fields[2] else None}
+
+
+def read_batch(source):
+    """Read releases from a batch file or stdin
+
+    :param str source: File name or - for stdin
+    :return list: list with tuples of line number and release or None for invalid lines
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    releases = list()
+    for count, line in enumerate(lines, start=1):
+        if not line.strip() or line.strip().startswith('#'):
+            continue
+        nzbsrc = parse_batch_line(line)
+        if nzbsrc is None or not nzbsrc['tag'] or not nzbsrc['header']:
+            releases.append((count, None))
+        else:
+            releases.append((count, nzbsrc))
+    return releases
+
+
+def run_batch(cfg, source, workers, engine_limit, category=None, force=False, debug=False):
+    """Process all releases from a batch file with a pool of workers and print a summary
+
+    :param ConfigObj cfg: Config
+    :param str source: Batch file name or - for stdin
+    :param int workers: Number of parallel jobs
+    :param int engine_limit: Max. parallel downloads per search engine, 0 = unlimited
+    :param str category: Category for all releases or None
+    :param bool force: Process releases even if they were pushed recently
+    :param bool debug: Enable verbose output
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    try:
+        releases = read_batch(source)
+    except (IOError, UnicodeDecodeError) as e:
+        print(Col.FAIL + ' ERROR: Can\'t read batch file: {}'.format(e) + Col.OFF)
+        return 1
+
+    invalid = [count for count, nzbsrc in releases if nzbsrc is None]
+    releases = [(count, nzbsrc) for count, nzbsrc in releases if nzbsrc is not None]
+
+    print(' Batch mode: {} release(s) with {} worker(s), max. {} request(s) per search engine\n'.format(
+        len(releases), workers, engine_limit or 'unlimited'))
+    for count in invalid:
+        print(Col.WARN + ' - Line {}: No tag and header found, skipped'.format(count) + Col.OFF)
+
+    res = run_releases(cfg, [('line {}'.format(count), nzbsrc) for count, nzbsrc in releases], workers, engine_limit,
+                       category, force, debug, skipped=len(invalid))
+    return res if not invalid else 1
+
+
+def run_releases(cfg, releases, workers, engine_limit, category=None, force=False, debug=False, skipped=0):
+    """Process releases with a pool of workers and print a summary
+
+    :param ConfigObj cfg: Config
+    :param list releases: Tuples with the source e.g. the line number and the release
+    :param int workers: Number of parallel jobs
+    :param int engine_limit: Max. parallel downloads per search engine, 0 = unlimited
+    :param str category: Category for all releases or None
+    :param bool force: Process releases even if they were pushed recently
+    :param bool debug: Enable verbose output
+    :param int skipped: Number of releases which were skipped before e.g. invalid lines
+    :returns int: Return code 0 is OK, return code > 0 is NOK
+    """
+    from nzbjobs import JobQueue, ThreadOutput
+
+    set_unattended(True)
+    set_engine_limit(engine_limit)
+    print_lock = threading.Lock()
+
+    def print_job(job):
+        with print_lock:
+            SAVE_STDOUT.write('\n [{}] {}\n'.format(job.source, job.nzbsrc['tag']))
+            SAVE_STDOUT.write(job.log)
+            SAVE_STDOUT.flush()
+
+    stdout = sys.stdout
+    sys.stdout = ThreadOutput(stdout)
+    start = time()
+    try:
+        history = open_history(cfg)
+        queue = JobQueue(lambda job: process_nzbsrc(cfg, job.nzbsrc, category, False, debug, history, force),
+                         workers, keep=len(releases) + 1, on_done=print_job)
+        jobs = list()
+        for source, nzbsrc in releases:
+            job, new = queue.submit(nzbsrc, category, source)
+            if new:
+                jobs.append(job)
+            else:
+                print(Col.WARN + ' - {}: Same release as {}, skipped'.format(source.capitalize(), job.source) +
+                      Col.OFF)
+        queue.wait(jobs)
+        queue.shutdown()
+    finally:
+        sys.stdout = stdout
+        set_engine_limit(0)
+        set_unattended(False)
+    # NZBs of earlier runs whose targets weren't reachable
+    retry_outbox_later(cfg, debug)
+    duration = time() - start
+
+    # Summary
+    ok = [job for job in jobs if job.result.get('res') == 0]
+    engines = dict()
+    for job in ok:
+        engines[job.result.get('engine')] = engines.get(job.result.get('engine'), 0) + 1
+
+    text = 'Batch summary'
+    print('\n {}\n {}'.format(text, '-' * len(text)))
+    for job in jobs:
+        print(' {}{:<7}{} {:>6.1f}s  {:<10} {}'.format(Col.OK if job.result.get('res') == 0 else Col.FAIL,
+                                                      'OK' if job.result.get('res') == 0 else 'FAILED', Col.OFF,
+                                                      job.duration, job.result.get('engine') or '-',
+                                                      job.nzbsrc['tag']))
+    print(' {}'.format('-' * len(text)))
+    print(' Releases: {}  OK: {}  Failed: {}  Skipped: {}'.format(len(jobs), len(ok), len(jobs) - len(ok),
+                                                                  skipped + len(releases) - len(jobs)))
+    print(' NZBs by search engine: {}'.format(
+        ', '.join('{} {}'.format(engine, n) for engine, n in sorted(engines.items())) or '-'))
+    print(' Duration: {} ({:.2f} releases/min)\n'.format(sec_to_time(duration),
+                                                        len(jobs) / max(duration, 1) * 60))
+    return 0 if len(ok) == len(jobs) else 1
+
+
+# endregion
+
+
+def main():
+    """NZB-Monkey - The easy way to download NZB files"""
+
+    name = 'NZB-Monkey v{}'.format(__version__)
+    print('\n %s\n %s' % (name, '=' * len(name)))
+
+    script_path = sys.argv[0] if not hasattr(sys, 'frozen') else os.path.normpath(os.path.abspath(sys.executable))
+    cfg_filename = splitext(script_path)[0] + '.cfg'
+    log_filename = splitext(script_path)[0] + '.log'
+
+    cfg = load_config(cfg_filename)
+    if cfg is None:
+        sleep(WAITING_TIME_LONG)
         return 0
-    # endregion
 
+    targets = get_targets(cfg)
+
+    debug = cfg['GENERAL'].as_bool('debug')
+    if debug:
+        debug_message = 'Debug output enabled for {}'.format(name)
+        debug_logfile = debug_output_open(log_filename, debug, '\n {}\n {}\n {}\n\n'.format(
+            '=' * len(debug_message), debug_message, '=' * len(debug_message)))
+        print(' Started: {} ({})'.format(strftime('%Y-%m-%d %H:%M:%S'), int(time())))
+        text = 'Command line arguments passed to NZB-Monkey'
+        print(' {}\n {}'.format(text, '-' * len(text)))
+        for count, arg in enumerate(sys.argv):
+            print(' Arg[{}]: {}'.format(count, arg))
+        print(' {}\n'.format('-' * len(text)))
     else:
-        print_and_wait(Col.FAIL + ' ERROR: ' + Col.OFF + ' Target "' + exe_target + '" unknown!', 2 * WAITING_TIME_LONG)
+        debug_logfile = None
+
+    # region Processing Input
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-t', '--tag', action='store', help='Tag for Releasename')
+    parser.add_argument('-s', '--subject', action='store', help='Subject (Header) for NZB Search')
+    parser.add_argument('-p', '--password', action='store', help='Password to extract files')
+    parser.add_argument('-c', '--category', action='store', help='Category for SABnzbd or NZBGet')
+    parser.add_argument('-b', '--batch', action='store', metavar='FILE',
+                        help='Process all NZBLNKs or tag|header|password lines from FILE, - for stdin')
+    parser.add_argument('-w', '--workers', action='store', type=int, help='Parallel jobs in batch mode')
+    parser.add_argument('--engine-limit', action='store', type=int,
+                        help='Max. parallel requests per search engine in batch mode, 0 = unlimited')
+    parser.add_argument('--server', action='store_true', help='Run the local HTTP API server')
+    parser.add_argument('--watch', action='store', nargs='?', const='', metavar='FOLDER',
+                        help='Process files with NZBLNKs dropped into FOLDER or the watch folder from config')
+    parser.add_argument('--monitor', action='store_true',
+                        help='Watch the clipboard and process every copied NZBLNK or release')
+    parser.add_argument('-f', '--force', action='store_true', help='Push the release even if it was pushed recently')
+    parser.add_argument('--rebuild-catalog', action='store_true',
+                        help='Rebuild the catalog of saved NZBs from the NZB folder')
+    parser.add_argument('nzblnk', nargs=argparse.REMAINDER, help='NZBLNK URI')
+    args = parser.parse_args()
+
+    if args.category:
+        category_args = args.category
+    else:
+        category_args = None
+
+    if args.rebuild_catalog:
+        res = rebuild_catalog(cfg)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    if args.server:
+        res = run_server(LiveConfig(cfg_filename, cfg), debug)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    if args.monitor:
+        res = run_clipboard_monitor(LiveConfig(cfg_filename, cfg), debug)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    if args.watch is not None:
+        res = run_watch(LiveConfig(cfg_filename, cfg), args.watch or None, debug)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    if args.batch:
+        res = run_batch(cfg,
+                        args.batch,
+                        args.workers if args.workers else cfg['BATCH'].as_int('workers'),
+                        args.engine_limit if args.engine_limit is not None else cfg['BATCH'].as_int('engine_limit'),
+                        category_args,
+                        args.force,
+                        debug)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    if len(args.nzblnk) > 0:
+        called_by = 'by NZBLNK scheme'
+
+        nzbsrc = parse_nzblnk(args.nzblnk[0])
+        if nzbsrc is None:
+            print_and_wait(Col.FAIL + ' ERROR: ' + Col.OFF + 'Please provide a NZBLNK.', WAITING_TIME_LONG)
+            debug_output_close(debug_logfile, debug)
+            return 1
+
+    elif args.subject and args.tag:
+        called_by = 'by Arguments'
+
+        tag = args.tag
+        header = args.subject
+        if args.password:
+            password = args.password
+        else:
+            password = ''
+
+        nzbsrc = {
+            'tag': tag,
+            'header': header,
+            'pass': password
+        }
+
+    else:
+        called_by = 'with clipboard'
+
+        import pyperclip
+
+        clip = pyperclip.paste()
+
+        if clip is None or clip == '':
+            print_and_wait(' Clipboard is empty. So please call {} <nzblnk> or with text in clipboard.'.format(
+                basename(sys.argv[0])),
+                WAITING_TIME_LONG)
+            return 1
+
+        releases = tokenize(clip)
+        if len(releases) > 1:
+            workers = args.workers if args.workers else cfg['BATCH'].as_int('workers')
+            engine_limit = args.engine_limit if args.engine_limit is not None else cfg['BATCH'].as_int('engine_limit')
+            print(' Called with clipboard: {} release(s) with {} worker(s), max. {} request(s) per search engine\n'
+                  .format(len(releases), workers, engine_limit or 'unlimited'))
+            res = run_releases(cfg, [('release {}'.format(count), nzbsrc) for count, nzbsrc in
+                                     enumerate(releases, start=1)], workers, engine_limit, category_args, args.force,
+                               debug)
+            print_and_wait('Close window in {} second(s)'.format(WAITING_TIME_LONG), WAITING_TIME_LONG)
+            debug_output_close(debug_logfile, debug)
+            return res
+
+        nzbsrc = releases[0] if releases else parse_clipboard(clip)
+
+    if nzbsrc['tag'] is None or nzbsrc['header'] is None:
+        print_and_wait(Col.FAIL + ' ERROR: Please provide a tag and header info.' + Col.OFF, WAITING_TIME_LONG)
         debug_output_close(debug_logfile, debug)
         return 1
 
+    print(""" Called {3}:\n
+     - Tag     : {0}
+     - Header  : {1}
+     - Password: {2}
+    """.format(nzbsrc['tag'],
+               ', '.join(nzbsrc.get('headers') or [nzbsrc['header']]),
+               nzbsrc['pass'] or Col.WARN + 'EMPTY' + Col.OFF,
+               called_by))
+
+    if cfg['GENERAL'].as_bool('single_instance'):
+        res = run_single_instance(LiveConfig(cfg_filename, cfg), nzbsrc, category_args, args.force, debug)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    record_scenario(nzbsrc=nzbsrc,
+                    category=category_args,
+                    search_engines=get_search_engines(cfg),
+                    search_defs=SEARCH_ENGINES,
+                    nzbcheck=cfg['NZBCheck'].dict(),
+                    target=targets[0],
+                    target_cfg={k: v for k, v in dict(cfg[targets[0]] if targets[0] in cfg.keys() else {}).items()
+                                if k in SCENARIO_TARGET_KEYS})
+    # endregion
+
+    result = process_nzbsrc(cfg, nzbsrc, category_args, interactive=True, debug=debug, history=open_history(cfg),
+                            force=args.force)
+    res = result['res']
+    if result.get('duplicate'):
+        print_and_wait('Close window in {} second(s)'.format(WAITING_TIME_LONG), WAITING_TIME_LONG)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    # No NZB found
+    if not result['engine']:
+        print_and_wait('Close window in {} second(s)'.format(2 * WAITING_TIME_LONG), 2 * WAITING_TIME_LONG)
+        debug_output_close(debug_logfile, debug)
+        return res
+
+    # NZBs of earlier runs whose targets weren't reachable
+    retry_outbox_later(cfg, debug)
+
+    print(' - Done')
+    if res:
+        waiting_time = WAITING_TIME_LONG
+    else:
+        waiting_time = WAITING_TIME_SHORT
+    print_and_wait('Close window in {} second(s)'.format(waiting_time), waiting_time)
+    debug_output_close(debug_logfile, debug)
+    return res
+
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 
-from configobj import ConfigObj
+import hashlib
 
+from configobj import ConfigObj
 
-def getSpec():
-    return ConfigObj("""
+SPEC = """
 [GENERAL]
 # Target for handling nzb files - EXECUTE, SABNZBD, NZBGET or SYNOLOGYDLS
-target = string(default = 'EXECUTE')
+# Several targets separated by commas get the NZB at the same time, e.g. SABNZBD, NZBGET, EXECUTE
+target = force_list(default = list('EXECUTE'))
+# Max. seconds for all targets together, requests still running then are cut off and the target counts as failed
+target_timeout = integer(default = 120)
 
 # Let the monkey choose a category. Values are: off, auto, manual
 categorize = 'option("off", "auto", "manual", default="off")'
@@ -15,6 +18,12 @@ categorize = 'option("off", "auto", "manual", default="off")'
 # Debug outputs
 debug = boolean(default = False)
 
+# Hand over NZBLNKs to an already running NZB-Monkey, which processes them in parallel
+# The manual categorizer is not available in this mode
+single_instance = boolean(default = False)
+# The running NZB-Monkey exits after x seconds without new NZBLNKs
+instance_idle_timeout = integer(default = 10)
+
 [EXECUTE]
 # Extend password to filename {{password}}
 passtofile = boolean(default = True)
@@ -24,10 +33,18 @@ passtoclipboard = boolean(default = False)
 nzbsavepath = string(default = '')
 # Don't execute default programm for .nzb
 dontexecute = boolean(default = True)
+# Save the nzb gzip compressed as .nzb.gz, SABnzbd and NZBGet watch folders accept them
+compress = boolean(default = False)
+# Compression level 1-9 of .nzb.gz files
+compress_level = 'integer(min=1, max=9, default=5)'
+# Flush the nzb file to disk: off, file (before it's renamed to .nzb) or full (file and folder)
+fsync = 'option("off", "file", "full", default="off")'
 # Delete old NZB files from nzbsavepath
 clean_up_enable = boolean(default = False)
 # NZB files older than x days will be deleted
 clean_up_max_age = string(default = '2')
+# Keep the NZB files below x MB, the least recently used files are deleted first, 0 = no limit
+clean_up_max_size = integer(default = 0)
 # Last clean up run. Only daily clean up. Set to 0 to force run on next start
 clean_up_last_run = string(default = '0')
 
@@ -50,6 +67,8 @@ basepath = string(default = 'sabnzbd')
 category = string(default = '')
 # Add the nzb paused to the queue
 addpaused = boolean(default = False)
+# Upload the nzb gzip compressed (.nzb.gz)
+compress = boolean(default = True)
 
 [NZBGET]
 # NZBGet Host
@@ -93,6 +112,71 @@ max_missing_files = integer(default = 2)
 # Use always all Searchengines to find the best NZB
 best_nzb = boolean(default = True)
 
+[BATCH]
+# Parallel jobs in batch mode
+workers = integer(default = 4)
+# Max. parallel requests per search engine in batch mode, 0 = unlimited
+engine_limit = integer(default = 2)
+
+[SERVER]
+# Listen address of the HTTP API (--server), use 127.0.0.1 for local access only
+host = string(default = '127.0.0.1')
+# Listen port of the HTTP API
+port = integer(default = 8089)
+# API key, if set every request needs the header X-Api-Key
+apikey = string(default = '')
+# Parallel jobs
+workers = integer(default = 4)
+# Max. parallel requests per search engine, 0 = unlimited
+engine_limit = integer(default = 2)
+
+[WATCH]
+# Folder for files with NZBLNKs or tag|header|password lines (--watch)
+folder = string(default = '')
+# Folders for processed files, empty = subfolders done and failed of the watch folder
+done_folder = string(default = '')
+failed_folder = string(default = '')
+# Seconds between two scans of the folder if inotify isn't available
+poll_interval = integer(default = 2)
+# Parallel jobs
+workers = integer(default = 4)
+# Max. parallel requests per search engine, 0 = unlimited
+engine_limit = integer(default = 2)
+
+[CLIPBOARD]
+# Seconds between two checks of the clipboard (--monitor)
+interval = float(default = 0.5)
+# Parallel jobs
+workers = integer(default = 4)
+# Max. parallel requests per search engine, 0 = unlimited
+engine_limit = integer(default = 2)
+
+[HISTORY]
+# Remember processed releases in <config name>.history to skip repeated requests
+enabled = boolean(default = True)
+# Skip a release which was pushed successfully within the last x minutes, use --force to push it again
+# 0 = never skip
+duplicate_minutes = integer(default = 60)
+# Forget releases after x days
+keep_days = integer(default = 90)
+
+[OUTBOX]
+# Keep NZBs in <config name>.outbox if the target isn't reachable and push them later
+enabled = boolean(default = True)
+# Seconds until the first retry, the wait doubles with every failed retry
+retry_interval = integer(default = 60)
+# Max. seconds between two retries
+max_retry_interval = integer(default = 3600)
+# Drop NZBs which couldn't be pushed within x days
+keep_days = integer(default = 7)
+
+[CATALOG]
+# Index the NZBs saved by the EXECUTE target in <config name>.catalog, use --rebuild-catalog after
+# copying or deleting NZBs in the NZB folder by hand
+enabled = boolean(default = True)
+# Use a saved NZB of the release instead of searching again
+reuse = boolean(default = False)
+
 [CATEGORIZER]
 # Place your category and you regex here
 # Please uncomment the following lines
@@ -111,4 +195,13 @@ binsearch =  integer(default = 3)
 nzbindex =  integer(default = 1)
 # Enable NZBKing
 nzbking =  integer(default = 2)
-""".split('\n'))
+"""
+
+
+def getSpec():
+    return ConfigObj(SPEC.split('\n'))
+
+
+def getSpecVersion():
+    """Return a hash of the config spec, it changes with every change of the spec"""
+    return hashlib.sha1(SPEC.encode('utf-8')).hexdigest()
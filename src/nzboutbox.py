@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Outbox for NZBs which could not be pushed
+
+If a download target is not reachable, the checked NZB is spooled to the outbox folder together with the
+release, the target and the category, so the search doesn't have to be repeated. Every entry is a .nzb file
+and a .json file with the meta data. The entries are pushed again later, the wait between two attempts doubles
+with every failed attempt. An entry is claimed by renaming its .json file, so several NZB-Monkeys sharing the
+outbox never push the same NZB twice.
+"""
+
+import json
+import os
+from time import time
+
+from nzbjobs import job_key
+from nzbrewriter import write_atomic
+
+# Extension of a claimed entry, the NZB is pushed right now
+CLAIMED = '.sending'
+# Seconds after which a claim of a crashed NZB-Monkey is released
+CLAIM_TIMEOUT = 3600
+
+
+class OutboxEntry(object):
+    def __init__(self, entry_id, data):
+        """NZB waiting in the outbox
+
+        :param str entry_id: Id, the name of the files without extension
+        :param dict data: Meta data with target, nzbsrc, category, engine, attempts, created, next_try and error
+        """
+        self.entry_id = entry_id
+        self.data = data
+
+    @property
+    def target(self):
+        return self.data['target']
+
+    @property
+    def nzbsrc(self):
+        return self.data['nzbsrc']
+
+    @property
+    def category(self):
+        return self.data.get('category') or ''
+
+    @property
+    def next_try(self):
+        return self.data.get('next_try', 0)
+
+
+def write_private(filename, content):
+    """Write a file only readable for the user, it's replaced atomically"""
+    write_atomic(filename, content, mode=0o600)
+
+
+class Outbox(object):
+    def __init__(self, folder, retry_interval=60, max_retry_interval=3600):
+        """Folder with NZBs waiting for their target
+
+        :param str folder: Outbox folder, it's created with the first entry
+        :param int retry_interval: Seconds until the first retry
+        :param int max_retry_interval: Max. seconds between two retries
+        """
+        self.folder = folder
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        # Ids of the entries claimed by this outbox and not done or released yet
+        self.claimed = set()
+        # Ids of the claimed entries whose push has started
+        self.sending = set()
+
+    def path(self, entry_id, extension):
+        return os.path.join(self.folder, entry_id + extension)
+
+    def add(self, target, nzbsrc, category, engine, nzb, error=None):
+        """Spool a NZB for a target
+
+        :param str target: Target name
+        :param dict nzbsrc: Release with tag, header and pass
+        :param str category: Category
+        :param str engine: Search engine the NZB comes from
+        :param nzb: NZB content
+        :type nzb: bytes or NZBRewriter
+        :param str error: Reason why the push failed
+        :return OutboxEntry: Entry
+        :raise OSError: Entry can't be written
+        """
+        now = time()
+        entry_id = '{}-{}-{}'.format(int(now * 1000), os.getpid(), os.urandom(4).hex())
+        entry = OutboxEntry(entry_id, {'target': target,
+                                       'key': job_key(nzbsrc),
+                                       'nzbsrc': {'tag': nzbsrc.get('tag'), 'header': nzbsrc.get('header'),
+                                                  'pass': nzbsrc.get('pass')},
+                                       'category': category,
+                                       'engine': engine,
+                                       'attempts': 1,
+                                       'created': now,
+                                       'next_try': now + self.retry_interval,
+                                       'error': error})
+        os.makedirs(self.folder, mode=0o700, exist_ok=True)
+        # The .json file is written last, an entry without it is not complete
+        write_private(self.path(entry_id, '.nzb'), nzb)
+        write_private(self.path(entry_id, '.json'), json.dumps(entry.data).encode('utf-8'))
+        return entry
+
+    def entries(self, target=None):
+        """Return the unclaimed entries, oldest first
+
+        :param str target: Only entries of this target, None for all
+        :return list: Entries
+        """
+        entries = list()
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return entries
+        now = time()
+        for name in sorted(names):
+            entry_id, extension = os.path.splitext(name)
+            if extension == CLAIMED and not self.release_stale(entry_id, now):
+                continue
+            if extension not in ('.json', CLAIMED):
+                continue
+            try:
+                with open(self.path(entry_id, '.json'), 'rb') as f:
+                    data = json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError):
+                continue
+            if target is None or data.get('target') == target:
+                entries.append(OutboxEntry(entry_id, data))
+        return entries
+
+    def due(self, target=None, now=None):
+        """Return the entries whose next retry is due, oldest first"""
+        now = time() if now is None else now
+        return [entry for entry in self.entries(target) if entry.next_try <= now]
+
+    def release_stale(self, entry_id, now):
+        """Release the claim of a NZB-Monkey which crashed while pushing
+
+        :return bool: True if the claim was released
+        """
+        path = self.path(entry_id, CLAIMED)
+        try:
+            if now - os.stat(path).st_mtime > CLAIM_TIMEOUT:
+                os.replace(path, self.path(entry_id, '.json'))
+                return True
+        except OSError:
+            pass
+        return False
+
+    def claim(self, entry):
+        """Claim an entry for a push, only one NZB-Monkey gets it
+
+        :return bool: True if the entry was claimed
+        """
+        try:
+            os.rename(self.path(entry.entry_id, '.json'), self.path(entry.entry_id, CLAIMED))
+        except OSError:
+            return False
+        self.claimed.add(entry.entry_id)
+        return True
+
+    def start(self, entry):
+        """Mark a claimed entry as pushed right now, release_claims keeps its claim"""
+        self.sending.add(entry.entry_id)
+
+    def load(self, entry):
+        """Return the NZB of an entry
+
+        :return bytes: NZB content
+        :raise OSError: NZB can't be read
+        """
+        with open(self.path(entry.entry_id, '.nzb'), 'rb') as f:
+            return f.read()
+
+    def done(self, entry):
+        """Remove a claimed entry after the push"""
+        self.claimed.discard(entry.entry_id)
+        self.sending.discard(entry.entry_id)
+        for extension in (CLAIMED, '.json', '.nzb'):
+            try:
+                os.remove(self.path(entry.entry_id, extension))
+            except OSError:
+                pass
+
+    def retry(self, entry, error=None, next_try=None):
+        """Release a claimed entry after a failed push, the next retry waits twice as long as the last one
+
+        :param OutboxEntry entry: Claimed entry
+        :param str error: Reason why the push failed
+        :param float next_try: Time of the next retry for an entry which was not pushed, e.g. because another NZB
+                               for the same target failed, None after a failed push
+        """
+        if next_try is None:
+            entry.data['attempts'] = entry.data.get('attempts', 1) + 1
+            next_try = time() + min(self.retry_interval * 2 ** (entry.data['attempts'] - 1), self.max_retry_interval)
+        entry.data['next_try'] = next_try
+        entry.data['error'] = error
+        self.claimed.discard(entry.entry_id)
+        self.sending.discard(entry.entry_id)
+        try:
+            write_private(self.path(entry.entry_id, '.json'), json.dumps(entry.data).encode('utf-8'))
+            os.remove(self.path(entry.entry_id, CLAIMED))
+        except OSError:
+            pass
+
+    def wake(self, target):
+        """Make the entries of a target due now, e.g. because the target is reachable again
+
+        :return int: Number of entries
+        """
+        woken = 0
+        now = time()
+        for entry in self.entries(target):
+            if entry.next_try > now and self.claim(entry):
+                self.retry(entry, entry.data.get('error'), now)
+                woken += 1
+        return woken
+
+    def release_claims(self):
+        """Release the entries still claimed by this outbox whose push hasn't started, e.g. when NZB-Monkey exits
+
+        A push which has started may have reached the target already, its claim is released after CLAIM_TIMEOUT.
+        """
+        for entry_id in list(self.claimed - self.sending):
+            self.claimed.discard(entry_id)
+            try:
+                os.replace(self.path(entry_id, CLAIMED), self.path(entry_id, '.json'))
+            except OSError:
+                pass
+
+    def discard(self, target, nzbsrc):
+        """Remove the entries of a release which was pushed to the target directly
+
+        :return int: Number of removed entries
+        """
+        key = job_key(nzbsrc)
+        removed = 0
+        for entry in self.entries(target):
+            if entry.data.get('key') == key and self.claim(entry):
+                self.done(entry)
+                removed += 1
+        return removed
+
+    def prune(self, max_age):
+        """Remove entries which are waiting longer than max_age seconds
+
+        :return int: Number of removed entries
+        """
+        removed = 0
+        now = time()
+        for entry in self.entries():
+            if now - entry.data.get('created', now) > max_age and self.claim(entry):
+                self.done(entry)
+                removed += 1
+        # .nzb files without .json of an aborted add
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return removed
+        for name in names:
+            entry_id, extension = os.path.splitext(name)
+            if extension == '.nzb' and not any(os.path.exists(self.path(entry_id, other))
+                                               for other in ('.json', CLAIMED)):
+                try:
+                    if now - os.stat(self.path(entry_id, '.nzb')).st_mtime > CLAIM_TIMEOUT:
+                        os.remove(self.path(entry_id, '.nzb'))
+                except OSError:
+                    pass
+        return removed
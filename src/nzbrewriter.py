@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming NZB rewriter
+
+Meta data like password, category, name and tags is written into the <head> of a NZB while it's written
+to a file or a request body. Only the <head> is built again, the rest of the NZB is passed on as slices of
+the original content, so there is never a second copy of the NZB.
+"""
+
+import binascii
+import codecs
+import os
+import re
+import zlib
+from html import unescape
+
+CHUNK_SIZE = 64 * 1024
+# 57 bytes are one line of base64 (76 characters), blocks of whole lines can be encoded independently
+BASE64_BLOCK_SIZE = 57 * 1024
+# Compression level of .nzb.gz files and uploads, NZBs shrink to about a fifth already with a low level
+GZIP_LEVEL = 5
+
+# Meta types which can be given more than once, all other types replace an existing entry
+MULTI_VALUE_META = ('tag',)
+
+XML_ENCODING = re.compile(rb'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+NZB_TAG = re.compile(rb'<nzb\b[^>]*>', re.IGNORECASE)
+HEAD_TAG = re.compile(rb'<head\b[^>]*?(/?)>', re.IGNORECASE)
+HEAD_END_TAG = re.compile(rb'</head\s*>', re.IGNORECASE)
+META_TAG = re.compile(rb'[ \t]*<meta\s+type\s*=\s*["\']([^"\']*)["\'][^>]*>(.*?)</meta\s*>[ \t]*\r?\n?',
+                      re.IGNORECASE | re.DOTALL)
+
+
+def escape(text):
+    """Escape a text for XML content and attributes"""
+    return (str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('"', '&quot;').replace("'", '&apos;'))
+
+
+def chunks(content, chunk_size=CHUNK_SIZE):
+    """Yield slices of content without copying it
+
+    :param content: NZB content or a rewriter
+    :type content: bytes or NZBRewriter
+    """
+    if isinstance(content, NZBRewriter):
+        yield from content
+        return
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def gzip_chunks(content, level=GZIP_LEVEL):
+    """Yield content compressed as gzip file, it's compressed chunk by chunk
+
+    :param content: NZB content or a rewriter
+    :type content: bytes or NZBRewriter
+    :param int level: Compression level 1-9
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks(content):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gzip_content(content, level=GZIP_LEVEL):
+    """Return content compressed as gzip file
+
+    :param content: NZB content or a rewriter
+    :type content: bytes or NZBRewriter
+    :param int level: Compression level 1-9
+    :return bytes: gzip file
+    """
+    return b''.join(gzip_chunks(content, level))
+
+
+def write_atomic(filename, content, compress=False, level=GZIP_LEVEL, fsync='off', mode=0o666):
+    """Write a NZB to a temporary file in the same folder and rename it, nobody sees a partly written file
+
+    :param str filename: Destination file
+    :param content: NZB content or a rewriter
+    :type content: bytes or NZBRewriter
+    :param bool compress: Write a gzip file
+    :param int level: Compression level 1-9
+    :param str fsync: 'off', 'file' to flush the file to disk before the rename, 'full' to flush the folder
+                      after the rename as well
+    :param int mode: File permissions, e.g. 0o600 for files only readable for the user
+    :return int: Bytes written
+    :raise OSError: File can't be written
+    """
+    folder, name = os.path.split(filename)
+    # Hidden and with another extension, so watch folders ignore it
+    tmp_filename = os.path.join(folder, '.{}.{}.tmp'.format(name, os.getpid()))
+    written = 0
+    try:
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), mode)
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in gzip_chunks(content, level) if compress else chunks(content):
+                f.write(chunk)
+                written += len(chunk)
+            if fsync != 'off':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except OSError:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+    if fsync == 'full' and os.name != 'nt':
+        # The rename is only durable after the folder is flushed
+        fd = os.open(folder or '.', os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return written
+
+
+class NZBRewriter(object):
+    def __init__(self, nzb, meta=None, chunk_size=CHUNK_SIZE, check=None):
+        """NZB with meta data which is written into the <head> on output
+
+        :param bytes nzb: NZB content, it is not changed
+        :param meta: Meta type and value pairs, e.g. [('password', 'secret')]
+        :param int chunk_size: Size of the slices of the NZB content
+        :param check: Result of the NZB check with complete, files_missing and segments_missing_percent or None
+        """
+        self.source = nzb
+        self.meta = list()
+        self.chunk_size = chunk_size
+        self.check = check
+        self.rewrite = None
+        for meta_type, value in meta or ():
+            self.set_meta(meta_type, value)
+
+    def set_meta(self, meta_type, value):
+        """Add a meta entry, empty values are ignored
+
+        :param str meta_type: Meta type, e.g. password, category, name or tag
+        :param str value: Value
+        """
+        if value is None or value == '':
+            return
+        meta_type = meta_type.lower()
+        value = str(value)
+        if meta_type in MULTI_VALUE_META:
+            if (meta_type, value) in self.meta:
+                return
+        else:
+            self.meta = [entry for entry in self.meta if entry[0] != meta_type]
+        self.meta.append((meta_type, value))
+        self.rewrite = None
+
+    def copy(self):
+        """Return a rewriter for the same NZB content with a copy of the meta data"""
+        return NZBRewriter(self.source, self.meta, self.chunk_size, self.check)
+
+    def encoding(self):
+        """Return the encoding of the NZB from the XML declaration"""
+        m = XML_ENCODING.match(self.source, 0, 200)
+        if m is not None:
+            try:
+                return codecs.lookup(m.group(1).decode('ascii')).name
+            except LookupError:
+                pass
+        return 'utf-8'
+
+    @staticmethod
+    def render_meta(meta, encoding):
+        """Return <meta> lines for meta type and value pairs"""
+        return b''.join('<meta type="{}">{}</meta>\n'.format(escape(meta_type), escape(value))
+                        .encode(encoding, 'xmlcharrefreplace') for meta_type, value in meta)
+
+    def plan(self):
+        """Find the part of the NZB which is replaced by the new <head>
+
+        Only the start of the NZB up to the first <file> is searched.
+
+        :return int, int, bytes: Start and end of the replaced part and its replacement
+        """
+        if self.rewrite is not None:
+            return self.rewrite
+        if not self.meta:
+            self.rewrite = (0, 0, b'')
+            return self.rewrite
+
+        limit = self.source.find(b'<file')
+        if limit < 0:
+            limit = len(self.source)
+        encoding = self.encoding()
+        head = HEAD_TAG.search(self.source, 0, limit)
+        head_end = HEAD_END_TAG.search(self.source, head.end(), limit) if head and not head.group(1) else None
+
+        if head_end is not None:
+            replaced = {meta_type for meta_type, _ in self.meta if meta_type not in MULTI_VALUE_META}
+            existing = set()
+
+            def keep(m):
+                meta_type = m.group(1).decode(encoding, 'replace').lower()
+                if meta_type in replaced:
+                    return b''
+                existing.add((meta_type, unescape(m.group(2).decode(encoding, 'replace').strip())))
+                return m.group(0)
+
+            inner = META_TAG.sub(keep, self.source[head.end():head_end.start()])
+            if not inner.endswith(b'\n'):
+                inner += b'\n'
+            # The same tag is not added twice
+            meta = [entry for entry in self.meta if entry not in existing]
+            self.rewrite = (head.start(), head_end.end(),
+                            b''.join((head.group(0), inner, self.render_meta(meta, encoding), b'</head>')))
+        elif head is not None:
+            # <head/>
+            self.rewrite = (head.start(), head.end(),
+                            b''.join((b'<head>\n', self.render_meta(self.meta, encoding), b'</head>')))
+        else:
+            nzb = NZB_TAG.search(self.source, 0, limit)
+            if nzb is None:
+                # No NZB, nothing to rewrite
+                self.rewrite = (0, 0, b'')
+            else:
+                self.rewrite = (nzb.end(), nzb.end(),
+                                b''.join((b'\n<head>\n', self.render_meta(self.meta, encoding), b'</head>')))
+        return self.rewrite
+
+    def __len__(self):
+        start, end, head = self.plan()
+        return len(self.source) - (end - start) + len(head)
+
+    def __iter__(self):
+        """Yield the rewritten NZB in chunks, all but the new <head> are slices of the original content"""
+        start, end, head = self.plan()
+        view = memoryview(self.source)
+        for offset in range(0, start, self.chunk_size):
+            yield view[offset:min(offset + self.chunk_size, start)]
+        if head:
+            yield head
+        for offset in range(end, len(view), self.chunk_size):
+            yield view[offset:offset + self.chunk_size]
+
+    def __bytes__(self):
+        return b''.join(self)
+
+    def write_to(self, f):
+        """Write the rewritten NZB to a binary file
+
+        :return int: Bytes written
+        """
+        written = 0
+        for chunk in self:
+            f.write(chunk)
+            written += len(chunk)
+        return written
+
+
+class MultipartBody(object):
+    def __init__(self, fields, file_field, filename, content, content_type='application/x-nzb'):
+        """multipart/form-data request body which streams the file content
+
+        The body has a known length, so it's sent with a Content-Length and not chunked.
+
+        :param list fields: Form fields as name and value pairs, in this order before the file
+        :param str file_field: Name of the file field
+        :param str filename: File name
+        :param content: File content
+        :type content: bytes or NZBRewriter
+        :param str content_type: Content type of the file
+        """
+        self.boundary = os.urandom(16).hex()
+        self.content = content
+        parts = list()
+        for name, value in fields:
+            parts.append('--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'
+                         .format(self.boundary, name, value).encode('utf-8'))
+        parts.append('--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\nContent-Type: {}\r\n\r\n'
+                     .format(self.boundary, file_field, filename.replace('\\', '\\\\').replace('"', '%22'),
+                             content_type).encode('utf-8'))
+        self.head = b''.join(parts)
+        self.tail = '\r\n--{}--\r\n'.format(self.boundary).encode('ascii')
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def __len__(self):
+        return len(self.head) + len(self.content) + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        yield from chunks(self.content)
+        yield self.tail
+
+
+def base64_chunks(content, block_size=BASE64_BLOCK_SIZE):
+    """Yield the base64 encoding of content block by block
+
+    Every block but the last one is a multiple of 57 bytes, so the encoded blocks can be joined.
+
+    :param content: Content
+    :type content: bytes or NZBRewriter
+    :param int block_size: Bytes per encoded block, a multiple of 57
+    """
+    rest = b''
+    for chunk in chunks(content, block_size):
+        if rest:
+            # Less than 57 bytes left over from the last chunk
+            chunk = rest + chunk
+        aligned = len(chunk) - len(chunk) % 57
+        if aligned:
+            yield binascii.b2a_base64(chunk[:aligned], newline=False)
+        rest = bytes(chunk[aligned:])
+    if rest:
+        yield binascii.b2a_base64(rest, newline=False)
+
+
+class Base64Body(object):
+    def __init__(self, prefix, content, suffix):
+        """Request body with base64 encoded content between a prefix and a suffix, e.g. XML-RPC
+
+        The content is encoded while the body is sent, the length is known in advance.
+
+        :param bytes prefix: Start of the body
+        :param content: Content
+        :type content: bytes or NZBRewriter
+        :param bytes suffix: End of the body
+        """
+        self.prefix = prefix
+        self.content = content
+        self.suffix = suffix
+
+    def __len__(self):
+        return len(self.prefix) + (len(self.content) + 2) // 3 * 4 + len(self.suffix)
+
+    def __iter__(self):
+        yield self.prefix
+        yield from base64_chunks(self.content)
+        yield self.suffix
+
+
+class JoinedBody(object):
+    def __init__(self, parts):
+        """Request body of several parts, e.g. bytes and Base64Body
+
+        :param list parts: Parts with a length which yield bytes when iterated, bytes are sent as they are
+        """
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP API for NZB-Monkey
+
+    POST /jobs        Submit a job: {"nzblnk": "nzblnk:?t=...&h=...&p=..."}
+                      or {"tag": "...", "header": "...", "password": "...", "category": "..."}
+                      or {"text": "<text with tag, header and password>"}, or a list of them
+                      Add "force": true to push a release again which was pushed recently
+    GET  /jobs        List recent jobs, ?limit=N
+    GET  /jobs/<id>   Job status with output
+    GET  /status      Server status
+
+If an API key is configured, every request needs the header X-Api-Key. Requests with an Origin header are
+rejected and POST requests need the Content-Type application/json, so web pages can't submit jobs.
+"""
+
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time
+from urllib.parse import urlparse, parse_qs
+
+MAX_BODY = 1024 * 1024
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'NZBMonkey'
+
+    def log_message(self, format, *args):
+        if self.server.debug:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        try:
+            if self.server.apikey and self.headers.get('X-Api-Key', '') != self.server.apikey:
+                raise APIError(401, 'Invalid API key')
+            # Browsers send an Origin header with cross-origin requests, the API is not meant for web pages
+            if self.headers.get('Origin') is not None:
+                raise APIError(403, 'Cross-origin requests are not allowed')
+
+            if method == 'GET' and url.path == '/status':
+                self.send_json(200, self.server.status())
+            elif method == 'GET' and url.path == '/jobs':
+                limit = int(parse_qs(url.query).get('limit', ['50'])[0])
+                self.send_json(200, [job.as_dict() for job in self.server.queue.recent(limit)])
+            elif method == 'GET' and re.match(r'^/jobs/\d+$', url.path):
+                job = self.server.queue.get(int(url.path.rsplit('/', 1)[1]))
+                if job is None:
+                    raise APIError(404, 'Unknown job')
+                self.send_json(200, job.as_dict(with_log=True))
+            elif method == 'POST' and url.path == '/jobs':
+                self.send_json(202, self.submit(self.read_json()))
+            else:
+                raise APIError(404, 'Not found')
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def read_json(self):
+        if self.headers.get_content_type() != 'application/json':
+            raise APIError(415, 'Content-Type must be application/json')
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise APIError(413, 'Request too large')
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise APIError(400, 'Invalid JSON')
+
+    def submit(self, data):
+        items = data if isinstance(data, list) else [data]
+        jobs = list()
+        for item in items:
+            if not isinstance(item, dict):
+                raise APIError(400, 'Jobs must be JSON objects')
+            for field in ('nzblnk', 'text', 'tag', 'header', 'password', 'category'):
+                if item.get(field) is not None and not isinstance(item[field], str):
+                    raise APIError(400, '{} must be a string'.format(field))
+            for nzbsrc in self.server.parse_request(item):
+                job, new = self.server.queue.submit(nzbsrc, item.get('category') or None, 'api',
+                                                    item.get('force') is True)
+                job_data = job.as_dict()
+                job_data['new'] = new
+                jobs.append(job_data)
+        if not jobs:
+            raise APIError(400, 'No tag and header found')
+        return jobs if isinstance(data, list) else jobs[0]
+
+    def send_json(self, status, data):
+        content = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host, port, queue, parse_request, version='', apikey='', debug=False):
+        """HTTP API server
+
+        :param str host: Listen address
+        :param int port: Listen port
+        :param nzbjobs.JobQueue queue: Queue for the submitted jobs
+        :param parse_request: Function returning a list of releases for a request dict
+        :param str version: NZB-Monkey version for /status
+        :param str apikey: Required X-Api-Key header, empty to allow all requests
+        :param bool debug: Log every request
+        """
+        ThreadingHTTPServer.__init__(self, (host, port), APIHandler)
+        self.queue = queue
+        self.parse_request = parse_request
+        self.version = version
+        self.apikey = apikey
+        self.debug = debug
+        self.started = time()
+
+    def status(self):
+        return {'version': self.version,
+                'uptime': int(time() - self.started),
+                'workers': self.queue.workers,
+                'pending': self.queue.pending()}
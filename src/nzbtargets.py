@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+Clients for the download targets
+
+One client per target and account is shared by all threads. NZBs pushed to NZBGet while another
+request to NZBGet is running are sent together in one system.multicall request. NZBs for SABnzbd are
+sent one after the other over the same connection, gzip compressed. Categories are read once and cached.
+The session id of Synology DownloadStation is kept in a file and used until DSM rejects it.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from time import time
+from urllib.parse import urlsplit, urlunsplit
+
+from nzbrewriter import Base64Body, JoinedBody, MultipartBody, escape, gzip_content
+
+# Seconds the categories of a target are cached
+CATEGORY_TTL = 600
+# Max. NZBs in one NZBGet multicall request
+MAX_MULTICALL = 25
+
+# DSM errors of an invalid session: no permission, timeout, duplicate login, SID not found
+SYNOLOGY_SESSION_ERRORS = (105, 106, 107, 119)
+
+NZBGET_CATEGORY = re.compile(r'^Category(\d+)\.Name$', re.IGNORECASE)
+
+CLIENTS = dict()
+CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(client_class, session, url, auth=None, timeout=20, **options):
+    """Return the shared client for a target
+
+    :param client_class: Client class, e.g. NZBGetClient
+    :param requests.Session session: Session for the requests
+    :param str url: Base URL of the target
+    :param tuple auth: User and password or None
+    :param int timeout: Request timeout in seconds
+    :param options: Further arguments of the client, e.g. the api_key of SABnzbd
+    :return: Client
+    """
+    key = (client_class, url, auth, tuple(sorted(options.items())))
+    with CLIENTS_LOCK:
+        client = CLIENTS.get(key)
+        if client is None:
+            client = CLIENTS[key] = client_class(session, url, auth, timeout, **options)
+        client.session = session
+        client.timeout = timeout
+        return client
+
+
+class NZBGetAppend(object):
+    def __init__(self, filename, content, category='', paused=False):
+        """NZB to add to NZBGet with the XML-RPC method append
+
+        :param str filename: NZB filename with .nzb
+        :param content: NZB content
+        :type content: bytes or NZBRewriter
+        :param str category: Category
+        :param bool paused: Add the NZB paused
+        """
+        self.filename = filename
+        self.content = content
+        self.category = category
+        self.paused = paused
+        self.ok = False
+        self.response = None
+        self.error = None
+        self.done = False
+
+    def values(self, value_start, value_end):
+        """Return the parameters of append with the base64 encoded NZB, every value is framed by value_start
+        and value_end"""
+        values = ('<value><string>{}</string></value>'.format(escape(self.filename)),  # Filename
+                  None,  # Content (NZB File)
+                  '<value><string>{}</string></value>'.format(escape(self.category or '')),  # Category
+                  '<value><i4>0</i4></value>',  # Priority
+                  '<value><boolean>0</boolean></value>',  # AddToTop
+                  '<value><boolean>{}</boolean></value>'.format(1 if self.paused else 0),  # AddPaused
+                  '<value><string></string></value>',  # DupeKey
+                  '<value><i4>0</i4></value>',  # DupeScore
+                  '<value><string>ALL</string></value>')  # DupeMode
+        prefix = value_start + values[0] + value_end + value_start + '<value><string>'
+        suffix = '</string></value>' + value_end + ''.join(value_start + value + value_end for value in values[2:])
+        return Base64Body(prefix.encode('utf-8'), self.content, suffix.encode('utf-8'))
+
+    def finish(self, ok, response=None, error=None):
+        self.ok = ok
+        self.response = response
+        self.error = error
+        self.done = True
+
+
+class NZBGetClient(object):
+    def __init__(self, session, url, auth=None, timeout=20):
+        """NZBGet XML-RPC and JSON-RPC client
+
+        :param requests.Session session: Session for the requests
+        :param str url: XML-RPC URL, e.g. http://localhost:6789/xmlrpc
+        :param tuple auth: User and password or None
+        :param int timeout: Request timeout in seconds
+        """
+        self.session = session
+        self.url = url
+        split = urlsplit(url)
+        self.jsonrpc_url = urlunsplit(split._replace(path=split.path.replace('xmlrpc', 'jsonrpc')))
+        self.auth = auth
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.pending = list()
+        self.category_lock = threading.Lock()
+        self.category_cache = None
+        self.category_time = 0.0
+
+    def append(self, filename, content, category='', paused=False):
+        """Add a NZB to NZBGet
+
+        If another request is running, the NZB waits and is sent together with all NZBs pushed in the
+        meantime in one multicall request.
+
+        :param str filename: NZB filename with .nzb
+        :param content: NZB content
+        :type content: bytes or NZBRewriter
+        :param str category: Category
+        :param bool paused: Add the NZB paused
+        :return NZBGetAppend: Result with ok and the response text
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        call = NZBGetAppend(filename, content, category, paused)
+        with self.lock:
+            self.pending.append(call)
+        while not call.done:
+            with self.send_lock:
+                if call.done:
+                    break
+                with self.lock:
+                    batch = self.pending[:MAX_MULTICALL]
+                    del self.pending[:MAX_MULTICALL]
+                self.send(batch)
+        if call.error is not None:
+            raise call.error
+        return call
+
+    def send(self, batch):
+        """Send one append or a multicall with several appends, every call of the batch is finished"""
+        try:
+            if len(batch) == 1:
+                body = JoinedBody([b'<?xml version="1.0"?><methodCall><methodName>append</methodName><params>',
+                                   batch[0].values('<param>', '</param>'),
+                                   b'</params></methodCall>'])
+            else:
+                parts = [b'<?xml version="1.0"?><methodCall><methodName>system.multicall</methodName><params>'
+                         b'<param><value><array><data>']
+                for call in batch:
+                    parts.extend((b'<value><struct><member><name>methodName</name><value><string>append</string>'
+                                  b'</value></member><member><name>params</name><value><array><data>',
+                                  call.values('', ''),
+                                  b'</data></array></value></member></struct></value>'))
+                parts.append(b'</data></array></value></param></params></methodCall>')
+                body = JoinedBody(parts)
+
+            res = self.session.post(self.url, data=body, headers={'Content-Type': 'text/xml'}, auth=self.auth,
+                                    verify=False, timeout=self.timeout * min(len(batch), 3))
+            if len(batch) == 1:
+                batch[0].finish(res.status_code == 200 and res.text.find('<fault>') < 0, res.text)
+            else:
+                results = self.multicall_results(res.text) if res.status_code == 200 else []
+                for index, call in enumerate(batch):
+                    call.finish(index < len(results) and results[index], res.text)
+        except Exception as e:
+            for call in batch:
+                call.finish(False, None, e)
+        finally:
+            for call in batch:
+                if not call.done:
+                    call.finish(False, None, RuntimeError('Request aborted'))
+
+    @staticmethod
+    def multicall_results(text):
+        """Return for every call of a multicall response if it was successful
+
+        :param str text: Response text
+        :return list: bool per call, a call failed if it returned a fault struct
+        """
+        import xml.etree.ElementTree as ET
+
+        try:
+            data = ET.fromstring(text).find('./params/param/value/array/data')
+        except ET.ParseError:
+            return []
+        if data is None:
+            return []
+        return [value.find('struct') is None for value in data.findall('value')]
+
+    def categories(self, max_age=CATEGORY_TTL):
+        """Return the names of the categories, they are read from the NZBGet config once per max_age seconds
+
+        The Category<n>.Name entries are picked from the Name/Value pairs of the config.
+
+        :return list: Category names
+        :raise ValueError: Config can't be read
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        with self.category_lock:
+            if self.category_cache is not None and time() - self.category_time < max_age:
+                return list(self.category_cache)
+
+            res = self.session.get(self.jsonrpc_url + '/config', auth=self.auth, verify=False, timeout=self.timeout)
+            result = json.loads(res.text)
+            if not isinstance(result, dict) or not isinstance(result.get('result'), list):
+                raise ValueError('Reading categories failed')
+            categories = list()
+            for option in result['result']:
+                m = NZBGET_CATEGORY.match(str(option.get('Name', ''))) if isinstance(option, dict) else None
+                if m is not None:
+                    categories.append((int(m.group(1)), str(option.get('Value') or '')))
+            categories.sort()
+            self.category_cache = [name for _, name in categories if name]
+            self.category_time = time()
+            return list(self.category_cache)
+
+
+class SABnzbdClient(object):
+    def __init__(self, session, url, auth=None, timeout=20, api_key=''):
+        """SABnzbd API client
+
+        :param requests.Session session: Session for the requests
+        :param str url: API URL, e.g. http://localhost:8080/sabnzbd/api
+        :param tuple auth: Basic auth user and password or None
+        :param int timeout: Request timeout in seconds
+        :param str api_key: SABnzbd API key
+        """
+        self.session = session
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.api_key = api_key
+        self.send_lock = threading.Lock()
+        self.category_lock = threading.Lock()
+        self.category_cache = None
+        self.category_time = 0.0
+
+    @staticmethod
+    def auth_failed(res):
+        """Return if SABnzbd rejected the API key or the basic auth"""
+        return res.status_code in (401, 403) or 'api key' in res.text[:200].lower()
+
+    def invalidate(self):
+        """Forget the cached categories, e.g. after the API key was rejected"""
+        with self.category_lock:
+            self.category_cache = None
+
+    def addfile(self, nzbname, filename, content, category='', paused=False, compress=True):
+        """Add a NZB to SABnzbd
+
+        The NZBs of all threads are uploaded one after the other, so they are sent back to back over one
+        connection of the session. A compressed NZB is uploaded as .nzb.gz.
+
+        :param str nzbname: Name of the job
+        :param str filename: NZB filename with .nzb
+        :param content: NZB content
+        :type content: bytes or NZBRewriter
+        :param str category: Category
+        :param bool paused: Add the NZB paused
+        :param bool compress: Upload the NZB gzip compressed
+        :return bool, str: True if the NZB was added and the response text
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        fields = [
+            ('output', 'xml'),
+            ('mode', 'addfile'),
+            ('nzbname', nzbname),
+            ('apikey', self.api_key),
+            ('cat', category),
+            ('priority', -2 if paused else -100)
+        ]
+        if compress:
+            # Compressed before waiting for the connection
+            body = MultipartBody(fields, 'nzbfile', filename + '.gz', gzip_content(content), 'application/gzip')
+        else:
+            body = MultipartBody(fields, 'nzbfile', filename, content)
+
+        with self.send_lock:
+            res = self.session.post(self.url, data=body, headers={'Content-Type': body.content_type},
+                                    auth=self.auth, verify=False, timeout=self.timeout * 2)
+        if self.auth_failed(res):
+            self.invalidate()
+            return False, res.text
+        return res.status_code == 200 and res.text.lower().find('<status>true') > 0, res.text
+
+    def categories(self, max_age=CATEGORY_TTL):
+        """Return the names of the categories, they are read from SABnzbd once per max_age seconds
+
+        :return list: Category names without the default category *
+        :raise PermissionError: API key rejected, e.g. the NZB key was used
+        :raise ValueError: Categories can't be read
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        with self.category_lock:
+            if self.category_cache is not None and time() - self.category_time < max_age:
+                return list(self.category_cache)
+
+            res = self.session.get(self.url, params={'mode': 'get_cats', 'output': 'json', 'apikey': self.api_key},
+                                   auth=self.auth, verify=False, timeout=self.timeout)
+            if self.auth_failed(res):
+                self.category_cache = None
+                raise PermissionError('API key rejected')
+            result = json.loads(res.text)
+            if not isinstance(result, dict) or 'categories' not in result:
+                raise ValueError('Reading categories failed')
+            self.category_cache = [name for name in result['categories'] if name != '*']
+            self.category_time = time()
+            return list(self.category_cache)
+
+
+class SynologyClient(object):
+    def __init__(self, session, url, auth=None, timeout=20, sid_filename=None):
+        """Synology DownloadStation client
+
+        The session id of a login is stored in sid_filename and used by the next runs as well. If DSM
+        rejects it, the client logs in again and retries.
+
+        :param requests.Session session: Session for the requests
+        :param str url: Web API URL, e.g. http://localhost:5000/webapi
+        :param tuple auth: User and password
+        :param int timeout: Request timeout in seconds
+        :param str sid_filename: File for the session ids, only readable for the user, None to keep them in memory
+        """
+        self.session = session
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.sid_filename = sid_filename
+        self.sid = None
+        self.sid_lock = threading.Lock()
+        self.send_lock = threading.Lock()
+
+    def sid_key(self):
+        """Return the key of the session id in the file, the password is not part of it"""
+        return hashlib.sha1('{}\0{}'.format(self.url, self.auth[0] if self.auth else '').encode('utf-8')).hexdigest()
+
+    def read_sids(self):
+        try:
+            with open(self.sid_filename, 'r', encoding='utf-8') as f:
+                sids = json.load(f)
+            return sids if isinstance(sids, dict) else dict()
+        except (OSError, ValueError):
+            return dict()
+
+    def write_sid(self, sid):
+        """Store the session id in the file, session ids of other accounts are kept"""
+        if not self.sid_filename:
+            return
+        sids = self.read_sids()
+        if sid is None:
+            sids.pop(self.sid_key(), None)
+        else:
+            sids[self.sid_key()] = sid
+        tmp_filename = '{}.{}.tmp'.format(self.sid_filename, os.getpid())
+        try:
+            fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(sids, f)
+            os.replace(tmp_filename, self.sid_filename)
+        except OSError:
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+
+    def login(self):
+        """Log in to DSM, the credentials are sent in the POST body and not in the URL
+
+        :return str: Session id
+        :raise PermissionError: Login rejected
+        :raise ValueError: Invalid response
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        user, password = self.auth or ('', '')
+        res = self.session.post(self.url + '/auth.cgi', data={'api': 'SYNO.API.Auth', 'version': '3', 'method': 'login',
+                                                              'account': user, 'passwd': password,
+                                                              'session': 'DownloadStation', 'format': 'sid'},
+                                verify=False, timeout=self.timeout)
+        result = json.loads(res.text)
+        if not result.get('success'):
+            raise PermissionError('Login failed with error {}'.format(result.get('error', {}).get('code')))
+        sid = result['data']['sid']
+        self.write_sid(sid)
+        return sid
+
+    def get_sid(self, rejected=None):
+        """Return the session id, from memory, the file or a new login
+
+        :param str rejected: Session id DSM rejected, it's replaced by a new login once for all threads
+        :return str: Session id
+        """
+        with self.sid_lock:
+            if self.sid is not None and self.sid != rejected:
+                return self.sid
+            if self.sid is None and rejected is None and self.sid_filename:
+                self.sid = self.read_sids().get(self.sid_key())
+                if self.sid is not None:
+                    return self.sid
+            self.sid = None
+            self.sid = self.login()
+            return self.sid
+
+    def create_task(self, filename, content, password=''):
+        """Create a DownloadStation task for a NZB
+
+        :param str filename: NZB filename with .nzb
+        :param content: NZB content
+        :type content: bytes or NZBRewriter
+        :param str password: Unpack password
+        :return bool, str: True if the task was created and the response text
+        :raise PermissionError: Login rejected
+        :raise ValueError: Invalid login response
+        :raise requests.exceptions.RequestException: Request failed
+        """
+        sid = self.get_sid()
+        for retry in (True, False):
+            # API reverse engineered, for some stupid reason the order of parameters matters - thx Synology!
+            body = MultipartBody([
+                ('api', 'SYNO.DownloadStation2.Task'),
+                ('method', 'create'),
+                ('version', '2'),
+                ('extract_password', '"' + (password or '') + '"'),
+                ('destination', '""'),
+                ('create_list', 'false'),
+                ('type', '"file"'),
+                ('file', '["torrent"]')
+            ], 'torrent', filename, content, 'application/x-nzb; charset="UTF-8"')
+
+            with self.send_lock:
+                res = self.session.post(self.url + '/entry.cgi', data=body, headers={'Content-Type': body.content_type},
+                                        verify=False, timeout=self.timeout, cookies={'id': sid})
+            if res.status_code == 200 and res.text.find('success":true') > 0:
+                return True, res.text
+            try:
+                code = json.loads(res.text).get('error', {}).get('code')
+            except (ValueError, AttributeError):
+                code = None
+            if not retry or code not in SYNOLOGY_SESSION_ERRORS:
+                return False, res.text
+            # The session expired or was ended by another login, log in again and retry once
+            sid = self.get_sid(sid)
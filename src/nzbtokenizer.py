@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Split pasted text e.g. a forum post into releases
+
+The text is read line by line, every line is scanned once for NZBLNKs, headers, passwords and tag hints
+(S01E01, 720p, x264, ...). A header starts a new release if the current release already has one, a tag hint
+after a header as well. The cost is linear in the size of the text.
+"""
+
+import re
+from html import unescape
+from urllib.parse import urlparse, parse_qs
+
+TOKEN = re.compile(r'''(?ix)
+    (?P<nzblnk>nzblnk:\?[^\s"'<>]+)
+  | (?:subject:|header:)\s+?(?:header:\s+)?(?P<header>\S+)
+  | (?:passwor[dt]|pw|pwd):\s*?(?P<password>\S+)
+  | (?P<episode>S\d+E\d+)
+  | (?P<release>720p|1080p|x264|x265|XviD|BluRay)
+''')
+
+# Rank of a tag, a line with an episode wins over a line with a release hint over the first line
+TAG_EPISODE = 2
+TAG_RELEASE = 1
+TAG_FIRST_LINE = 0
+
+
+def clean_tag(tag):
+    """Return a tag without spaces and everything after {"""
+    return re.sub('([^{]*).*', '\\1', tag.strip().replace(' ', '.'))
+
+
+def parse_nzblnk(nzblnk):
+    """Parse a NZBLNK URI, HTML escaped ampersands are allowed
+
+    A NZBLNK can have several headers (h=) e.g. for reposts, header is the first one, headers all of them.
+    Newsgroups (g=) and the post date (d=) are hints to rank the NZBs found.
+
+    :param str nzblnk: NZBLNK URI
+    :return dict: Release with tag, header, headers, pass, groups and date or None if it's no NZBLNK
+    """
+    lnk = urlparse(unescape(nzblnk.strip()))
+    if lnk.scheme.lower() != 'nzblnk':
+        return None
+    lnk = parse_qs(lnk.query)
+    headers = list(dict.fromkeys(lnk.get('h', [])))
+    return {'tag': lnk.get('t', [None])[0],
+            'header': headers[0] if headers else None,
+            'headers': headers,
+            'pass': lnk.get('p', [None])[0],
+            'groups': list(dict.fromkeys(lnk.get('g', []))),
+            'date': lnk.get('d', [None])[0]}
+
+
+class ReleaseBlock(object):
+    def __init__(self):
+        """Tag, header and password found in a part of the text"""
+        self.tag = None
+        self.tag_rank = -1
+        self.header = None
+        self.password = None
+
+    def set_tag(self, line, rank):
+        if rank > self.tag_rank:
+            self.tag = line
+            self.tag_rank = rank
+
+    def release(self):
+        return {'tag': clean_tag(self.tag) if self.tag else 'NZB.Monkey',
+                'header': self.header,
+                'pass': self.password or ''}
+
+
+def tokenize(text):
+    """Return all releases in a text
+
+    Every NZBLNK is a release. Other releases are blocks of lines with a header and optional tag and password.
+    Lines after a header are the tag of the next release if another header follows, otherwise they belong
+    to the last release.
+
+    :param str text: Text e.g. from clipboard
+    :return list: Releases with tag, header and pass in the order of the text
+    """
+    nzblnks = list()
+    blocks = list()
+    block = ReleaseBlock()
+    paragraph = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            paragraph = True
+            continue
+        tag_rank = TAG_FIRST_LINE
+        token_line = False
+        for token in TOKEN.finditer(line):
+            kind = token.lastgroup
+            if kind == 'nzblnk':
+                nzbsrc = parse_nzblnk(token.group(kind))
+                if nzbsrc is not None and nzbsrc['tag'] and nzbsrc['header']:
+                    nzblnks.append(nzbsrc)
+                token_line = True
+            elif kind == 'header':
+                if block.header is not None:
+                    blocks.append(block)
+                    block = ReleaseBlock()
+                block.header = token.group(kind)
+                token_line = True
+            elif kind == 'password':
+                if block.password is None:
+                    block.password = token.group(kind)
+                token_line = True
+            elif kind == 'episode':
+                tag_rank = TAG_EPISODE
+            elif tag_rank < TAG_RELEASE:
+                tag_rank = TAG_RELEASE
+
+        if token_line:
+            paragraph = False
+            continue
+        if block.header is None:
+            # Between two releases the first line of the last paragraph is the title of the next one
+            if paragraph and blocks and block.tag_rank == TAG_FIRST_LINE:
+                block.tag_rank = -1
+            block.set_tag(line, tag_rank)
+        else:
+            # Tag of the next release or a late tag of this one, decided by the next header
+            blocks.append(block)
+            block = ReleaseBlock()
+            block.set_tag(line, tag_rank)
+        paragraph = False
+
+    if nzblnks:
+        return nzblnks
+
+    blocks.append(block)
+    releases = list()
+    for block in blocks:
+        if block.header is not None:
+            releases.append(block)
+        elif releases:
+            # Lines after the last header, e.g. the tag below header and password
+            releases[-1].set_tag(block.tag, block.tag_rank)
+            if releases[-1].password is None:
+                releases[-1].password = block.password
+    return [block.release() for block in releases]
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Watch folder for NZBLNK drop files
+
+Other programs drop small text files with NZBLNKs or tag|header|password lines into the watch folder.
+A file is claimed by moving it into the processing folder, so several NZB-Monkeys can watch the same
+folder. After processing the file is moved to the done or failed folder next to a .json file with
+the results.
+
+On Linux the folder is watched with inotify, elsewhere it's polled with os.scandir.
+"""
+
+import json
+import os
+import re
+import select
+import struct
+from os.path import join
+from time import sleep, time
+
+# Files which are still written or belong to NZB-Monkey
+IGNORE_FILE = re.compile(r'^\.|\.(tmp|part|partial|crdownload|json)$', re.IGNORECASE)
+MAX_FILE_SIZE = 1024 * 1024
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def scan(folder):
+    """Return the drop files in a folder
+
+    :param str folder: Watch folder
+    :return dict: File name: (mtime, size)
+    """
+    files = dict()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if IGNORE_FILE.search(entry.name):
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+    return files
+
+
+class PollingWatcher(object):
+    def __init__(self, folder, interval=2):
+        """Detect complete files by polling the folder, a file is complete if it didn't change for one interval
+
+        :param str folder: Watch folder
+        :param float interval: Seconds between the scans
+        """
+        self.folder = folder
+        self.interval = interval
+        self.snapshot = dict()
+        self.last_scan = 0.0
+
+    def ready(self, timeout):
+        """Wait up to timeout seconds and return the names of complete files"""
+        delay = self.last_scan + self.interval - time()
+        if delay > timeout:
+            sleep(timeout)
+            return []
+        if delay > 0:
+            sleep(delay)
+        snapshot = scan(self.folder)
+        self.last_scan = time()
+        ready = [name for name, stamp in snapshot.items() if self.snapshot.get(name) == stamp]
+        self.snapshot = snapshot
+        return ready
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    def __init__(self, folder):
+        """Detect complete files with inotify, a file is complete if it was closed after writing or moved in
+
+        :param str folder: Watch folder
+        :raise OSError: inotify is not available
+        """
+        import ctypes
+        import ctypes.util
+
+        self.folder = folder
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise OSError('inotify not available: {}'.format(e))
+
+        self.fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, 'inotify_add_watch failed for {}'.format(folder))
+
+    def ready(self, timeout):
+        """Wait up to timeout seconds and return the names of complete files"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        names = list()
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        names.extend(scan(self.folder))
+                    elif not mask & IN_ISDIR and name and not IGNORE_FILE.search(name):
+                        names.append(name)
+        except BlockingIOError:
+            pass
+        return list(dict.fromkeys(names))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(folder, interval=2):
+    """Return an inotify watcher if possible, otherwise a polling watcher"""
+    if os.name == 'posix':
+        try:
+            return InotifyWatcher(folder)
+        except OSError:
+            pass
+    return PollingWatcher(folder, interval)
+
+
+def unique_path(folder, name):
+    """Return a path in folder for name which doesn't exist yet"""
+    path = join(folder, name)
+    base, ext = os.path.splitext(name)
+    count = 1
+    while os.path.exists(path) or os.path.exists(path + '.json'):
+        path = join(folder, '{}.{}{}'.format(base, count, ext))
+        count += 1
+    return path
+
+
+def claim(folder, name, processing_folder):
+    """Move a file into the processing folder
+
+    :param str folder: Watch folder
+    :param str name: File name
+    :param str processing_folder: Processing folder
+    :return str: Path of the claimed file or None if another process was faster or the file can't be moved
+    """
+    path = unique_path(processing_folder, name)
+    try:
+        os.rename(join(folder, name), path)
+    except OSError:
+        return None
+    return path
+
+
+def read_drop_file(path):
+    """Return the content of a claimed file
+
+    :raise ValueError: File too large
+    """
+    if os.path.getsize(path) > MAX_FILE_SIZE:
+        raise ValueError('File too large')
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def finish(path, folder, result):
+    """Move a processed file to folder and write the result next to it
+
+    :param str path: Claimed file
+    :param str folder: Done or failed folder
+    :param dict result: Result for the .json file
+    :return str: New path of the file
+    """
+    target = unique_path(folder, os.path.basename(path))
+    os.rename(path, target)
+    tmp_filename = target + '.json.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_filename, target + '.json')
+    return target
@@ -1,6 +1,26 @@
 # -*- coding: utf-8 -*-
 """
 History
+v0.3.0
+- Batch mode: process many NZBLNKs or tag|header|password lines with a pool of workers (-b/--batch)
+- Server mode: local HTTP API to submit NZBLNKs and query jobs (--server)
+- Single instance mode: NZBLNKs are handed over to the running NZB-Monkey (single_instance)
+- History of processed releases: repeated NZBLNKs are skipped or wait for the running NZB-Monkey (-f/--force)
+- Watch folder: process files with NZBLNKs dropped into a folder (--watch)
+- Clipboard monitor: every NZBLNK or release copied to the clipboard is processed (--monitor)
+- Clipboard and text with several releases: all releases are processed in parallel
+- NZBLNKs with several headers (h=): all headers are searched in parallel, the best NZB is used
+- Group (g=) and date (d=) of a NZBLNK: NZBs of other reposts are ranked last
+- Password, name and category are written into the <head> of the NZB, an existing <head> is kept
+- NZBGet: NZBs pushed at the same time are sent in one multicall request, categories are cached
+- SABnzbd: NZBs are uploaded gzip compressed (compress), categories are cached
+- Synology DownloadStation: the session is kept between runs, login only when DSM rejects it
+- Several targets (target = SABNZBD, NZBGET, EXECUTE) get the NZB at the same time, within target_timeout
+- Outbox: NZBs for targets which are not reachable are kept and pushed later (OUTBOX)
+- EXECUTE: NZBs are written atomically, optionally as .nzb.gz (compress, compress_level) and flushed to disk (fsync)
+- Clean up of the NZB folder runs in the background, honours clean_up_max_age and can limit the folder size (clean_up_max_size)
+- Catalog of saved NZBs: an earlier NZB of a release is found at once and can be reused (CATALOG, --rebuild-catalog)
+
 v0.2.10
 - Fix for Nzbindex search and download urls and regex
 - Fix for Binsearch search and download urls and regex
@@ -99,5 +119,5 @@ v0.1.0
 
 """
 
-__version__ = '0.2.10'
+__version__ = '0.3.0'
 __requires__ = ['pyperclip', 'requests', 'configobj', 'colorama', 'cryptography']
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+
+import pytest
+
+from nzbcatalog import Catalog, SavedCheck, body_hash, head_meta, split_nzb_filename
+from nzbrewriter import NZBRewriter
+
+BODY = (b'<file poster="p" date="1" subject="a.rar">\n<groups><group>alt.binaries.test</group></groups>\n'
+        b'<segments><segment bytes="1" number="1">a@b</segment><segment bytes="1" number="2">c@d</segment>'
+        b'</segments>\n</file>\n</nzb>\n')
+HEAD = b'<?xml version="1.0" encoding="utf-8"?>\n<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">\n'
+NZB = HEAD + BODY
+NZBSRC = {'tag': 'Release.Tag', 'header': 'release.header', 'pass': 'pw'}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(str(tmp_path / 'nzbmonkey.catalog'))
+    yield catalog
+    catalog.close()
+
+
+def write(path, content, mtime=None):
+    with open(str(path), 'wb') as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(str(path), (mtime, mtime))
+    return str(path)
+
+
+def test_split_nzb_filename():
+    assert split_nzb_filename('/nzbs/Release.Tag{{pw}}.nzb') == ('Release.Tag', 'pw')
+    assert split_nzb_filename('Release.Tag{{pw}}.nzb.gz') == ('Release.Tag', 'pw')
+    assert split_nzb_filename('Release.Tag.nzb') == ('Release.Tag', None)
+
+
+def test_body_hash_ignores_head():
+    rewritten = bytes(NZBRewriter(NZB, [('name', 'Release.Tag'), ('password', 'pw')]))
+    assert rewritten != NZB
+    assert body_hash(rewritten) == body_hash(NZB)
+    assert body_hash(NZB.replace(b'a@b', b'x@y')) != body_hash(NZB)
+    assert head_meta(rewritten) == {'name': 'Release.Tag', 'password': 'pw'}
+
+
+def test_add_and_find(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag{{pw}}.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZBRewriter(NZB), SavedCheck(True, 0, 0.5))
+    entry, = catalog.find({'tag': 'release.tag', 'header': ' Release.Header'})
+    assert entry['engine'] == 'BinSearch' and entry['password'] == 'pw'
+    assert (entry['files'], entry['segments']) == (1, 2)
+    check = SavedCheck.from_entry(entry)
+    assert (check.complete, check.files_missing, check.segments_missing_percent) == (True, 0, 0.5)
+    assert [e['path'] for e in catalog.find_hash(body_hash(NZB))] == [path]
+
+
+def test_add_without_check(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZB)
+    assert SavedCheck.from_entry(catalog.find(NZBSRC)[0]) is None
+
+
+def test_find_removes_deleted_nzbs(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZB)
+    os.remove(path)
+    assert catalog.find(NZBSRC) == []
+    assert catalog.find_hash(body_hash(NZB)) == []
+
+
+def test_rebuild_adds_unknown_nzbs(catalog, tmp_path):
+    write(tmp_path / 'Release.Tag{{pw}}.nzb', NZB)
+    write(tmp_path / 'Other.nzb.gz', gzip.compress(bytes(NZBRewriter(NZB, [('name', 'Other.Tag')]))))
+    write(tmp_path / 'notes.txt', b'no nzb')
+    assert catalog.rebuild(str(tmp_path)) == (2, 0)
+    entry, = catalog.find({'tag': 'Release.Tag', 'header': 'unknown'})
+    assert entry['password'] == 'pw' and entry['engine'] is None
+    assert catalog.find({'tag': 'Other.Tag'})[0]['path'].endswith('Other.nzb.gz')
+    # Nothing changed
+    assert catalog.rebuild(str(tmp_path)) == (0, 0)
+
+
+def test_rebuild_keeps_check_of_same_body(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag{{pw}}.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZB, SavedCheck(False, 2, 12.5))
+    write(path, bytes(NZBRewriter(NZB, [('password', 'pw')])), os.stat(path).st_mtime + 10)
+    assert catalog.rebuild(str(tmp_path)) == (1, 0)
+    entry, = catalog.find(NZBSRC)
+    assert entry['engine'] == 'BinSearch' and entry['header'] == 'release.header'
+    check = SavedCheck.from_entry(entry)
+    assert (check.complete, check.files_missing, check.segments_missing_percent) == (False, 2, 12.5)
+    assert entry['size'] == os.stat(path).st_size
+
+
+def test_rebuild_resets_check_of_changed_body(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag{{pw}}.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZB, SavedCheck(True, 0, 0.0))
+    write(path, NZB.replace(b'a@b', b'x@y'), os.stat(path).st_mtime + 10)
+    assert catalog.rebuild(str(tmp_path)) == (1, 0)
+    # Only the tag of the changed NZB is known
+    entry, = catalog.find(NZBSRC)
+    assert entry['header'] is None and entry['engine'] is None
+    assert SavedCheck.from_entry(entry) is None
+
+
+def test_rebuild_removes_deleted_nzbs(catalog, tmp_path):
+    path = write(tmp_path / 'Release.Tag.nzb', NZB)
+    catalog.add(path, NZBSRC, 'BinSearch', NZB)
+    os.remove(path)
+    assert catalog.rebuild(str(tmp_path)) == (0, 1)
+    assert catalog.remove_missing(str(tmp_path)) == 0
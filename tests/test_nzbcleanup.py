@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+from time import time
+
+import pytest
+
+from nzbmonkey import clean_nzb_folder
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def folder(tmp_path):
+    now = time()
+    for name, age, size in (('old.nzb', 3 * DAY, 100), ('older.nzb.gz', 5 * DAY, 100), ('new.nzb', 600, 300),
+                            ('saved.nzb', 0, 200), ('notes.txt', 5 * DAY, 100)):
+        path = str(tmp_path / name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        os.utime(path, (now - age, now - age))
+    return tmp_path
+
+
+def names(folder):
+    return sorted(os.listdir(str(folder)))
+
+
+def test_max_age(folder):
+    assert clean_nzb_folder(str(folder), 2) == 2
+    assert names(folder) == ['new.nzb', 'notes.txt', 'saved.nzb']
+
+
+def test_max_age_0_deletes_all(folder):
+    assert clean_nzb_folder(str(folder), 0) == 4
+    assert names(folder) == ['notes.txt']
+
+
+def test_max_age_0_keeps_just_saved_nzb(folder):
+    assert clean_nzb_folder(str(folder), 0, keep_since=time() - 60) == 3
+    assert names(folder) == ['notes.txt', 'saved.nzb']
+
+
+def test_max_size(folder):
+    # The least recently used files are deleted first
+    assert clean_nzb_folder(str(folder), 10, 500) == 2
+    assert names(folder) == ['new.nzb', 'notes.txt', 'saved.nzb']
+    assert clean_nzb_folder(str(folder), 10, 250, keep_since=time() - 60) == 1
+    assert names(folder) == ['notes.txt', 'saved.nzb']
+
+
+def test_missing_folder(tmp_path):
+    assert clean_nzb_folder(str(tmp_path / 'missing')) == -1
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+from time import time
+
+import pytest
+
+from nzbhistory import History, HistoryState, pid_alive
+
+NZBSRC = {'tag': 'Release.Tag', 'header': 'release.header', 'pass': 'pw'}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = History(str(tmp_path / 'nzbmonkey.history'), stale_after=900)
+    yield history
+    history.close()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def set_entry(history, **values):
+    history.db.execute('UPDATE history SET {}'.format(', '.join('{} = ?'.format(key) for key in values)),
+                       tuple(values.values()))
+
+
+def test_new_release_is_processed(history):
+    state, entry = history.begin(NZBSRC, 3600)
+    assert state is None and entry is None
+    assert history.get(NZBSRC)['state'] == HistoryState.RUNNING
+
+
+def test_duplicate_within_window(history):
+    history.begin(NZBSRC, 3600)
+    history.finish(NZBSRC, {'res': 0, 'engine': 'BinSearch', 'target': 'SABNZBD', 'category': 'tv'}, b'<nzb/>')
+    # The key ignores case and whitespace
+    state, entry = history.begin({'tag': 'release.tag', 'header': ' Release.Header '}, 3600)
+    assert state == HistoryState.DONE
+    assert entry['target'] == 'SABNZBD' and entry['nzb_hash']
+    assert history.get(NZBSRC)['requests'] == 2
+
+
+def test_duplicate_outside_window_or_forced(history):
+    history.begin(NZBSRC, 3600)
+    history.finish(NZBSRC, {'res': 0})
+    set_entry(history, finished=time() - 7200)
+    assert history.begin(NZBSRC, 3600)[0] is None
+    history.finish(NZBSRC, {'res': 0})
+    assert history.begin(NZBSRC, 3600, force=True)[0] is None
+    history.finish(NZBSRC, {'res': 0})
+    assert history.begin(NZBSRC, 0)[0] is None
+
+
+def test_failed_release_is_processed_again(history):
+    history.begin(NZBSRC, 3600)
+    history.finish(NZBSRC, {'res': 1})
+    assert history.get(NZBSRC)['state'] == HistoryState.FAILED
+    assert history.begin(NZBSRC, 3600)[0] is None
+
+
+def test_running_release(history):
+    history.begin(NZBSRC, 3600)
+    assert history.begin(NZBSRC, 3600)[0] == HistoryState.RUNNING
+
+
+def test_running_release_of_a_dead_process(history):
+    history.begin(NZBSRC, 3600)
+    set_entry(history, pid=dead_pid())
+    assert history.begin(NZBSRC, 3600)[0] is None
+
+
+def test_running_release_on_another_host(history):
+    history.begin(NZBSRC, 3600)
+    # The pid can't be checked on another host
+    set_entry(history, host='other-host', pid=dead_pid())
+    assert history.begin(NZBSRC, 3600)[0] == HistoryState.RUNNING
+
+
+def test_stale_running_release(history):
+    history.begin(NZBSRC, 3600)
+    set_entry(history, host='other-host', started=time() - 1000)
+    assert history.begin(NZBSRC, 3600)[0] is None
+
+
+def test_wait_returns_finished_entry(history):
+    history.begin(NZBSRC, 3600)
+    history.finish(NZBSRC, {'res': 0, 'target': 'NZBGET'})
+    assert history.wait(NZBSRC)['target'] == 'NZBGET'
+
+
+def test_prune(history):
+    history.begin(NZBSRC, 3600)
+    set_entry(history, started=time() - 86400 * 100)
+    assert history.prune(86400 * 90) == 1
+    assert history.get(NZBSRC) is None
+
+
+def test_pid_alive():
+    assert pid_alive(os.getpid())
+    assert not pid_alive(dead_pid())
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import threading
+from time import time
+
+import pytest
+import requests
+
+from nzbjobs import deadline, time_left
+from nzbmonkey import limit_to_deadline
+
+
+def request(method, url, **kwargs):
+    return kwargs.get('timeout')
+
+
+def test_no_deadline():
+    assert time_left() is None
+    assert limit_to_deadline(request)('GET', 'http://localhost/', timeout=20) == 20
+
+
+def test_deadline_limits_timeout():
+    with deadline(time() + 5):
+        assert 4 < time_left() <= 5
+        assert 4 < limit_to_deadline(request)('GET', 'http://localhost/', timeout=20) <= 5
+        assert limit_to_deadline(request)('GET', 'http://localhost/', timeout=1) == 1
+        with deadline(None):
+            assert time_left() is None
+        assert time_left() is not None
+    assert time_left() is None
+
+
+def test_deadline_reached():
+    with deadline(time() - 1):
+        with pytest.raises(requests.exceptions.Timeout):
+            limit_to_deadline(request)('POST', 'http://localhost/', timeout=20)
+
+
+def test_deadline_is_per_thread():
+    left = list()
+    with deadline(time() + 5):
+        thread = threading.Thread(target=lambda: left.append(time_left()))
+        thread.start()
+        thread.join()
+    assert left == [None]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import os
+from time import time
+
+import pytest
+
+from nzboutbox import CLAIM_TIMEOUT, CLAIMED, Outbox
+
+NZB = b'<?xml version="1.0"?><nzb><file subject="x"></file></nzb>'
+NZBSRC = {'tag': 'Release.Tag', 'header': 'release.header', 'pass': 'pw'}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / 'outbox'), retry_interval=60, max_retry_interval=600)
+
+
+def test_add(outbox):
+    entry = outbox.add('SABNZBD', NZBSRC, 'movies', 'BinSearch', NZB, 'refused')
+    assert oct(os.stat(outbox.path(entry.entry_id, '.json')).st_mode & 0o777) == '0o600'
+    entries = outbox.entries()
+    assert [e.entry_id for e in entries] == [entry.entry_id]
+    assert entries[0].nzbsrc == NZBSRC and entries[0].category == 'movies'
+    assert outbox.load(entries[0]) == NZB
+    assert outbox.entries('NZBGET') == []
+
+
+def test_due(outbox):
+    entry = outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    assert outbox.due() == []
+    assert [e.entry_id for e in outbox.due('SABNZBD', entry.next_try)] == [entry.entry_id]
+
+
+def test_claim_once(outbox, tmp_path):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    other = Outbox(outbox.folder)
+    entry, = outbox.entries()
+    same, = other.entries()
+    assert outbox.claim(entry)
+    assert not other.claim(same)
+    assert outbox.entries() == []
+    assert outbox.claimed == {entry.entry_id}
+    outbox.done(entry)
+    assert os.listdir(outbox.folder) == [] and outbox.claimed == set()
+
+
+def test_retry_backoff(outbox):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    for attempts, wait in ((2, 120), (3, 240), (4, 480), (5, 600), (6, 600)):
+        entry, = outbox.entries()
+        assert outbox.claim(entry)
+        before = time()
+        outbox.retry(entry, 'refused')
+        entry, = outbox.entries()
+        assert entry.data['attempts'] == attempts and entry.data['error'] == 'refused'
+        assert before + wait <= entry.next_try <= time() + wait
+    assert outbox.claimed == set()
+
+
+def test_stale_claim_is_released(outbox):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    entry, = outbox.entries()
+    assert outbox.claim(entry)
+    assert outbox.entries() == []
+    claimed = outbox.path(entry.entry_id, CLAIMED)
+    past = time() - CLAIM_TIMEOUT - 10
+    os.utime(claimed, (past, past))
+    assert [e.entry_id for e in outbox.entries()] == [entry.entry_id]
+    assert not os.path.exists(claimed)
+
+
+def test_wake(outbox):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB, 'refused')
+    outbox.add('NZBGET', NZBSRC, '', 'BinSearch', NZB)
+    assert outbox.wake('SABNZBD') == 1
+    entry, = outbox.due()
+    assert entry.target == 'SABNZBD' and entry.data['error'] == 'refused' and entry.data['attempts'] == 1
+    assert outbox.wake('SABNZBD') == 0
+
+
+def test_release_claims(outbox):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    entry, = outbox.entries()
+    assert outbox.claim(entry)
+    outbox.release_claims()
+    assert [e.entry_id for e in outbox.entries()] == [entry.entry_id]
+    assert outbox.claimed == set()
+
+
+def test_discard(outbox):
+    outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    outbox.add('SABNZBD', {'tag': 'Other'}, '', 'BinSearch', NZB)
+    outbox.add('NZBGET', NZBSRC, '', 'BinSearch', NZB)
+    assert outbox.discard('SABNZBD', {'tag': 'release.tag', 'header': 'Release.Header'}) == 1
+    assert sorted((e.target, e.nzbsrc['tag']) for e in outbox.entries()) == [('NZBGET', 'Release.Tag'),
+                                                                              ('SABNZBD', 'Other')]
+
+
+def test_prune(outbox):
+    entry = outbox.add('SABNZBD', NZBSRC, '', 'BinSearch', NZB)
+    assert outbox.prune(3600) == 0
+    assert outbox.prune(-1) == 1
+    assert not os.path.exists(outbox.path(entry.entry_id, '.nzb'))
+
+
+def test_release_claims_keeps_started_pushes(outbox):
+    for tag in ('A', 'B'):
+        outbox.add('SABNZBD', {'tag': tag}, '', 'BinSearch', NZB)
+    started, waiting = outbox.entries()
+    assert outbox.claim(started) and outbox.claim(waiting)
+    # The push may have reached the target already
+    outbox.start(started)
+    outbox.release_claims()
+    assert [e.entry_id for e in outbox.entries()] == [waiting.entry_id]
+    assert os.path.exists(outbox.path(started.entry_id, CLAIMED))
+    outbox.retry(started, 'refused')
+    assert outbox.sending == set() and len(outbox.entries()) == 2
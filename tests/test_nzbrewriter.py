@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import base64
+import os
+
+from nzbrewriter import Base64Body, NZBRewriter, base64_chunks, escape
+
+NZB = (b'<?xml version="1.0" encoding="utf-8"?>\n'
+       b'<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">\n'
+       b'<head>\n'
+       b'<meta type="password">old</meta>\n'
+       b'<meta type="tag">a</meta>\n'
+       b'</head>\n'
+       b'<file subject="s"><segments><segment bytes="1" number="1">id@x</segment></segments></file>\n'
+       b'</nzb>\n')
+
+
+def test_without_meta_the_nzb_is_unchanged():
+    assert bytes(NZBRewriter(NZB)) == NZB
+    assert len(NZBRewriter(NZB)) == len(NZB)
+
+
+def test_existing_head_is_merged():
+    rewriter = NZBRewriter(NZB, [('password', 'new'), ('tag', 'a'), ('tag', 'b')])
+    nzb = bytes(rewriter)
+    # The password is replaced, the tag which exists already isn't added twice
+    assert b'old' not in nzb
+    assert nzb.count(b'<meta type="password">new</meta>') == 1
+    assert nzb.count(b'<meta type="tag">a</meta>') == 1
+    assert nzb.count(b'<meta type="tag">b</meta>') == 1
+    assert nzb.endswith(NZB[NZB.index(b'<file'):])
+    assert len(rewriter) == len(nzb)
+
+
+def test_values_are_escaped():
+    nzb = bytes(NZBRewriter(NZB, [('password', 'a&b<"c">\'')]))
+    assert b'<meta type="password">a&amp;b&lt;&quot;c&quot;&gt;&apos;</meta>' in nzb
+    assert escape('<&>') == '&lt;&amp;&gt;'
+
+
+def test_empty_head_is_replaced():
+    nzb = bytes(NZBRewriter(b'<nzb><head/><file/></nzb>', [('name', 'x')]))
+    assert nzb == b'<nzb><head>\n<meta type="name">x</meta>\n</head><file/></nzb>'
+
+
+def test_head_is_added_after_nzb_tag():
+    nzb = bytes(NZBRewriter(b'<nzb>\n<file/></nzb>', [('name', 'x')]))
+    assert nzb == b'<nzb>\n<head>\n<meta type="name">x</meta>\n</head>\n<file/></nzb>'
+
+
+def test_encoding_of_the_nzb_is_used():
+    nzb = bytes(NZBRewriter(b'<?xml version="1.0" encoding="iso-8859-1"?><nzb><file/></nzb>', [('name', '\xe9中')]))
+    assert b'<meta type="name">\xe9&#20013;</meta>' in nzb
+
+
+def test_empty_values_are_ignored():
+    assert bytes(NZBRewriter(NZB, [('password', ''), ('name', None)])) == NZB
+
+
+def test_chunks_are_joined_to_the_whole_nzb():
+    rewriter = NZBRewriter(NZB, [('password', 'secret')], chunk_size=7)
+    assert b''.join(rewriter) == bytes(NZBRewriter(NZB, [('password', 'secret')]))
+
+
+def test_copy_keeps_meta_and_check():
+    check = object()
+    rewriter = NZBRewriter(NZB, [('password', 'secret')], check=check)
+    copy = rewriter.copy()
+    copy.set_meta('name', 'Copy')
+    assert copy.check is check
+    assert b'Copy' in bytes(copy)
+    assert b'Copy' not in bytes(rewriter)
+
+
+def test_base64_chunks_are_aligned_to_57_bytes():
+    content = os.urandom(57 * 100 + 13)
+    encoded = list(base64_chunks(content, 57 * 3))
+    # Only the last block may need padding
+    assert all(not chunk.endswith(b'=') for chunk in encoded[:-1])
+    assert b''.join(encoded) == base64.b64encode(content)
+
+
+def test_base64_body_matches_b64encode():
+    for size in (0, 1, 56, 57, 58, 100000):
+        content = os.urandom(size)
+        body = Base64Body(b'<base64>', content, b'</base64>')
+        data = b''.join(body)
+        assert data == b'<base64>' + base64.b64encode(content) + b'</base64>'
+        assert len(body) == len(data)
+
+
+def test_base64_body_of_a_rewriter():
+    rewriter = NZBRewriter(NZB * 500, [('password', 'secret')], chunk_size=1000)
+    body = Base64Body(b'', rewriter, b'')
+    assert b''.join(body) == base64.b64encode(bytes(rewriter))
+    assert len(body) == len(base64.b64encode(bytes(rewriter)))
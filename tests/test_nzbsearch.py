@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+import nzbmonkey
+
+NZB = (b'<?xml version="1.0" encoding="utf-8"?>\n<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">\n'
+       b'<file poster="p" date="1500000000" subject="&quot;a.rar&quot; yEnc (1/2)">\n'
+       b'<groups><group>alt.binaries.test</group></groups>\n<segments>\n'
+       b'<segment bytes="100" number="1">{0}1@x</segment>\n<segment bytes="100" number="2">{0}2@x</segment>\n'
+       b'</segments>\n</file>\n</nzb>\n')
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Header b is slow on the first engine, header a finds a complete NZB there at once"""
+    calls = list()
+    release = threading.Event()
+
+    class NZBDownload(object):
+        def __init__(self, search_url, regex, download_url, header):
+            self.engine = search_url
+            self.header = header
+
+        def download_nzb(self):
+            calls.append((self.header, self.engine))
+            if self.header == 'b':
+                release.wait(5)
+            return True, NZB.replace(b'{0}', '{}{}'.format(self.header, self.engine).encode('ascii'))
+
+    engines = {name: {'name': name, 'searchUrl': name, 'regex': '', 'downloadUrl': '', 'skip_segment_debug': True}
+               for name in ('first', 'second')}
+    monkeypatch.setattr(nzbmonkey, 'SEARCH_ENGINES', engines)
+    monkeypatch.setattr(nzbmonkey, 'NZBDownload', NZBDownload)
+    monkeypatch.setattr(nzbmonkey, 'WAITING_TIME_SHORT', 0)
+    monkeypatch.setattr(nzbmonkey, 'WAITING_TIME_LONG', 0)
+    return calls, release
+
+
+def test_complete_nzb_stops_other_headers(downloads):
+    calls, release = downloads
+    best = nzbmonkey.BestNZB()
+    nzbmonkey.search_header('a', {1: ['first'], 2: ['second']}, best, False, 0, 0.0)
+    assert best.found.is_set()
+    nzbmonkey.search_header('b', {1: ['first'], 2: ['second']}, best, False, 0, 0.0)
+    assert calls == [('a', 'first')]
+    assert best.count == 1 and best.candidate.engine_name == 'first'
+
+
+def test_search_headers_shares_the_stop(downloads):
+    calls, release = downloads
+    best = nzbmonkey.BestNZB()
+    # The slow header gets its NZB after the complete one was found, it isn't checked
+    threading.Timer(0.5, release.set).start()
+    nzbmonkey.search_headers(['a', 'b'], {1: ['first'], 2: ['second']}, best, False, 0, 0.0)
+    assert sorted(calls) == [('a', 'first'), ('b', 'first')]
+    assert best.found.is_set() and best.count == 1
+
+
+def test_best_nzb_searches_on(downloads):
+    calls, release = downloads
+    release.set()
+    best = nzbmonkey.BestNZB()
+    nzbmonkey.search_header('b', {1: ['first'], 2: ['second']}, best, False, 0, 0.0, groups=['alt.binaries.other'])
+    # A NZB of another repost doesn't stop the search
+    assert calls == [('b', 'first'), ('b', 'second')]
+    assert not best.found.is_set() and best.count == 2
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import http.client
+import json
+import threading
+
+import pytest
+
+from nzbserver import APIServer
+
+
+class Job(object):
+    def __init__(self, nzbsrc, category, force):
+        self.nzbsrc = nzbsrc
+        self.category = category
+        self.force = force
+
+    def as_dict(self):
+        return {'tag': self.nzbsrc['tag'], 'category': self.category, 'force': self.force}
+
+
+class Queue(object):
+    workers = 1
+
+    def __init__(self):
+        self.jobs = list()
+
+    def submit(self, nzbsrc, category, source, force):
+        self.jobs.append(Job(nzbsrc, category, force))
+        return self.jobs[-1], True
+
+    def pending(self):
+        return len(self.jobs)
+
+
+def parse_request(request):
+    if request.get('tag') and request.get('header'):
+        return [{'tag': request['tag'], 'header': request['header'], 'pass': request.get('password')}]
+    return []
+
+
+@pytest.fixture
+def server():
+    server = APIServer('127.0.0.1', 0, Queue(), parse_request, 'test')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+    finally:
+        connection.close()
+
+
+def post(server, data, content_type='application/json', **headers):
+    headers['Content-Type'] = content_type
+    return request(server, 'POST', '/jobs', json.dumps(data), headers)
+
+
+def test_submit(server):
+    status, job = post(server, {'tag': 'Release.Tag', 'header': 'h', 'category': 'tv'},
+                       'application/json; charset=utf-8')
+    assert status == 202
+    assert job == {'tag': 'Release.Tag', 'category': 'tv', 'force': False, 'new': True}
+    assert request(server, 'GET', '/status')[1]['pending'] == 1
+
+
+def test_post_needs_json_content_type(server):
+    # A web page can send text/plain without a preflight request
+    assert post(server, {'tag': 'Release.Tag', 'header': 'h'}, 'text/plain')[0] == 415
+    assert server.queue.jobs == []
+
+
+def test_cross_origin_requests_are_rejected(server):
+    assert post(server, {'tag': 'Release.Tag', 'header': 'h'}, Origin='http://example.com')[0] == 403
+    assert request(server, 'GET', '/status', headers={'Origin': 'null'})[0] == 403
+    assert server.queue.jobs == []
+
+
+def test_fields_must_be_strings(server):
+    status, data = post(server, {'nzblnk': ['nzblnk:?t=a&h=b']})
+    assert status == 400 and data['error'] == 'nzblnk must be a string'
+    assert post(server, [{'tag': 'Release.Tag', 'header': 'h', 'category': 1}])[0] == 400
+    assert server.queue.jobs == []
+
+
+def test_invalid_requests(server):
+    assert request(server, 'POST', '/jobs', b'{', {'Content-Type': 'application/json'})[0] == 400
+    assert post(server, [1])[0] == 400
+    assert post(server, {'tag': 'Release.Tag'})[0] == 400
+    assert request(server, 'GET', '/unknown')[0] == 404
+
+
+def test_api_key(server):
+    server.apikey = 'secret'
+    assert request(server, 'GET', '/status')[0] == 401
+    assert request(server, 'GET', '/status', headers={'X-Api-Key': 'secret'})[0] == 200
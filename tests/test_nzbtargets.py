@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+import xml.etree.ElementTree as ET
+
+from nzbtargets import NZBGetAppend, NZBGetClient
+
+NZB = b'<?xml version="1.0"?><nzb><file subject="s"></file></nzb>'
+
+OK = '<value><array><data><value><i4>{}</i4></value></data></array></value>'
+FAULT = ('<value><struct><member><name>faultCode</name><value><i4>1</i4></value></member>'
+         '<member><name>faultString</name><value><string>failed</string></value></member></struct></value>')
+
+
+def multicall_response(*values):
+    return ('<?xml version="1.0"?><methodResponse><params><param><value><array><data>{}</data></array></value>'
+            '</param></params></methodResponse>'.format(''.join(values)))
+
+
+class Response(object):
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+class Session(object):
+    def __init__(self, text):
+        self.text = text
+        self.bodies = list()
+
+    def post(self, url, data=None, **kwargs):
+        self.bodies.append(b''.join(data))
+        return Response(self.text)
+
+    def get(self, url, **kwargs):
+        return Response(self.text)
+
+
+def test_multicall_results():
+    assert NZBGetClient.multicall_results(multicall_response(OK.format(1), FAULT, OK.format(2))) == [True, False,
+                                                                                                    True]
+    assert NZBGetClient.multicall_results('no xml') == []
+    assert NZBGetClient.multicall_results('<methodResponse><fault/></methodResponse>') == []
+
+
+def test_multicall_replies_are_split_per_call():
+    session = Session(multicall_response(OK.format(1), FAULT, OK.format(2)))
+    client = NZBGetClient(session, 'http://localhost:6789/xmlrpc')
+    batch = [NZBGetAppend('{}.nzb'.format(number), NZB, 'movies') for number in range(3)]
+    client.send(batch)
+    assert [call.ok for call in batch] == [True, False, True]
+    assert all(call.done and call.error is None for call in batch)
+
+    # One system.multicall request with an append per NZB
+    request = ET.fromstring(session.bodies[0])
+    assert request.findtext('methodName') == 'system.multicall'
+    calls = request.findall('./params/param/value/array/data/value/struct')
+    assert len(calls) == 3
+    params = calls[1].findall('./member/value/array/data/value')
+    assert params[0].findtext('string') == '1.nzb'
+    assert base64.b64decode(params[1].findtext('string')) == NZB
+    assert params[2].findtext('string') == 'movies'
+
+
+def test_missing_results_fail_the_calls():
+    client = NZBGetClient(Session(multicall_response(OK.format(1))), 'http://localhost:6789/xmlrpc')
+    batch = [NZBGetAppend('{}.nzb'.format(number), NZB) for number in range(2)]
+    client.send(batch)
+    assert [call.ok for call in batch] == [True, False]
+
+
+def test_single_append():
+    session = Session('<methodResponse><params><param><value><i4>1</i4></value></param></params></methodResponse>')
+    call = NZBGetClient(session, 'http://localhost:6789/xmlrpc').append('a.nzb', NZB)
+    assert call.ok
+    assert ET.fromstring(session.bodies[0]).findtext('methodName') == 'append'
+
+
+def test_categories_from_config():
+    config = {'version': '1.1', 'result': [{'Value': 'Movés', 'Name': 'Category2.Name'},
+                                           {'Name': 'Category1.Name', 'Value': 'TV'},
+                                           {'Name': 'Category1.DestDir', 'Value': '/tv'},
+                                           {'Name': 'Category3.Name', 'Value': ''}]}
+    client = NZBGetClient(Session(json.dumps(config)), 'http://localhost:6789/xmlrpc')
+    assert client.categories() == ['TV', 'Movés']
+    assert client.jsonrpc_url == 'http://localhost:6789/jsonrpc'
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from nzbmonkey import parse_clipboard
+from nzbtokenizer import parse_nzblnk, tokenize
+
+SINGLE_RELEASES = [
+    'Show.Name.S01E02.720p.WEB.x264\nHeader: abcdef123\nPassword: geheim\n',
+    'My Movie 2020 1080p BluRay\nsubject: xyz.header\npw: secret',
+    'Just a title\nheader: h1',
+    'Intro line\nShow.Name.S02E03.1080p\nheader: h.two\npwd: p2\n',
+]
+
+
+@pytest.mark.parametrize('text', SINGLE_RELEASES)
+def test_single_release_like_parse_clipboard(text):
+    assert tokenize(text) == [parse_clipboard(text)]
+
+
+def test_several_releases():
+    text = ('Some intro\n'
+            'Release.One.S01E01.1080p\nheader: h.one\npasswort: p1\n\n'
+            'Release.Two.S01E02.1080p\nheader: h.two\npassword: p2\n')
+    assert tokenize(text) == [{'tag': 'Release.One.S01E01.1080p', 'header': 'h.one', 'pass': 'p1'},
+                              {'tag': 'Release.Two.S01E02.1080p', 'header': 'h.two', 'pass': 'p2'}]
+
+
+def test_each_block_matches_parse_clipboard():
+    blocks = ['Release.One.S01E01.1080p\nheader: h.one\npassword: p1\n',
+              'Release.Two.720p.x264\nheader: h.two\n']
+    assert tokenize('\n'.join(blocks)) == [parse_clipboard(block) for block in blocks]
+
+
+def test_nzblnks():
+    text = 'nzblnk:?t=Tag.One&h=head.one&p=pw1\nsome text\nnzblnk:?t=Tag.Two&amp;h=head.two&amp;h=repost.two\n'
+    releases = tokenize(text)
+    assert [(release['tag'], release['headers'], release['pass']) for release in releases] == [
+        ('Tag.One', ['head.one'], 'pw1'), ('Tag.Two', ['head.two', 'repost.two'], None)]
+
+
+def test_parse_nzblnk():
+    assert parse_nzblnk('http://example.com') is None
+    nzbsrc = parse_nzblnk('nzblnk:?t=Tag&h=header&p=pw&g=a.b.test&d=01.10.2026')
+    assert (nzbsrc['tag'], nzbsrc['header'], nzbsrc['pass'], nzbsrc['groups'], nzbsrc['date']) == (
+        'Tag', 'header', 'pw', ['a.b.test'], '01.10.2026')
+
+
+def test_text_without_header():
+    assert tokenize('only a title\nand some text\n') == []